@@ -0,0 +1,140 @@
+"""
+Сравнение пропускной способности чтений каталога под WSGI (gunicorn) и ASGI (uvicorn).
+
+Оба сервера запускаются с одинаковым числом процессов и привязываются к одним и тем же ядрам
+(taskset), нагрузку даёт асинхронный клиент на стандартной библиотеке:
+
+    python benchmark_async.py --cpus 0 --workers 1 --concurrency 200 --duration 20
+
+WSGI обслуживает DRF-маршруты /api/v1/..., ASGI — асинхронные /api/v1/async/... с теми же ответами.
+Список глав не сравнивается: DRF-список отдаёт весь каталог без пагинации, асинхронный — страницу.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def server_command(kind, port, workers, threads):
+    if kind == 'wsgi':
+        command = [
+            sys.executable, '-m', 'gunicorn', 'online_cinema.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+        ]
+    else:
+        command = [
+            sys.executable, '-m', 'uvicorn', 'online_cinema.asgi:application',
+            '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers), '--no-access-log',
+        ]
+    return command
+
+
+def start_server(kind, port, args):
+    command = server_command(kind, port, args.workers, args.threads)
+    if args.cpus and shutil.which('taskset'):
+        # Одинаковый набор ядер для обоих серверов — сравнение при равном CPU
+        command = ['taskset', '-c', args.cpus] + command
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'online_cinema.settings'))
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/v1/genres/', timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'Сервер {kind} не запустился: {" ".join(command)}')
+
+
+async def fetch(host, port, path, read_delay):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        while True:
+            # Медленный клиент: читает ответ небольшими порциями с паузами
+            chunk = await reader.read(4096)
+            if not chunk:
+                break
+            if read_delay:
+                await asyncio.sleep(read_delay)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def run_load(port, paths, concurrency, duration, read_delay):
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+
+    async def client(offset):
+        nonlocal errors
+        index = offset
+        while time.monotonic() < deadline:
+            path = paths[index % len(paths)]
+            index += 1
+            started = time.monotonic()
+            try:
+                status = await fetch('127.0.0.1', port, path, read_delay)
+            except OSError:
+                status = None
+            if status == 200:
+                latencies.append(time.monotonic() - started)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(client(offset) for offset in range(concurrency)))
+    return latencies, errors
+
+
+def report(kind, latencies, errors, duration):
+    if not latencies:
+        print(f'{kind}: нет успешных ответов, ошибок {errors}')
+        return
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f'{kind}: {len(latencies) / duration:8.1f} запр/с, '
+        f'p50 {statistics.median(latencies) * 1000:7.1f} мс, p99 {p99 * 1000:7.1f} мс, ошибок {errors}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cpus', default='0', help='Ядра для taskset (пусто — без привязки)')
+    parser.add_argument('--workers', type=int, default=1, help='Процессов у каждого сервера')
+    parser.add_argument('--threads', type=int, default=4, help='Потоков на процесс gunicorn')
+    parser.add_argument('--concurrency', type=int, default=100, help='Одновременных клиентов')
+    parser.add_argument('--duration', type=float, default=15, help='Длительность замера, секунд')
+    parser.add_argument('--read-delay', type=float, default=0.0, help='Пауза клиента между порциями ответа, секунд')
+    parser.add_argument('--chapter', type=int, default=1, help='id главы для карточки и эпизодов')
+    parser.add_argument('--franchise', type=int, default=1, help='id франшизы')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    endpoints = [
+        f'chapters/{args.chapter}/', f'chapters/{args.chapter}/episodes/',
+        'genres/', f'franchises/{args.franchise}/',
+    ]
+    for kind, prefix in (('wsgi', '/api/v1/'), ('asgi', '/api/v1/async/')):
+        process = start_server(kind, args.port, args)
+        try:
+            latencies, errors = asyncio.run(run_load(
+                args.port, [prefix + endpoint for endpoint in endpoints], args.concurrency, args.duration, args.read_delay
+            ))
+        finally:
+            process.terminate()
+            process.wait()
+        report(kind, latencies, errors, args.duration)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,13 @@
 from django.contrib import admin
+from django.db.models import Count
 from django.utils.translation import gettext_lazy as _
 from .models import (
-    User, UserPaymentMethod, Subscription, UserSubscription,
+    User, UserPaymentMethod, Subscription, UserSubscription, BillingRun, RenewalCharge,
     Genre, Franchise, Chapter, Episode, Person,
     ChapterPersonRole, Comment, Review, Rating,
-    Playlist, PlaylistChapter, ViewHistory
+    Playlist, PlaylistChapter, ViewHistory, PlaybackProgress,
+    ChapterDailyViews, GenreDailyViews, ChapterTrendingScore, PersonSummary, PlaylistRanking,
+    ChapterRatingHistogram
 )
 from .chapter_pdf_export import export_chapter_pdf
 
@@ -47,8 +50,8 @@ class UserAdmin(admin.ModelAdmin):
 
 @admin.register(UserPaymentMethod)
 class UserPaymentMethodAdmin(admin.ModelAdmin):
-    list_display = ('user_display', 'payment_type', 'provider_id', 'masked_card_number')
-    list_filter = ('payment_type',)
+    list_display = ('user_display', 'payment_type', 'provider_id', 'masked_card_number', 'valid_until', 'is_expired')
+    list_filter = ('payment_type', 'is_expired')
     search_fields = ('user__username', 'provider_id', 'masked_card_number')
     raw_id_fields = ('user',)
 
@@ -87,6 +90,24 @@ class UserSubscriptionAdmin(admin.ModelAdmin):
         return obj.subscription
 
 
+@admin.register(BillingRun)
+class BillingRunAdmin(admin.ModelAdmin):
+    list_display = ('key', 'status', 'started_at', 'finished_at', 'succeeded_count', 'failed_count')
+    list_filter = ('status',)
+    search_fields = ('key',)
+    readonly_fields = ('key', 'status', 'started_at', 'finished_at', 'succeeded_count', 'failed_count')
+
+
+@admin.register(RenewalCharge)
+class RenewalChargeAdmin(admin.ModelAdmin):
+    list_display = ('idempotency_key', 'user_subscription', 'amount', 'status', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('idempotency_key', 'provider_charge_id', 'user_subscription__user__username')
+    raw_id_fields = ('run', 'user_subscription', 'payment_method')
+    date_hierarchy = 'created_at'
+    readonly_fields = ('created_at', 'updated_at')
+
+
 @admin.register(Genre)
 class GenreAdmin(admin.ModelAdmin):
     list_display = ('name_display',)
@@ -107,9 +128,12 @@ class FranchiseAdmin(admin.ModelAdmin):
     def title_display(self, obj):
         return obj.title
 
-    @admin.display(description='Количество глав')
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(chapter_count=Count('chapters'))
+
+    @admin.display(description='Количество глав', ordering='chapter_count')
     def chapters_count(self, obj):
-        return obj.chapters.count()
+        return obj.chapter_count
 
 
 @admin.register(Chapter)
@@ -128,7 +152,7 @@ class ChapterAdmin(admin.ModelAdmin):
     filter_horizontal = ('genres',)
     date_hierarchy = 'release_date'
     inlines = [EpisodeInline, ChapterPersonRoleInline]
-    readonly_fields = ('rating_cache', 'view_count')
+    readonly_fields = ('rating_cache', 'weighted_score', 'view_count')
 
     @admin.display(description='Название')
     def title_display(self, obj):
@@ -150,6 +174,7 @@ class EpisodeAdmin(admin.ModelAdmin):
     search_fields = ('title', 'chapter__title')
     raw_id_fields = ('chapter',)
     date_hierarchy = 'release_date'
+    readonly_fields = ('hls_manifest', 'packaged_at')
 
     @admin.display(description='Название')
     def title_display(self, obj):
@@ -215,7 +240,7 @@ class PlaylistAdmin(admin.ModelAdmin):
 
 @admin.register(PlaylistChapter)
 class PlaylistChapterAdmin(admin.ModelAdmin):
-    list_display = ('playlist', 'chapter', 'added_at')
+    list_display = ('playlist', 'chapter', 'position', 'added_at')
     list_filter = ('added_at',)
     search_fields = ('playlist__title', 'chapter__title')
     raw_id_fields = ('playlist', 'chapter')
@@ -230,3 +255,56 @@ class ViewHistoryAdmin(admin.ModelAdmin):
     raw_id_fields = ('user', 'chapter')
     date_hierarchy = 'viewed_at'
 
+
+@admin.register(PlaybackProgress)
+class PlaybackProgressAdmin(admin.ModelAdmin):
+    list_display = ('user', 'episode', 'position_seconds', 'is_finished', 'updated_at')
+    list_filter = ('is_finished', 'updated_at')
+    search_fields = ('user__username', 'episode__title', 'episode__chapter__title')
+    raw_id_fields = ('user', 'episode')
+    date_hierarchy = 'updated_at'
+
+
+@admin.register(ChapterDailyViews)
+class ChapterDailyViewsAdmin(admin.ModelAdmin):
+    list_display = ('chapter', 'date', 'views', 'unique_viewers')
+    search_fields = ('chapter__title',)
+    raw_id_fields = ('chapter',)
+    date_hierarchy = 'date'
+
+
+@admin.register(GenreDailyViews)
+class GenreDailyViewsAdmin(admin.ModelAdmin):
+    list_display = ('genre', 'date', 'views')
+    list_filter = ('genre',)
+    date_hierarchy = 'date'
+
+
+@admin.register(ChapterTrendingScore)
+class ChapterTrendingScoreAdmin(admin.ModelAdmin):
+    list_display = ('chapter', 'window', 'score', 'updated_at')
+    list_filter = ('window',)
+    search_fields = ('chapter__title',)
+    raw_id_fields = ('chapter',)
+
+
+@admin.register(PersonSummary)
+class PersonSummaryAdmin(admin.ModelAdmin):
+    list_display = ('person', 'chapter_count', 'rating_count', 'average_rating', 'first_release', 'last_release', 'updated_at')
+    search_fields = ('person__first_name', 'person__last_name')
+    raw_id_fields = ('person',)
+
+
+@admin.register(PlaylistRanking)
+class PlaylistRankingAdmin(admin.ModelAdmin):
+    list_display = ('playlist', 'is_public', 'follower_count', 'chapter_count', 'average_rating', 'score', 'refreshed_at')
+    list_filter = ('is_public',)
+    search_fields = ('playlist__title',)
+    raw_id_fields = ('playlist',)
+
+
+@admin.register(ChapterRatingHistogram)
+class ChapterRatingHistogramAdmin(admin.ModelAdmin):
+    list_display = ('chapter', *ChapterRatingHistogram.SCORE_FIELDS)
+    search_fields = ('chapter__title',)
+    raw_id_fields = ('chapter',)
@@ -0,0 +1,123 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Prefetch
+from django.http import JsonResponse
+from django.utils.duration import duration_string
+from django.views.decorators.http import require_GET
+
+from .entitlements import active_subscription_ids
+from .franchise_stats import afranchise_stats
+from .models import Chapter, Episode, Franchise, Genre
+from .rating_stats import rating_prior
+from .serializers import (
+    ChapterDetailSerializer, ChapterShortSerializer, EpisodeSerializer, FranchiseSerializer, GenreSerializer,
+)
+
+
+# Асинхронные (ASGI) чтения каталога: запросы идут через асинхронный ORM, поэтому медленный запрос
+# или медленный клиент не занимает поток воркера. Сериализаторы те же, что у DRF-представлений;
+# всё, что они читают из БД, подгружается заранее, чтобы сериализация не делала запросов.
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+CHAPTER_ORDERINGS = {'view_count', '-view_count', 'weighted_score', '-weighted_score', 'release_date', '-release_date'}
+
+
+def _not_found():
+    # JSON, как у остальных ответов API, а не HTML-страница 404 Django
+    return JsonResponse({'detail': 'Not found.'}, status=404)
+
+
+def _int_param(request, name, default, maximum=None):
+    try:
+        value = max(int(request.GET.get(name, default)), 0)
+    except ValueError:
+        value = default
+    return min(value, maximum) if maximum is not None else value
+
+
+async def _resolve_user(request):
+    """Пользователь и его активные подписки — заранее, чтобы can_access в сериализаторе не ходил в БД"""
+    request.user = await request.auser()
+    await sync_to_async(active_subscription_ids)(request.user)
+    return request.user
+
+
+@require_GET
+async def chapter_list(request):
+    """Краткие карточки глав; ?ordering=, ?genre=<id>, ?limit=, ?offset= (без COUNT: next есть, пока есть ещё)"""
+    ordering = request.GET.get('ordering', '-view_count')
+    if ordering not in CHAPTER_ORDERINGS:
+        return JsonResponse({'detail': f'ordering должен быть одним из: {", ".join(sorted(CHAPTER_ORDERINGS))}'}, status=400)
+    limit = _int_param(request, 'limit', DEFAULT_LIMIT, MAX_LIMIT) or DEFAULT_LIMIT
+    offset = _int_param(request, 'offset', 0)
+
+    queryset = Chapter.objects.order_by(ordering, '-id')
+    genre = request.GET.get('genre')
+    if genre:
+        if not genre.isdigit():
+            return JsonResponse({'detail': 'genre должен быть id жанра'}, status=400)
+        queryset = queryset.filter(genres=genre)
+
+    chapters = [chapter async for chapter in queryset[offset:offset + limit + 1]]
+    next_url = None
+    if len(chapters) > limit:
+        chapters = chapters[:limit]
+        params = request.GET.copy()
+        params['offset'] = offset + limit
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    return JsonResponse({
+        'next': next_url,
+        'results': ChapterShortSerializer(chapters, many=True, context={'request': request}).data,
+    })
+
+
+@require_GET
+async def chapter_detail(request, pk):
+    """Карточка главы — то же представление, что у ChapterViewSet.retrieve"""
+    chapters = Chapter.objects.select_related('franchise', 'required_subscription', 'rating_histogram').prefetch_related(
+        'genres', 'people',
+        Prefetch('franchise__chapters', queryset=Chapter.objects.only(
+            'id', 'franchise_id', 'chapter_number', 'franchise_relation'
+        ).order_by('chapter_number')),
+    )
+    try:
+        chapter = await chapters.aget(pk=pk)
+    except Chapter.DoesNotExist:
+        return _not_found()
+    await _resolve_user(request)
+    prior = await sync_to_async(rating_prior)()
+    serializer = ChapterDetailSerializer(chapter, context={'request': request, 'rating_prior': prior})
+    return JsonResponse(serializer.data)
+
+
+@require_GET
+async def genre_list(request):
+    genres = [genre async for genre in Genre.objects.order_by('name')]
+    return JsonResponse(GenreSerializer(genres, many=True).data, safe=False)
+
+
+@require_GET
+async def franchise_detail(request, pk):
+    """Франшиза с хронологией глав и сводными показателями (как FranchiseViewSet.retrieve)"""
+    try:
+        franchise = await Franchise.objects.annotate(chapter_count=Count('chapters')).aget(pk=pk)
+    except Franchise.DoesNotExist:
+        return _not_found()
+    data = FranchiseSerializer(franchise).data
+    data.update(await afranchise_stats(franchise.pk))
+    return JsonResponse(data)
+
+
+@require_GET
+async def chapter_episodes(request, pk):
+    """Эпизоды главы по порядку и их общая длительность (как ChapterViewSet.episodes)"""
+    chapter = await Chapter.objects.filter(pk=pk).values('id', 'total_runtime').afirst()
+    if chapter is None:
+        return _not_found()
+    episodes = [
+        episode async for episode in Episode.objects.filter(chapter_id=chapter['id']).order_by('episode_number', 'id')
+    ]
+    return JsonResponse({
+        'chapter': chapter['id'],
+        'total_runtime': duration_string(chapter['total_runtime']) if chapter['total_runtime'] is not None else None,
+        'episodes': EpisodeSerializer(episodes, many=True, context={'request': request}).data,
+    })
@@ -0,0 +1,53 @@
+import threading
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class ChargeResult:
+    def __init__(self, succeeded, charge_id=None, error=None):
+        self.succeeded = succeeded
+        self.charge_id = charge_id
+        self.error = error
+
+
+class PaymentProvider:
+    """
+    Интерфейс платёжного провайдера.
+    Провайдер обязан учитывать idempotency_key: повторный вызов с тем же ключом
+    возвращает результат первого списания и не списывает деньги повторно.
+    """
+
+    def charge(self, payment_method, amount, currency, idempotency_key):
+        raise NotImplementedError
+
+
+class FakePaymentProvider(PaymentProvider):
+    """
+    Локальный провайдер для тестов и разработки.
+    Списание отклоняется, если provider_id способа оплаты начинается с 'decline'.
+    """
+
+    _lock = threading.Lock()
+    _charges = {}
+
+    def charge(self, payment_method, amount, currency, idempotency_key):
+        with self._lock:
+            if idempotency_key in self._charges:
+                return self._charges[idempotency_key]
+
+            if payment_method.provider_id.startswith('decline'):
+                result = ChargeResult(False, error='Платёж отклонён')
+            else:
+                result = ChargeResult(True, charge_id=f'fake_{uuid.uuid4().hex}')
+            self._charges[idempotency_key] = result
+            return result
+
+    @classmethod
+    def charges_count(cls):
+        return sum(1 for result in cls._charges.values() if result.succeeded)
+
+
+def get_payment_provider():
+    return import_string(settings.PAYMENT_PROVIDER)()
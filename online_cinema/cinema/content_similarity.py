@@ -0,0 +1,154 @@
+import hashlib
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Chapter, ChapterLSHBucket, ChapterPersonRole, ChapterSignature
+
+
+# Сигнатура из NUM_PERM минхешей режется на BANDS полос по ROWS значений.
+# Главы с похожестью по Жаккару s попадают в общую корзину с вероятностью 1 - (1 - s^ROWS)^BANDS:
+# при 16×4 это ~0.99 для s = 0.8, ~0.64 для s = 0.5 и ~0.12 для s = 0.3. Полосы по 2 значения
+# сводили в корзины почти любые главы с парой общих признаков
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Роли, которые характеризуют содержание главы
+CONTENT_ROLES = ['director', 'actor', 'screenwriter']
+
+# Сколько кандидатов из общих корзин сравнивать по сигнатурам
+MAX_CANDIDATES = 500
+
+# Главы с меньшим числом признаков (например, только жанр и страна) не кладутся в корзины:
+# их сигнатуры у тысяч глав совпадают целиком, и каждая такая корзина содержала бы пол-каталога
+MIN_LSH_FEATURES = 3
+
+_PERMUTATIONS = np.arange(NUM_PERM, dtype=np.uint64)
+_MASK = np.uint64(0xFFFFFFFF)
+
+
+def chapter_features(chapter_ids):
+    """
+    Признаки глав {chapter_id: set(...)}: жанры, люди по ролям и страна.
+    Тип и возрастной рейтинг есть почти у каждой главы и почти ничего не говорят о содержании,
+    а в MinHash они завышали бы похожесть любых двух глав, поэтому в признаки не входят.
+    """
+    features = defaultdict(set)
+    for chapter_id, country in Chapter.objects.filter(id__in=chapter_ids).values_list('id', 'country'):
+        features[chapter_id]
+        for name in (country or '').split(','):
+            if name.strip():
+                features[chapter_id].add(f'country:{name.strip().lower()}')
+
+    for chapter_id, genre_id in Chapter.genres.through.objects.filter(chapter_id__in=features).values_list('chapter_id', 'genre_id'):
+        features[chapter_id].add(f'genre:{genre_id}')
+    for chapter_id, person_id, role in ChapterPersonRole.objects.filter(
+        chapter_id__in=features, person__isnull=False, role__in=CONTENT_ROLES
+    ).values_list('chapter_id', 'person_id', 'role'):
+        features[chapter_id].add(f'{role}:{person_id}')
+    return features
+
+
+def minhash(features):
+    """
+    MinHash-сигнатура множества признаков (NUM_PERM значений uint32).
+    Перестановки моделируются как h1 + i * h2 по двум половинам одного хеша признака.
+    """
+    digests = np.array(
+        [int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big') for feature in features],
+        dtype=np.uint64,
+    )
+    h1 = digests & _MASK
+    h2 = (digests >> np.uint64(32)) | np.uint64(1)
+    hashes = (h1[:, None] + h2[:, None] * _PERMUTATIONS[None, :]) & _MASK
+    return hashes.min(axis=0).astype(np.uint32)
+
+
+def band_buckets(signature):
+    """Ключи корзин по полосам; номер полосы входит в хеш, поэтому достаточно индекса по bucket"""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(bytes([band]) + signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+            'big',
+            signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def index_chapters(chapter_ids):
+    """Пересчитать сигнатуры и корзины для указанных глав"""
+    chapter_ids = set(chapter_ids)
+    if not chapter_ids:
+        return 0
+    features = chapter_features(chapter_ids)
+    signatures = {chapter_id: minhash(tokens) for chapter_id, tokens in features.items() if tokens}
+
+    with transaction.atomic():
+        ChapterSignature.objects.filter(chapter_id__in=chapter_ids - signatures.keys()).delete()
+        ChapterLSHBucket.objects.filter(chapter_id__in=chapter_ids).delete()
+        ChapterSignature.objects.bulk_create(
+            [ChapterSignature(chapter_id=chapter_id, signature=signature.tobytes()) for chapter_id, signature in signatures.items()],
+            update_conflicts=True,
+            unique_fields=['chapter'],
+            update_fields=['signature'],
+        )
+        ChapterLSHBucket.objects.bulk_create(
+            [
+                ChapterLSHBucket(chapter_id=chapter_id, band=band, bucket=bucket)
+                for chapter_id, signature in signatures.items()
+                if len(features[chapter_id]) >= MIN_LSH_FEATURES
+                for band, bucket in enumerate(band_buckets(signature))
+            ],
+            batch_size=1000,
+        )
+    return len(signatures)
+
+
+def schedule_index(*chapter_ids):
+    """Переиндексировать главы после коммита текущей транзакции"""
+    chapter_ids = {chapter_id for chapter_id in chapter_ids if chapter_id}
+    if chapter_ids:
+        transaction.on_commit(lambda: index_chapters(chapter_ids))
+
+
+def rebuild(batch_size=1000):
+    """Полная переиндексация каталога пачками по id"""
+    indexed = 0
+    last_id = 0
+    while True:
+        ids = list(Chapter.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return indexed
+        indexed += index_chapters(ids)
+        last_id = ids[-1]
+
+
+def similar(chapter_id, limit=20):
+    """
+    Похожие по содержанию главы: список (chapter_id, оценка Жаккара) по убыванию.
+    Кандидаты берутся только из общих LSH-корзин, поэтому поиск не просматривает весь каталог.
+    Главы с числом признаков меньше MIN_LSH_FEATURES в корзинах отсутствуют и в выдачу не попадают.
+    """
+    try:
+        signature = np.frombuffer(ChapterSignature.objects.get(chapter_id=chapter_id).signature, dtype=np.uint32)
+    except ChapterSignature.DoesNotExist:
+        return []
+
+    candidates = list(
+        ChapterLSHBucket.objects.filter(bucket__in=band_buckets(signature))
+        .exclude(chapter_id=chapter_id)
+        .values('chapter_id')
+        .annotate(shared=Count('id'))
+        .order_by('-shared', 'chapter_id')
+        .values_list('chapter_id', flat=True)[:MAX_CANDIDATES]
+    )
+    scored = [
+        (candidate_id, float(np.mean(np.frombuffer(other, dtype=np.uint32) == signature)))
+        for candidate_id, other in ChapterSignature.objects.filter(chapter_id__in=candidates).values_list('chapter_id', 'signature')
+    ]
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:limit]
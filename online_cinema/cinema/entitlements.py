@@ -0,0 +1,65 @@
+import datetime
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import UserSubscription
+
+
+CACHE_KEY = 'entitlements:user:{}'
+MAX_TTL = 60 * 60  # даже без изменений пересчитываем не реже раза в час
+
+
+def _cache_key(user_id):
+    return CACHE_KEY.format(user_id)
+
+
+def active_subscription_ids(user):
+    """
+    Множество id подписок, активных у пользователя прямо сейчас.
+
+    Считается одним запросом и кладётся в кэш до ближайшего момента, когда набор может
+    измениться сам по себе (окончание или начало одной из подписок).
+    На время запроса результат дополнительно запоминается на объекте пользователя.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    ids = getattr(user, '_active_subscription_ids', None)
+    if ids is not None:
+        return ids
+
+    key = _cache_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        now = timezone.now()
+        rows = UserSubscription.objects.filter(
+            user_id=user.pk, is_active=True, end_date__gte=now
+        ).values_list('subscription_id', 'start_date', 'end_date')
+
+        active = set()
+        expires_at = now + datetime.timedelta(seconds=MAX_TTL)
+        for subscription_id, start_date, end_date in rows:
+            if start_date <= now:
+                active.add(subscription_id)
+                expires_at = min(expires_at, end_date)
+            else:
+                expires_at = min(expires_at, start_date)
+
+        ids = frozenset(active)
+        cache.set(key, ids, max(int((expires_at - now).total_seconds()), 1))
+
+    user._active_subscription_ids = ids
+    return ids
+
+
+def can_access(user, chapter):
+    """Есть ли у пользователя доступ к главе с учётом required_subscription"""
+    if chapter is None or chapter.required_subscription_id is None:
+        return True
+    return chapter.required_subscription_id in active_subscription_ids(user)
+
+
+def invalidate(*user_ids):
+    """Сбросить закэшированные права пользователей"""
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
@@ -0,0 +1,79 @@
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Subquery, Sum
+
+from . import franchise_stats
+from .models import Chapter, Episode
+
+
+def refresh_total_runtime(chapter_ids):
+    """Пересчитать Chapter.total_runtime одним UPDATE с подзапросом"""
+    runtime = (
+        Episode.objects.filter(chapter=OuterRef('pk'))
+        .values('chapter')
+        .annotate(total=Sum('duration'))
+        .values('total')
+    )
+    Chapter.objects.filter(id__in=chapter_ids).update(total_runtime=Subquery(runtime))
+
+
+def _park(episodes, offset):
+    """
+    Временно сдвинуть номера за пределы итоговой нумерации.
+    Без этого промежуточные значения нарушили бы unique_together(chapter, episode_number).
+    """
+    episodes.update(episode_number=F('episode_number') + offset)
+
+
+def _lock_chapter(chapter_id):
+    """
+    Заблокировать строку главы до конца транзакции: вставки и перестановки эпизодов одной главы
+    идут по очереди. select_for_update с aggregate ничего не блокирует — запрос агрегата выполняется без FOR UPDATE.
+    """
+    return Chapter.objects.select_for_update().only('id', 'franchise_id').get(pk=chapter_id)
+
+
+def reorder_episodes(chapter_id, episode_ids):
+    """
+    Перенумеровать эпизоды главы 1..N в порядке episode_ids: два UPDATE в одной транзакции.
+    Эпизоды, добавленные после проверки списка, идут в конец, а не остаются с временными номерами.
+    """
+    with transaction.atomic():
+        chapter = _lock_chapter(chapter_id)
+        episodes = Episode.objects.filter(chapter_id=chapter_id)
+        listed = set(episode_ids)
+        order = list(episode_ids) + [
+            pk for pk in episodes.order_by('episode_number', 'id').values_list('id', flat=True) if pk not in listed
+        ]
+        current_max = episodes.aggregate(max=Max('episode_number'))['max'] or 0
+        _park(episodes.filter(episode_number__isnull=False), current_max + len(order) + 1)
+        Episode.objects.bulk_update(
+            [Episode(pk=episode_id, episode_number=number) for number, episode_id in enumerate(order, start=1)],
+            ['episode_number'],
+        )
+    franchise_stats.invalidate(chapter.franchise_id)
+
+
+def insert_episodes(chapter_id, position, items):
+    """
+    Вставить новые эпизоды начиная с номера position, сдвинув последующие.
+    items — список словарей с полями эпизода. Возвращает созданные эпизоды.
+    """
+    count = len(items)
+    with transaction.atomic():
+        chapter = _lock_chapter(chapter_id)
+        episodes = Episode.objects.filter(chapter_id=chapter_id)
+        current_max = episodes.aggregate(max=Max('episode_number'))['max'] or 0
+        position = min(position, current_max + 1)
+        following = episodes.filter(episode_number__gte=position)
+        offset = current_max + count + 1
+        _park(following, offset)
+        Episode.objects.filter(chapter_id=chapter_id, episode_number__gte=position + offset).update(
+            episode_number=F('episode_number') - offset + count
+        )
+        created = Episode.objects.bulk_create([
+            Episode(chapter_id=chapter_id, episode_number=position + index, **item)
+            for index, item in enumerate(items)
+        ])
+        refresh_total_runtime([chapter_id])
+    franchise_stats.invalidate(chapter.franchise_id)
+    return created
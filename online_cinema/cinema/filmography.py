@@ -0,0 +1,92 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+
+from .models import ChapterPersonRole, Person, PersonSummary, Rating
+
+
+def person_ids_for_chapter(chapter_id):
+    return set(
+        ChapterPersonRole.objects.filter(chapter_id=chapter_id, person__isnull=False).values_list('person_id', flat=True)
+    )
+
+
+def refresh_person_summaries(person_ids):
+    """
+    Пересчитать сводки указанных персон целиком.
+    Оценки считаются по уникальным главам: персона с двумя ролями в главе не получает её оценки дважды.
+    """
+    person_ids = set(Person.objects.filter(id__in=person_ids).values_list('id', flat=True))
+    if not person_ids:
+        return 0
+
+    pairs = set(
+        ChapterPersonRole.objects.filter(person_id__in=person_ids, chapter__isnull=False)
+        .values_list('person_id', 'chapter_id')
+    )
+    chapter_totals = {
+        row['chapter_id']: row
+        for row in Rating.objects.filter(chapter_id__in={chapter_id for _, chapter_id in pairs}, score__isnull=False)
+        .values('chapter_id').annotate(total=Sum('score'), count=Count('id'))
+    }
+    spans = {
+        row['person_id']: row
+        for row in ChapterPersonRole.objects.filter(person_id__in=person_ids, chapter__isnull=False)
+        .values('person_id').annotate(
+            chapters=Count('chapter', distinct=True),
+            first=Min('chapter__release_date'),
+            last=Max('chapter__release_date'),
+        )
+    }
+
+    totals = defaultdict(lambda: [0, 0])
+    for person_id, chapter_id in pairs:
+        if chapter_id in chapter_totals:
+            totals[person_id][0] += chapter_totals[chapter_id]['total']
+            totals[person_id][1] += chapter_totals[chapter_id]['count']
+
+    PersonSummary.objects.bulk_create(
+        [
+            PersonSummary(
+                person_id=person_id,
+                chapter_count=spans.get(person_id, {}).get('chapters', 0),
+                rating_sum=totals[person_id][0],
+                rating_count=totals[person_id][1],
+                first_release=spans.get(person_id, {}).get('first'),
+                last_release=spans.get(person_id, {}).get('last'),
+            )
+            for person_id in person_ids
+        ],
+        update_conflicts=True,
+        unique_fields=['person'],
+        update_fields=['chapter_count', 'rating_sum', 'rating_count', 'first_release', 'last_release', 'updated_at'],
+    )
+    return len(person_ids)
+
+
+def schedule_refresh(person_ids):
+    """Пересчитать сводки после коммита текущей транзакции"""
+    person_ids = {person_id for person_id in person_ids if person_id}
+    if person_ids:
+        transaction.on_commit(lambda: refresh_person_summaries(person_ids))
+
+
+def add_rating(chapter_id, score):
+    """Новая оценка главы: прибавить её к сводкам всех персон главы одним UPDATE"""
+    if chapter_id and score is not None:
+        PersonSummary.objects.filter(person_id__in=person_ids_for_chapter(chapter_id)).update(
+            rating_sum=F('rating_sum') + score,
+            rating_count=F('rating_count') + 1,
+        )
+
+
+def rebuild(batch_size=1000):
+    refreshed = 0
+    last_id = 0
+    while True:
+        ids = list(Person.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return refreshed
+        refreshed += refresh_person_summaries(ids)
+        last_id = ids[-1]
@@ -0,0 +1,95 @@
+import datetime
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from django.utils.duration import duration_string
+
+from .models import Chapter, Rating
+
+
+CACHE_KEY = 'franchise:stats:{}'
+# Изменения глав и эпизодов сбрасывают кэш сразу; оценки и просмотры подтягиваются по истечении TTL
+CACHE_TTL = 10 * 60
+
+RELATION_ORDER = Case(
+    *[When(franchise_relation=relation, then=Value(rank)) for rank, (relation, _) in enumerate(Chapter.FRANCHISE_RELATION_CHOICES)],
+    default=Value(len(Chapter.FRANCHISE_RELATION_CHOICES)),
+    output_field=IntegerField(),
+)
+
+
+def _cache_key(franchise_id):
+    return CACHE_KEY.format(franchise_id)
+
+
+def compute_stats(franchise_id):
+    """Хронология глав и сводные показатели франшизы — ровно два запроса"""
+    chapters = list(
+        Chapter.objects.filter(franchise_id=franchise_id)
+        .annotate(episode_total=Count('episodes'), runtime=Sum('episodes__duration'))
+        .order_by(F('chapter_number').asc(nulls_last=True), RELATION_ORDER, 'id')
+        .values(
+            'id', 'title', 'chapter_number', 'franchise_relation', 'release_date',
+            'content_type', 'view_count', 'episode_total', 'runtime',
+        )
+    )
+    ratings = {
+        row['chapter_id']: row
+        for row in Rating.objects.filter(chapter__franchise_id=franchise_id, score__isnull=False)
+        .values('chapter_id').annotate(total=Sum('score'), count=Count('id'))
+    }
+
+    timeline = []
+    rating_sum = rating_count = 0
+    for chapter in chapters:
+        rating = ratings.get(chapter['id'], {'total': 0, 'count': 0})
+        rating_sum += rating['total']
+        rating_count += rating['count']
+        timeline.append({
+            'id': chapter['id'],
+            'title': chapter['title'],
+            'chapter_number': chapter['chapter_number'],
+            'franchise_relation': chapter['franchise_relation'],
+            'release_date': chapter['release_date'],
+            'content_type': chapter['content_type'],
+            'episode_count': chapter['episode_total'],
+            'runtime': duration_string(chapter['runtime']) if chapter['runtime'] is not None else None,
+            'average_rating': rating['total'] / rating['count'] if rating['count'] else None,
+            'view_count': chapter['view_count'],
+        })
+
+    runtimes = [chapter['runtime'] for chapter in chapters if chapter['runtime'] is not None]
+    return {
+        'chapter_count': len(chapters),
+        'total_episodes': sum(chapter['episode_total'] for chapter in chapters),
+        'total_runtime': duration_string(sum(runtimes, datetime.timedelta())) if runtimes else None,
+        'average_rating': rating_sum / rating_count if rating_count else None,
+        'rating_count': rating_count,
+        'total_views': sum(chapter['view_count'] for chapter in chapters),
+        'timeline': timeline,
+    }
+
+
+def franchise_stats(franchise_id):
+    key = _cache_key(franchise_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats(franchise_id)
+        cache.set(key, stats, CACHE_TTL)
+    return stats
+
+
+async def afranchise_stats(franchise_id):
+    """Асинхронный вариант franchise_stats: попадание в кэш не покидает цикл событий"""
+    key = _cache_key(franchise_id)
+    stats = await cache.aget(key)
+    if stats is None:
+        stats = await sync_to_async(compute_stats)(franchise_id)
+        await cache.aset(key, stats, CACHE_TTL)
+    return stats
+
+
+def invalidate(*franchise_ids):
+    """Сбросить кэш статистики франшиз"""
+    cache.delete_many([_cache_key(franchise_id) for franchise_id in franchise_ids if franchise_id])
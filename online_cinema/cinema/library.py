@@ -0,0 +1,106 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Playlist, Rating, UserSubscription, ViewHistory
+from .serializers import (
+    LibraryHistorySerializer, LibraryPlaylistSerializer, LibraryRatingSerializer, LibrarySubscriptionSerializer,
+)
+
+
+VERSION_KEY = 'library:version:{}'
+CACHE_KEY = 'library:user:{}:v{}:{}'
+CACHE_TTL = 10 * 60
+
+SECTIONS = ('playlists', 'history', 'ratings')
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+
+def _version(user_id):
+    """
+    Версия библиотеки пользователя. Запись меняет версию, и все закэшированные страницы
+    (с любыми параметрами пагинации) перестают находиться без перебора ключей.
+    """
+    key = VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        cache.set(key, version, None)
+    return version
+
+
+def invalidate(*user_ids):
+    """Сбросить закэшированную библиотеку пользователей"""
+    version = time.time_ns()
+    cache.set_many({VERSION_KEY.format(user_id): version for user_id in user_ids if user_id}, None)
+
+
+def _page(queryset, offset, limit):
+    """Срез секции без COUNT: берём на одну запись больше, чтобы узнать, есть ли продолжение"""
+    rows = list(queryset[offset:offset + limit + 1])
+    return rows[:limit], (offset + limit if len(rows) > limit else None)
+
+
+def build_library(user, pages):
+    """
+    Собрать библиотеку пользователя: плейлисты, историю, оценки и активную подписку.
+    pages — {секция: (offset, limit)}. Ровно четыре запроса, по одному на секцию.
+    Возвращает (library, ttl): кэш не должен пережить окончание текущей подписки.
+    """
+    sections = {
+        'playlists': (
+            Playlist.objects.filter(user=user).annotate(chapter_count=Count('playlist_chapters')).order_by('-updated_at', '-id'),
+            LibraryPlaylistSerializer,
+        ),
+        'history': (
+            ViewHistory.objects.filter(user=user, chapter__isnull=False).select_related('chapter').order_by('-viewed_at', '-id'),
+            LibraryHistorySerializer,
+        ),
+        'ratings': (
+            Rating.objects.filter(user=user, chapter__isnull=False).select_related('chapter').order_by('-created_at', '-id'),
+            LibraryRatingSerializer,
+        ),
+    }
+    library = {}
+    for name, (queryset, serializer_class) in sections.items():
+        offset, limit = pages[name]
+        rows, next_offset = _page(queryset, offset, limit)
+        library[name] = {'results': serializer_class(rows, many=True).data, 'next_offset': next_offset}
+
+    now = timezone.now()
+    subscription = (
+        UserSubscription.objects.filter(user=user, is_active=True, start_date__lte=now, end_date__gte=now)
+        .select_related('subscription').order_by('-end_date').first()
+    )
+    library['subscription'] = LibrarySubscriptionSerializer(subscription).data if subscription else None
+
+    ttl = CACHE_TTL
+    if subscription:
+        ttl = max(1, min(ttl, int((subscription.end_date - now).total_seconds())))
+    return library, ttl
+
+
+def parse_pages(params):
+    """Параметры пагинации секций из query string: ?history_offset=20&history_limit=20"""
+    pages = {}
+    for name in SECTIONS:
+        try:
+            offset = max(int(params.get(f'{name}_offset', 0)), 0)
+            limit = min(max(int(params.get(f'{name}_limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            offset, limit = 0, DEFAULT_LIMIT
+        pages[name] = (offset, limit)
+    return pages
+
+
+def get_library(user, pages):
+    params = ':'.join(f'{name}={offset},{limit}' for name, (offset, limit) in sorted(pages.items()))
+    key = CACHE_KEY.format(user.pk, _version(user.pk), params)
+    library = cache.get(key)
+    if library is None:
+        library, ttl = build_library(user, pages)
+        cache.set(key, library, ttl)
+    return library
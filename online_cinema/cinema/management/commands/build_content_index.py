@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from cinema.content_similarity import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Полностью пересчитывает контентный индекс похожих глав (жанры, люди, страна)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько глав индексировать за одну транзакцию'
+        )
+
+    def handle(self, *args, **options):
+        indexed = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано глав: {indexed}'))
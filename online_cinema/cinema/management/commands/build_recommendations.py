@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cinema.recommendations import build_similarity, save_index
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает индекс похожих глав по просмотрам, плейлистам и оценкам (запускать по cron раз в сутки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=50,
+            help='Сколько соседей хранить для каждой главы'
+        )
+        parser.add_argument(
+            '--block-size',
+            type=int,
+            default=1024,
+            help='Сколько строк матрицы сходства считать за один блок'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100_000,
+            help='Размер пачки при чтении взаимодействий из БД'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        chapter_ids, neighbors, scores = build_similarity(
+            top_k=options['top_k'],
+            block_size=options['block_size'],
+            chunk_size=options['chunk_size'],
+        )
+        path = save_index(settings.RECOMMENDER_DIR, chapter_ids, neighbors, scores)
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс построен: глав {len(chapter_ids)}, {path} за {time.monotonic() - started:.1f} с'
+        ))
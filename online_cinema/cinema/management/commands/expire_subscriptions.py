@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from cinema.subscription_expiry import expire_subscriptions
+
+
+class Command(BaseCommand):
+    help = 'Гасит истёкшие подписки пачками (запускать по расписанию, например раз в 10 минут)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки для одного UPDATE (по умолчанию: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        stats = expire_subscriptions(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Погашено подписок: {stats['expired']} (пачек: {stats['batches']}, пользователей: {stats['users']})"
+        ))
+        self.stdout.write(
+            f"Ждут автопродления: {stats['renewal_due']}, в льготном периоде: {stats['in_grace']}, "
+            f"время: {stats['duration']} с"
+        )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from cinema.models import Episode
+from cinema.video_packaging import PackagingError, package_episode
+
+
+class Command(BaseCommand):
+    help = 'Нарезает видео эпизодов на HLS-сегменты (запускать по cron или вручную после загрузки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--episode',
+            type=int,
+            action='append',
+            help='ID эпизода (можно указать несколько раз)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перепаковать уже нарезанные эпизоды'
+        )
+        parser.add_argument(
+            '--segment-seconds',
+            type=int,
+            default=None,
+            help='Длительность сегмента в секундах (по умолчанию HLS_SEGMENT_SECONDS)'
+        )
+
+    def handle(self, *args, **options):
+        episodes = Episode.objects.exclude(video_file='').exclude(video_file__isnull=True)
+        if options['episode']:
+            episodes = episodes.filter(id__in=options['episode'])
+        if not options['force']:
+            episodes = episodes.filter(hls_manifest__isnull=True)
+
+        packaged = failed = 0
+        for episode in episodes.iterator():
+            try:
+                manifest = package_episode(episode, options['segment_seconds'])
+            except PackagingError as e:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f'Эпизод {episode.id}: {e}'))
+                continue
+            packaged += 1
+            self.stdout.write(f'Эпизод {episode.id}: {manifest}')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово: нарезано {packaged}, ошибок {failed}'))
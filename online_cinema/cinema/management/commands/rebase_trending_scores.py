@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from cinema.trending import rebase
+
+
+class Command(BaseCommand):
+    help = 'Переносит точку отсчёта трендовых рейтингов на текущий момент (запускать раз в неделю)'
+
+    def handle(self, *args, **options):
+        rebase()
+        self.stdout.write(self.style.SUCCESS('Точки отсчёта трендов обновлены'))
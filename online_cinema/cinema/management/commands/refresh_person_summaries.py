@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from cinema.filmography import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводки фильмографии всех персон (первичное заполнение или сверка)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько персон пересчитывать за один проход'
+        )
+
+    def handle(self, *args, **options):
+        refreshed = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано сводок: {refreshed}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from cinema.playlist_discovery import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинг и жанры всех плейлистов (запускать по cron раз в сутки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько плейлистов пересчитывать за один проход'
+        )
+
+    def handle(self, *args, **options):
+        refreshed = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано плейлистов: {refreshed}'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from cinema.rating_stats import refresh_prior
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает среднюю оценку каталога и взвешенный рейтинг всех глав (запускать периодически)'
+
+    def handle(self, *args, **options):
+        prior = refresh_prior()
+        self.stdout.write(self.style.SUCCESS(
+            f'Средняя оценка каталога: {prior.mean:.3f} по {prior.rating_count} оценкам; взвешенный рейтинг глав обновлён'
+        ))
@@ -0,0 +1,46 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cinema.subscription_renewal import renew_subscriptions
+
+
+class Command(BaseCommand):
+    help = 'Продлевает подписки с автопродлением и списывает оплату (ночной прогон)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--run-key',
+            default=None,
+            help='Ключ прогона; повторный запуск с тем же ключом продолжает прогон (по умолчанию: renewal-<дата>)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Размер пачки (по умолчанию: 500)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.SUBSCRIPTION_RENEWAL_WORKERS,
+            help='Сколько пачек обрабатывать параллельно'
+        )
+        parser.add_argument(
+            '--within-hours',
+            type=int,
+            default=24,
+            help='Продлевать подписки, заканчивающиеся в ближайшие N часов (по умолчанию: 24)'
+        )
+
+    def handle(self, *args, **options):
+        totals = renew_subscriptions(
+            run_key=options['run_key'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            within=datetime.timedelta(hours=options['within_hours']),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Продлено: {totals['succeeded']}, неудачных списаний: {totals['failed']}"
+        ))
@@ -0,0 +1,46 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cinema.view_events import drop_expired_partitions, rollup_day, view_event_log
+
+
+class Command(BaseCommand):
+    help = 'Считает дневные агрегаты просмотров по главам и жанрам из журнала событий (раз в сутки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            default=None,
+            help='День в формате YYYY-MM-DD (по умолчанию: вчера)'
+        )
+        parser.add_argument(
+            '--no-backfill',
+            action='store_true',
+            help='Не обновлять Chapter.view_count'
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='После подсчёта удалить партиции старше VIEW_EVENTS_RETENTION_DAYS'
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('Дата должна быть в формате YYYY-MM-DD')
+        else:
+            day = timezone.now().date() - datetime.timedelta(days=1)
+
+        view_event_log.flush()
+        stats = rollup_day(day, backfill_view_count=not options['no_backfill'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{day}: событий {stats['events']}, глав {stats['chapters']}, жанров {stats['genres']}"
+        ))
+
+        if options['prune']:
+            dropped = drop_expired_partitions()
+            self.stdout.write(f'Удалено партиций: {len(dropped)}')
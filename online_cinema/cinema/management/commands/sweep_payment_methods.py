@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from cinema.payment_methods import recompute_valid_until, sweep_expired_payment_methods
+
+
+class Command(BaseCommand):
+    help = 'Помечает истёкшие способы оплаты и обновляет основной способ оплаты пользователей (перед автопродлением)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recompute',
+            action='store_true',
+            help='Сначала пересчитать valid_until всех способов оплаты по сроку действия карты'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки (по умолчанию: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        if options['recompute']:
+            updated = recompute_valid_until(batch_size=options['batch_size'])
+            self.stdout.write(f'Пересчитано valid_until: {updated}')
+
+        stats = sweep_expired_payment_methods(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Истёкших способов оплаты: {stats['expired']} (пачек: {stats['batches']}, пользователей: {stats['users']})"
+        ))
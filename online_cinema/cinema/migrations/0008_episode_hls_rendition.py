@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-19 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0007_testmodel'),
+    ]
+
+    operations = [
+        # Первые две операции к HLS не относятся: это расхождения моделей и миграций, оставшиеся
+        # в исходном дереве (TestModel уже удалена из models.py, а unique_together у ChapterPersonRole
+        # изменён без миграции). makemigrations добавил их в первую же новую миграцию; отдельный файл
+        # с номером 0007 сломал бы линейную нумерацию
+        migrations.DeleteModel(
+            name='TestModel',
+        ),
+        migrations.AlterUniqueTogether(
+            name='chapterpersonrole',
+            unique_together={('chapter', 'person', 'role')},
+        ),
+        migrations.AddField(
+            model_name='episode',
+            name='hls_manifest',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, verbose_name='HLS-манифест'),
+        ),
+        migrations.AddField(
+            model_name='episode',
+            name='packaged_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата нарезки'),
+        ),
+    ]
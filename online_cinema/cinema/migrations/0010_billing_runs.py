@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-19 11:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0009_usersubscription_active_end_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='Ключ прогона')),
+                ('status', models.CharField(choices=[('running', 'Выполняется'), ('finished', 'Завершён'), ('failed', 'Ошибка')], default='running', max_length=20, verbose_name='Статус')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='Начат')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершён')),
+                ('succeeded_count', models.PositiveIntegerField(default=0, verbose_name='Успешных списаний')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Неудачных списаний')),
+            ],
+            options={
+                'verbose_name': 'Прогон автопродления',
+                'verbose_name_plural': 'Прогоны автопродления',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RenewalCharge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=100, unique=True, verbose_name='Ключ идемпотентности')),
+                ('period_end', models.DateTimeField(verbose_name='Продлеваемый период до')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Сумма (USD)')),
+                ('status', models.CharField(choices=[('pending', 'В обработке'), ('succeeded', 'Успешно'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('provider_charge_id', models.CharField(blank=True, max_length=255, null=True, verbose_name='ID списания у провайдера')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('payment_method', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='renewal_charges', to='cinema.userpaymentmethod', verbose_name='Способ оплаты')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='charges', to='cinema.billingrun', verbose_name='Прогон')),
+                ('user_subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renewal_charges', to='cinema.usersubscription', verbose_name='Подписка пользователя')),
+            ],
+            options={
+                'verbose_name': 'Списание за продление',
+                'verbose_name_plural': 'Списания за продление',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
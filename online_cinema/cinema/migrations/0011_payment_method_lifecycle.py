@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 11:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0010_billing_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='default_payment_method',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='cinema.userpaymentmethod', verbose_name='Основной способ оплаты'),
+        ),
+        migrations.AddField(
+            model_name='userpaymentmethod',
+            name='is_expired',
+            field=models.BooleanField(default=False, verbose_name='Истёк'),
+        ),
+        migrations.AddIndex(
+            model_name='userpaymentmethod',
+            index=models.Index(fields=['is_expired', 'valid_until'], name='paymethod_expiry_idx'),
+        ),
+    ]
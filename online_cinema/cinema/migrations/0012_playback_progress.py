@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-19 11:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0011_payment_method_lifecycle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaybackProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position_seconds', models.PositiveIntegerField(default=0, verbose_name='Позиция (сек)')),
+                ('is_finished', models.BooleanField(default=False, verbose_name='Досмотрен')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Обновлено')),
+                ('episode', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playback_progress', to='cinema.episode', verbose_name='Эпизод')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playback_progress', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Прогресс просмотра',
+                'verbose_name_plural': 'Прогресс просмотра',
+                'ordering': ['-updated_at'],
+                'indexes': [models.Index(fields=['user', 'is_finished', '-updated_at'], name='playback_continue_idx')],
+                'unique_together': {('user', 'episode')},
+            },
+        ),
+    ]
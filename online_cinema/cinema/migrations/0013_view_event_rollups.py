@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-19 11:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0012_playback_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterDailyViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотры')),
+                ('unique_viewers', models.PositiveIntegerField(default=0, verbose_name='Уникальные зрители')),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='cinema.chapter', verbose_name='Глава')),
+            ],
+            options={
+                'verbose_name': 'Просмотры главы за день',
+                'verbose_name_plural': 'Просмотры глав по дням',
+                'ordering': ['-date', '-views'],
+                'indexes': [models.Index(fields=['date', '-views'], name='chapter_daily_views_idx')],
+                'unique_together': {('chapter', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GenreDailyViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотры')),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='cinema.genre', verbose_name='Жанр')),
+            ],
+            options={
+                'verbose_name': 'Просмотры жанра за день',
+                'verbose_name_plural': 'Просмотры жанров по дням',
+                'ordering': ['-date', '-views'],
+                'unique_together': {('genre', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-19 11:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0013_view_event_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=10, unique=True, verbose_name='Окно')),
+                ('epoch', models.DateTimeField(verbose_name='Точка отсчёта')),
+            ],
+            options={
+                'verbose_name': 'Точка отсчёта трендов',
+                'verbose_name_plural': 'Точки отсчёта трендов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ChapterTrendingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('24h', '24 часа'), ('7d', '7 дней'), ('30d', '30 дней')], max_length=10, verbose_name='Окно')),
+                ('score', models.FloatField(default=0.0, verbose_name='Очки')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_scores', to='cinema.chapter', verbose_name='Глава')),
+            ],
+            options={
+                'verbose_name': 'Трендовый рейтинг главы',
+                'verbose_name_plural': 'Трендовые рейтинги глав',
+                'indexes': [models.Index(fields=['window', '-score'], name='chapter_trending_idx')],
+                'unique_together': {('chapter', 'window')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-19 11:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0014_chapter_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterSignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('signature', models.BinaryField(verbose_name='MinHash-сигнатура')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('chapter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='content_signature', to='cinema.chapter', verbose_name='Глава')),
+            ],
+            options={
+                'verbose_name': 'Сигнатура главы',
+                'verbose_name_plural': 'Сигнатуры глав',
+            },
+        ),
+        migrations.CreateModel(
+            name='ChapterLSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField(verbose_name='Полоса')),
+                ('bucket', models.BigIntegerField(verbose_name='Корзина')),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='cinema.chapter', verbose_name='Глава')),
+            ],
+            options={
+                'verbose_name': 'LSH-корзина главы',
+                'verbose_name_plural': 'LSH-корзины глав',
+                'indexes': [models.Index(fields=['bucket'], name='chapter_lsh_bucket_idx')],
+                'unique_together': {('chapter', 'band')},
+            },
+        ),
+    ]
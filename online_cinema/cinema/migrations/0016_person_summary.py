@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-19 11:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0015_chapter_content_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonSummary',
+            fields=[
+                ('person', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='cinema.person', verbose_name='Персона')),
+                ('chapter_count', models.PositiveIntegerField(default=0, verbose_name='Количество глав')),
+                ('rating_sum', models.PositiveBigIntegerField(default=0, verbose_name='Сумма оценок')),
+                ('rating_count', models.PositiveIntegerField(default=0, verbose_name='Количество оценок')),
+                ('first_release', models.DateField(blank=True, null=True, verbose_name='Первый релиз')),
+                ('last_release', models.DateField(blank=True, null=True, verbose_name='Последний релиз')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Сводка по персоне',
+                'verbose_name_plural': 'Сводки по персонам',
+            },
+        ),
+    ]
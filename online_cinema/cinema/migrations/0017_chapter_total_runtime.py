@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 11:52
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+
+
+def fill_total_runtime(apps, schema_editor):
+    Chapter = apps.get_model('cinema', 'Chapter')
+    Episode = apps.get_model('cinema', 'Episode')
+    runtime = Episode.objects.filter(chapter=OuterRef('pk')).values('chapter').annotate(total=Sum('duration')).values('total')
+    Chapter.objects.update(total_runtime=Subquery(runtime))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0016_person_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='total_runtime',
+            field=models.DurationField(blank=True, editable=False, null=True, verbose_name='Общая длительность'),
+        ),
+        migrations.RunPython(fill_total_runtime, migrations.RunPython.noop),
+    ]
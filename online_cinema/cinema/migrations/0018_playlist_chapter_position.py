@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+def fill_positions(apps, schema_editor):
+    PlaylistChapter = apps.get_model('cinema', 'PlaylistChapter')
+    entries = []
+    playlist_id, position = None, 0
+    for entry in PlaylistChapter.objects.order_by('playlist_id', '-added_at', 'id').only('id', 'playlist_id'):
+        if entry.playlist_id != playlist_id:
+            playlist_id, position = entry.playlist_id, 0
+        position += 1024
+        entry.position = position
+        entries.append(entry)
+    PlaylistChapter.objects.bulk_update(entries, ['position'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0017_chapter_total_runtime'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='playlistchapter',
+            options={'ordering': ['position', 'id'], 'verbose_name': 'Глава в плейлисте', 'verbose_name_plural': 'Главы в плейлистах'},
+        ),
+        migrations.AddField(
+            model_name='playlistchapter',
+            name='position',
+            field=models.BigIntegerField(default=0, verbose_name='Позиция'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_positions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='playlistchapter',
+            index=models.Index(fields=['playlist', 'position'], name='playlist_chapter_pos_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2 on 2026-10-19 12:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0018_playlist_chapter_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaylistRanking',
+            fields=[
+                ('playlist', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='cinema.playlist', verbose_name='Плейлист')),
+                ('is_public', models.BooleanField(default=False, verbose_name='Публичный')),
+                ('follower_count', models.PositiveIntegerField(default=0, verbose_name='Подписчики')),
+                ('chapter_count', models.PositiveIntegerField(default=0, verbose_name='Количество глав')),
+                ('average_rating', models.FloatField(blank=True, null=True, verbose_name='Средняя оценка глав')),
+                ('score', models.FloatField(default=0.0, verbose_name='Очки')),
+                ('refreshed_at', models.DateTimeField(auto_now=True, verbose_name='Пересчитано')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг плейлиста',
+                'verbose_name_plural': 'Рейтинги плейлистов',
+                'indexes': [models.Index(condition=models.Q(('is_public', True)), fields=['-score'], name='playlist_rank_public_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PlaylistFollow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата подписки')),
+                ('playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='follows', to='cinema.playlist', verbose_name='Плейлист')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='followed_playlists', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Подписка на плейлист',
+                'verbose_name_plural': 'Подписки на плейлисты',
+                'unique_together': {('user', 'playlist')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PlaylistGenre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chapter_count', models.PositiveIntegerField(default=0, verbose_name='Глав жанра')),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='playlist_set', to='cinema.genre', verbose_name='Жанр')),
+                ('playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='genre_set', to='cinema.playlist', verbose_name='Плейлист')),
+            ],
+            options={
+                'verbose_name': 'Жанр плейлиста',
+                'verbose_name_plural': 'Жанры плейлистов',
+                'unique_together': {('genre', 'playlist')},
+            },
+        ),
+    ]
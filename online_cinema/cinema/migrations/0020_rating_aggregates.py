@@ -0,0 +1,56 @@
+# Generated by Django 5.2 on 2026-10-19 12:01
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def clamp_rating_scores(apps, schema_editor):
+    # Старые оценки вне 1..10 (их раньше ничего не ограничивало) прижимаем к границам, иначе ограничение не создать
+    Rating = apps.get_model('cinema', 'Rating')
+    Rating.objects.filter(score__gt=10).update(score=10)
+    Rating.objects.filter(score__lt=1).update(score=1)
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Chapter = apps.get_model('cinema', 'Chapter')
+    Rating = apps.get_model('cinema', 'Rating')
+    chapters = []
+    for row in Rating.objects.filter(chapter__isnull=False, score__isnull=False).values('chapter_id').annotate(
+        total=Sum('score'), count=Count('id')
+    ):
+        chapters.append(Chapter(
+            pk=row['chapter_id'], rating_sum=row['total'], rating_count=row['count'], rating_cache=row['total'] / row['count']
+        ))
+    Chapter.objects.bulk_update(chapters, ['rating_sum', 'rating_count', 'rating_cache'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0019_playlist_discovery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество оценок'),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='rating_sum',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='score',
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10)], verbose_name='Оценка'),
+        ),
+        migrations.RunPython(clamp_rating_scores, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='rating',
+            constraint=models.CheckConstraint(condition=models.Q(('score__isnull', True), models.Q(('score__gte', 1), ('score__lte', 10)), _connector='OR'), name='rating_score_range'),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-19 12:03
+
+import django.db.models.deletion
+from collections import defaultdict
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_histograms(apps, schema_editor):
+    Rating = apps.get_model('cinema', 'Rating')
+    ChapterRatingHistogram = apps.get_model('cinema', 'ChapterRatingHistogram')
+    counts = defaultdict(dict)
+    rows = (
+        Rating.objects.filter(chapter__isnull=False, score__isnull=False)
+        .values_list('chapter_id', 'score').annotate(total=Count('id')).order_by()
+    )
+    for chapter_id, score, total in rows:
+        counts[chapter_id][f'score_{score}'] = total
+    ChapterRatingHistogram.objects.bulk_create(
+        [ChapterRatingHistogram(chapter_id=chapter_id, **fields) for chapter_id, fields in counts.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0020_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterRatingHistogram',
+            fields=[
+                ('chapter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_histogram', serialize=False, to='cinema.chapter', verbose_name='Глава')),
+                ('score_1', models.PositiveIntegerField(default=0, verbose_name='1')),
+                ('score_2', models.PositiveIntegerField(default=0, verbose_name='2')),
+                ('score_3', models.PositiveIntegerField(default=0, verbose_name='3')),
+                ('score_4', models.PositiveIntegerField(default=0, verbose_name='4')),
+                ('score_5', models.PositiveIntegerField(default=0, verbose_name='5')),
+                ('score_6', models.PositiveIntegerField(default=0, verbose_name='6')),
+                ('score_7', models.PositiveIntegerField(default=0, verbose_name='7')),
+                ('score_8', models.PositiveIntegerField(default=0, verbose_name='8')),
+                ('score_9', models.PositiveIntegerField(default=0, verbose_name='9')),
+                ('score_10', models.PositiveIntegerField(default=0, verbose_name='10')),
+            ],
+            options={
+                'verbose_name': 'Гистограмма оценок',
+                'verbose_name_plural': 'Гистограммы оценок',
+            },
+        ),
+        migrations.RunPython(fill_histograms, migrations.RunPython.noop),
+    ]
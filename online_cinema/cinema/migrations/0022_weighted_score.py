@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-19 12:06
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, Sum, Value
+from django.db.models.functions import Cast
+
+PRIOR_WEIGHT = 10
+
+
+def fill_weighted_score(apps, schema_editor):
+    Chapter = apps.get_model('cinema', 'Chapter')
+    RatingPrior = apps.get_model('cinema', 'RatingPrior')
+    totals = Chapter.objects.aggregate(total=Sum('rating_sum'), count=Sum('rating_count'))
+    count = totals['count'] or 0
+    mean = totals['total'] / count if count else 0.0
+    RatingPrior.objects.create(pk=1, mean=mean, rating_count=count)
+    Chapter.objects.filter(rating_count__gt=0).update(weighted_score=(
+        (Cast(F('rating_sum'), FloatField()) + Value(mean * PRIOR_WEIGHT))
+        / (Cast(F('rating_count'), FloatField()) + Value(float(PRIOR_WEIGHT)))
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0021_chapter_rating_histogram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingPrior',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mean', models.FloatField(default=0.0, verbose_name='Средняя оценка')),
+                ('rating_count', models.PositiveBigIntegerField(default=0, verbose_name='Количество оценок')),
+                ('refreshed_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Априорная оценка',
+                'verbose_name_plural': 'Априорные оценки',
+            },
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='weighted_score',
+            field=models.FloatField(db_index=True, default=0.0, editable=False, verbose_name='Взвешенный рейтинг'),
+        ),
+        migrations.RunPython(fill_weighted_score, migrations.RunPython.noop),
+    ]
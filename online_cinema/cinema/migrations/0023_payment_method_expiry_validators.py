@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 12:33
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0022_weighted_score'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userpaymentmethod',
+            name='card_expiry_month',
+            field=models.IntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(12)], verbose_name='Месяц истечения'),
+        ),
+        migrations.AlterField(
+            model_name='userpaymentmethod',
+            name='card_expiry_year',
+            field=models.IntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(2100)], verbose_name='Год истечения'),
+        ),
+    ]
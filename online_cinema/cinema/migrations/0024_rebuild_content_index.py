@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def drop_stale_buckets(apps, schema_editor):
+    # Корзины посчитаны по старой нарезке сигнатуры (32×2) и с новыми ключами не совпадут никогда.
+    # Сигнатуры тоже устарели (в них были тип и возрастной рейтинг): после миграции нужен
+    # manage.py build_content_index
+    apps.get_model('cinema', 'ChapterLSHBucket').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0023_payment_method_expiry_validators'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_stale_buckets, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,17 @@
 import re
 import datetime
+from functools import partial
 from django.db import models
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.utils import timezone
-from django.utils.text import slugify
 from django.db.models import Avg
 
+from .slugs import save_with_slug
+
 
 
 # Пользователь
@@ -16,6 +19,16 @@ class User(AbstractUser):
     profile_pic = models.ImageField(_('Фото профиля'), upload_to='user_profile_pics/', blank=True, null=True)
     description = models.TextField(_('Описание'), blank=True, null=True)
     login_code = models.CharField(_('Код входа'), max_length=255, blank=True, null=True)  # поле для входа по коду
+    # Лучший действующий способ оплаты; пересчитывается при изменении способов оплаты и чисткой истёкших
+    default_payment_method = models.ForeignKey(
+        'UserPaymentMethod',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name=_('Основной способ оплаты'),
+    )
 
     groups = models.ManyToManyField(
         Group,
@@ -60,15 +73,36 @@ class UserPaymentMethod(models.Model):
     provider_id = models.CharField(_('ID провайдера'), max_length=255)
     masked_card_number = models.CharField(_('Маска номера карты'), max_length=19, blank=True, null=True)
     card_brand = models.CharField(_('Платежная система'), max_length=50, blank=True, null=True)
-    card_expiry_month = models.IntegerField(_('Месяц истечения'), blank=True, null=True)
-    card_expiry_year = models.IntegerField(_('Год истечения'), blank=True, null=True)
+    card_expiry_month = models.IntegerField(
+        _('Месяц истечения'), blank=True, null=True, validators=[MinValueValidator(1), MaxValueValidator(12)]
+    )
+    # Двузначный год (25) или полный (2025); compute_valid_until прибавляет к двузначному 2000
+    card_expiry_year = models.IntegerField(
+        _('Год истечения'), blank=True, null=True, validators=[MinValueValidator(0), MaxValueValidator(2100)]
+    )
     added_at = models.DateTimeField(_('Добавлено'), auto_now_add=True)
     valid_until = models.DateTimeField(_('Действительно до'), blank=True, null=True)
+    is_expired = models.BooleanField(_('Истёк'), default=False)
+
+    def compute_valid_until(self):
+        """Карта действует до конца месяца истечения, остальные способы — 5 лет с добавления"""
+        if self.card_expiry_month and self.card_expiry_year:
+            year = self.card_expiry_year
+            if year < 100:
+                year += 2000
+            if self.card_expiry_month == 12:
+                return datetime.datetime(year + 1, 1, 1, tzinfo=datetime.timezone.utc)
+            return datetime.datetime(year, self.card_expiry_month + 1, 1, tzinfo=datetime.timezone.utc)
+        return self.added_at + datetime.timedelta(days=5*365)
+
+    def is_usable(self):
+        return not self.is_expired and (self.valid_until is None or self.valid_until > timezone.now())
 
     def save(self, *args, **kwargs):
         if not self.added_at:
             self.added_at = timezone.now()
-        self.valid_until = self.added_at + datetime.timedelta(days=5*365)
+        self.valid_until = self.compute_valid_until()
+        self.is_expired = self.valid_until <= timezone.now()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -77,6 +111,9 @@ class UserPaymentMethod(models.Model):
     class Meta:
         verbose_name = _('Способ оплаты')
         verbose_name_plural = _('Способы оплаты')
+        indexes = [
+            models.Index(fields=['is_expired', 'valid_until'], name='paymethod_expiry_idx'),
+        ]
 
 
 # 2. Subscription
@@ -101,8 +138,25 @@ class UserSubscriptionManager(models.Manager):
 
     def expired(self):
         now = timezone.now()
-        return self.exclude(expiration_date__lt=now)
-    
+        return self.filter(end_date__lt=now)
+
+    def due_for_expiry(self, grace=datetime.timedelta(0)):
+        """
+        Ещё активные подписки, срок которых истёк.
+        Подпискам с автопродлением даётся grace, чтобы продление успело списать оплату.
+        """
+        now = timezone.now()
+        return self.filter(is_active=True, end_date__lt=now).filter(
+            models.Q(auto_renew=False) | models.Q(canceled_at__isnull=False) | models.Q(end_date__lt=now - grace)
+        )
+
+    def due_for_renewal(self, within=datetime.timedelta(days=1)):
+        """Активные подписки с автопродлением, которые заканчиваются в ближайшее время"""
+        return self.filter(
+            is_active=True, auto_renew=True, canceled_at__isnull=True,
+            end_date__lte=timezone.now() + within,
+        )
+
 # 3. UserSubscription
 class UserSubscription(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='subscriptions', verbose_name=_('Пользователь'))
@@ -133,6 +187,63 @@ class UserSubscription(models.Model):
     class Meta:
         verbose_name = _('Подписка пользователя')
         verbose_name_plural = _('Подписки пользователей')
+        indexes = [
+            models.Index(fields=['is_active', 'end_date'], name='usersub_active_end_idx'),
+        ]
+
+
+# 4. BillingRun (прогон автопродления)
+class BillingRun(models.Model):
+    STATUS_CHOICES = [
+        ('running', _('Выполняется')),
+        ('finished', _('Завершён')),
+        ('failed', _('Ошибка')),
+    ]
+
+    key = models.CharField(_('Ключ прогона'), max_length=100, unique=True)
+    status = models.CharField(_('Статус'), max_length=20, choices=STATUS_CHOICES, default='running')
+    started_at = models.DateTimeField(_('Начат'), auto_now_add=True)
+    finished_at = models.DateTimeField(_('Завершён'), blank=True, null=True)
+    succeeded_count = models.PositiveIntegerField(_('Успешных списаний'), default=0)
+    failed_count = models.PositiveIntegerField(_('Неудачных списаний'), default=0)
+
+    def __str__(self):
+        return f"{self.key} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = _('Прогон автопродления')
+        verbose_name_plural = _('Прогоны автопродления')
+
+
+# 5. RenewalCharge (списание за продление подписки)
+class RenewalCharge(models.Model):
+    STATUS_CHOICES = [
+        ('pending', _('В обработке')),
+        ('succeeded', _('Успешно')),
+        ('failed', _('Ошибка')),
+    ]
+
+    run = models.ForeignKey(BillingRun, on_delete=models.CASCADE, related_name='charges', verbose_name=_('Прогон'))
+    user_subscription = models.ForeignKey(UserSubscription, on_delete=models.CASCADE, related_name='renewal_charges', verbose_name=_('Подписка пользователя'))
+    payment_method = models.ForeignKey(UserPaymentMethod, on_delete=models.SET_NULL, null=True, blank=True, related_name='renewal_charges', verbose_name=_('Способ оплаты'))
+    # Один ключ на попытку списания за период: повторный прогон не может списать дважды
+    idempotency_key = models.CharField(_('Ключ идемпотентности'), max_length=100, unique=True)
+    period_end = models.DateTimeField(_('Продлеваемый период до'))
+    amount = models.DecimalField(_('Сумма (USD)'), max_digits=10, decimal_places=2)
+    status = models.CharField(_('Статус'), max_length=20, choices=STATUS_CHOICES, default='pending')
+    provider_charge_id = models.CharField(_('ID списания у провайдера'), max_length=255, blank=True, null=True)
+    error = models.TextField(_('Ошибка'), blank=True, null=True)
+    created_at = models.DateTimeField(_('Создано'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Обновлено'), auto_now=True)
+
+    def __str__(self):
+        return f"{self.idempotency_key} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = _('Списание за продление')
+        verbose_name_plural = _('Списания за продление')
 
 
 # Жанры
@@ -157,6 +268,13 @@ class Franchise(models.Model):
         return self.chapters.count()
 
     def get_chapter_overview(self):
+        # Главы, уже подгруженные через Prefetch('chapters') с сортировкой по chapter_number, — без запроса
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('chapters')
+        if prefetched is not None:
+            return [
+                {'id': chapter.id, 'chapter_number': chapter.chapter_number, 'franchise_relation': chapter.franchise_relation}
+                for chapter in prefetched
+            ]
         return list(
             self.chapters.values(
                 'id', 'chapter_number', 'franchise_relation'
@@ -202,7 +320,11 @@ class Chapter(models.Model):
     age_rating = models.PositiveIntegerField(_('Возрастной рейтинг'), blank=True, null=True)
     content_type = models.CharField(_('Тип контента'), max_length=20, choices=CONTENT_TYPE_CHOICES, blank=True, null=True)
     rating_cache = models.FloatField(_('Кэш рейтинга'), default=0.0)
+    rating_sum = models.PositiveBigIntegerField(_('Сумма оценок'), default=0, editable=False)
+    rating_count = models.PositiveIntegerField(_('Количество оценок'), default=0, editable=False)
+    weighted_score = models.FloatField(_('Взвешенный рейтинг'), default=0.0, editable=False, db_index=True)
     view_count = models.PositiveIntegerField(_('Количество просмотров'), default=0)
+    total_runtime = models.DurationField(_('Общая длительность'), blank=True, null=True, editable=False)
     poster_image = models.ImageField(_('Постер'), upload_to='chapter_posters/', blank=True, null=True)
     trailer_url = models.URLField(_('Ссылка на трейлер'), blank=True, null=True) 
     
@@ -267,6 +389,8 @@ class Episode(models.Model):
     duration = models.DurationField(_('Длительность'), blank=True, null=True)
     release_date = models.DateField(_('Дата выхода'), blank=True, null=True)
     thumbnail_img = models.ImageField(_('Превью'), upload_to='episode_thumbnail_imgs/', blank=True, null=True)
+    hls_manifest = models.CharField(_('HLS-манифест'), max_length=255, blank=True, null=True, editable=False)
+    packaged_at = models.DateTimeField(_('Дата нарезки'), blank=True, null=True, editable=False)
 
     def __str__(self):
         return f"{self.chapter.title if self.chapter else 'No Chapter'} E{self.episode_number or '?'} - {self.title}"
@@ -384,14 +508,28 @@ class Review(models.Model):
         return f"Review by {self.user.username if self.user else 'Unknown'} on {self.chapter.title if self.chapter else 'Unknown'}"
 
 
+# Оценки по шкале 1–10
+RATING_MIN_SCORE = 1
+RATING_MAX_SCORE = 10
+
+
 class Rating(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ratings', null=True, blank=True, verbose_name=_('Пользователь'))
     chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='ratings', null=True, blank=True, verbose_name=_('Глава'))
-    score = models.PositiveIntegerField(_('Оценка'), blank=True, null=True)
+    score = models.PositiveIntegerField(
+        _('Оценка'), blank=True, null=True,
+        validators=[MinValueValidator(RATING_MIN_SCORE), MaxValueValidator(RATING_MAX_SCORE)],
+    )
     created_at = models.DateTimeField(_('Дата создания'), auto_now_add=True)
 
     class Meta:
         unique_together = ['user', 'chapter']
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(score__isnull=True) | models.Q(score__gte=RATING_MIN_SCORE, score__lte=RATING_MAX_SCORE),
+                name='rating_score_range',
+            ),
+        ]
         verbose_name = _('Оценка')
         verbose_name_plural = _('Оценки')
 
@@ -416,7 +554,7 @@ class Playlist(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.title or 'untitled-playlist')
+            return save_with_slug(self, partial(super().save, *args, **kwargs), 'playlist')
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -433,13 +571,26 @@ class PlaylistChapter(models.Model):
     chapter = models.ForeignKey('Chapter', related_name='playlist_entries', on_delete=models.CASCADE, null=True, blank=True, verbose_name=_('Глава'))
     added_at = models.DateTimeField(_('Добавлено'), auto_now_add=True)
     note = models.TextField(_('Заметка'), blank=True, null=True)
+    # Позиции идут с шагом POSITION_GAP: перемещение занимает середину промежутка и меняет одну строку
+    position = models.BigIntegerField(_('Позиция'))
+
+    POSITION_GAP = 1024
+
+    def save(self, *args, **kwargs):
+        if self.position is None:
+            last = PlaylistChapter.objects.filter(playlist_id=self.playlist_id).aggregate(last=models.Max('position'))['last']
+            self.position = (last or 0) + self.POSITION_GAP
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.chapter.title if self.chapter else 'Unknown Chapter'} in {self.playlist.title if self.playlist else 'Unknown Playlist'}"
 
     class Meta:
         unique_together = ['playlist', 'chapter']
-        ordering = ['-added_at']
+        ordering = ['position', 'id']
+        indexes = [
+            models.Index(fields=['playlist', 'position'], name='playlist_chapter_pos_idx'),
+        ]
         verbose_name = _('Глава в плейлисте')
         verbose_name_plural = _('Главы в плейлистах')
 
@@ -456,4 +607,271 @@ class ViewHistory(models.Model):
         verbose_name_plural = _('Истории просмотров')
 
     def __str__(self):
-        return f"{self.user.username if self.user else 'Unknown'} viewed {self.chapter.title if self.chapter else 'Unknown'} at {self.viewed_at}"
\ No newline at end of file
+        return f"{self.user.username if self.user else 'Unknown'} viewed {self.chapter.title if self.chapter else 'Unknown'} at {self.viewed_at}"
+
+# 4. PlaybackProgress (Позиция просмотра эпизода)
+class PlaybackProgress(models.Model):
+    user = models.ForeignKey(User, related_name='playback_progress', on_delete=models.CASCADE, verbose_name=_('Пользователь'))
+    episode = models.ForeignKey(Episode, related_name='playback_progress', on_delete=models.CASCADE, verbose_name=_('Эпизод'))
+    position_seconds = models.PositiveIntegerField(_('Позиция (сек)'), default=0)
+    is_finished = models.BooleanField(_('Досмотрен'), default=False)
+    # Не auto_now: записи обновляются пачками через bulk_create(update_conflicts=True)
+    updated_at = models.DateTimeField(_('Обновлено'), default=timezone.now)
+
+    class Meta:
+        unique_together = ['user', 'episode']
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user', 'is_finished', '-updated_at'], name='playback_continue_idx'),
+        ]
+        verbose_name = _('Прогресс просмотра')
+        verbose_name_plural = _('Прогресс просмотра')
+
+    def __str__(self):
+        return f"{self.user.username} at {self.position_seconds}s of {self.episode}"
+
+
+# 5. Дневные агрегаты журнала просмотров (manage.py rollup_view_events)
+class ChapterDailyViews(models.Model):
+    chapter = models.ForeignKey(Chapter, related_name='daily_views', on_delete=models.CASCADE, verbose_name=_('Глава'))
+    date = models.DateField(_('Дата'))
+    views = models.PositiveIntegerField(_('Просмотры'), default=0)
+    unique_viewers = models.PositiveIntegerField(_('Уникальные зрители'), default=0)
+
+    class Meta:
+        unique_together = ['chapter', 'date']
+        ordering = ['-date', '-views']
+        indexes = [
+            models.Index(fields=['date', '-views'], name='chapter_daily_views_idx'),
+        ]
+        verbose_name = _('Просмотры главы за день')
+        verbose_name_plural = _('Просмотры глав по дням')
+
+    def __str__(self):
+        return f"{self.chapter} {self.date}: {self.views}"
+
+
+class GenreDailyViews(models.Model):
+    genre = models.ForeignKey(Genre, related_name='daily_views', on_delete=models.CASCADE, verbose_name=_('Жанр'))
+    date = models.DateField(_('Дата'))
+    views = models.PositiveIntegerField(_('Просмотры'), default=0)
+
+    class Meta:
+        unique_together = ['genre', 'date']
+        ordering = ['-date', '-views']
+        verbose_name = _('Просмотры жанра за день')
+        verbose_name_plural = _('Просмотры жанров по дням')
+
+    def __str__(self):
+        return f"{self.genre} {self.date}: {self.views}"
+
+
+# 6. Трендовые рейтинги глав (затухающие во времени счётчики)
+class TrendingEpoch(models.Model):
+    window = models.CharField(_('Окно'), max_length=10, unique=True)
+    epoch = models.DateTimeField(_('Точка отсчёта'))
+
+    class Meta:
+        verbose_name = _('Точка отсчёта трендов')
+        verbose_name_plural = _('Точки отсчёта трендов')
+
+    def __str__(self):
+        return f"{self.window}: {self.epoch}"
+
+
+class ChapterTrendingScore(models.Model):
+    WINDOW_CHOICES = [
+        ('24h', _('24 часа')),
+        ('7d', _('7 дней')),
+        ('30d', _('30 дней')),
+    ]
+
+    chapter = models.ForeignKey(Chapter, related_name='trending_scores', on_delete=models.CASCADE, verbose_name=_('Глава'))
+    window = models.CharField(_('Окно'), max_length=10, choices=WINDOW_CHOICES)
+    score = models.FloatField(_('Очки'), default=0.0)
+    updated_at = models.DateTimeField(_('Обновлено'), auto_now=True)
+
+    class Meta:
+        unique_together = ['chapter', 'window']
+        indexes = [
+            models.Index(fields=['window', '-score'], name='chapter_trending_idx'),
+        ]
+        verbose_name = _('Трендовый рейтинг главы')
+        verbose_name_plural = _('Трендовые рейтинги глав')
+
+    def __str__(self):
+        return f"{self.chapter} [{self.window}]: {self.score:.2f}"
+
+
+# 7. Контентный индекс похожих глав (MinHash-сигнатуры и LSH-корзины)
+class ChapterSignature(models.Model):
+    chapter = models.OneToOneField(Chapter, related_name='content_signature', on_delete=models.CASCADE, verbose_name=_('Глава'))
+    signature = models.BinaryField(_('MinHash-сигнатура'))
+    updated_at = models.DateTimeField(_('Обновлено'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Сигнатура главы')
+        verbose_name_plural = _('Сигнатуры глав')
+
+    def __str__(self):
+        return f"Signature of {self.chapter}"
+
+
+class ChapterLSHBucket(models.Model):
+    chapter = models.ForeignKey(Chapter, related_name='lsh_buckets', on_delete=models.CASCADE, verbose_name=_('Глава'))
+    band = models.PositiveSmallIntegerField(_('Полоса'))
+    bucket = models.BigIntegerField(_('Корзина'))
+
+    class Meta:
+        unique_together = ['chapter', 'band']
+        indexes = [
+            models.Index(fields=['bucket'], name='chapter_lsh_bucket_idx'),
+        ]
+        verbose_name = _('LSH-корзина главы')
+        verbose_name_plural = _('LSH-корзины глав')
+
+    def __str__(self):
+        return f"{self.chapter} [{self.band}]: {self.bucket}"
+
+
+# 8. Сводка по фильмографии персоны (cinema.filmography)
+class PersonSummary(models.Model):
+    person = models.OneToOneField(Person, related_name='summary', on_delete=models.CASCADE, primary_key=True, verbose_name=_('Персона'))
+    chapter_count = models.PositiveIntegerField(_('Количество глав'), default=0)
+    rating_sum = models.PositiveBigIntegerField(_('Сумма оценок'), default=0)
+    rating_count = models.PositiveIntegerField(_('Количество оценок'), default=0)
+    first_release = models.DateField(_('Первый релиз'), blank=True, null=True)
+    last_release = models.DateField(_('Последний релиз'), blank=True, null=True)
+    updated_at = models.DateTimeField(_('Обновлено'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Сводка по персоне')
+        verbose_name_plural = _('Сводки по персонам')
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    def __str__(self):
+        return f"{self.person}: {self.chapter_count}"
+
+
+# 9. Подписки на плейлисты и рейтинг публичных плейлистов (cinema.playlist_discovery)
+class PlaylistFollow(models.Model):
+    user = models.ForeignKey(User, related_name='followed_playlists', on_delete=models.CASCADE, verbose_name=_('Пользователь'))
+    playlist = models.ForeignKey(Playlist, related_name='follows', on_delete=models.CASCADE, verbose_name=_('Плейлист'))
+    created_at = models.DateTimeField(_('Дата подписки'), auto_now_add=True)
+
+    class Meta:
+        unique_together = ['user', 'playlist']
+        verbose_name = _('Подписка на плейлист')
+        verbose_name_plural = _('Подписки на плейлисты')
+
+    def __str__(self):
+        return f"{self.user} → {self.playlist}"
+
+
+class PlaylistRanking(models.Model):
+    playlist = models.OneToOneField(Playlist, related_name='ranking', on_delete=models.CASCADE, primary_key=True, verbose_name=_('Плейлист'))
+    is_public = models.BooleanField(_('Публичный'), default=False)
+    follower_count = models.PositiveIntegerField(_('Подписчики'), default=0)
+    chapter_count = models.PositiveIntegerField(_('Количество глав'), default=0)
+    average_rating = models.FloatField(_('Средняя оценка глав'), blank=True, null=True)
+    score = models.FloatField(_('Очки'), default=0.0)
+    refreshed_at = models.DateTimeField(_('Пересчитано'), auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], condition=models.Q(is_public=True), name='playlist_rank_public_idx'),
+        ]
+        verbose_name = _('Рейтинг плейлиста')
+        verbose_name_plural = _('Рейтинги плейлистов')
+
+    def __str__(self):
+        return f"{self.playlist}: {self.score:.2f}"
+
+
+class PlaylistGenre(models.Model):
+    playlist = models.ForeignKey(Playlist, related_name='genre_set', on_delete=models.CASCADE, verbose_name=_('Плейлист'))
+    genre = models.ForeignKey(Genre, related_name='playlist_set', on_delete=models.CASCADE, verbose_name=_('Жанр'))
+    chapter_count = models.PositiveIntegerField(_('Глав жанра'), default=0)
+
+    class Meta:
+        unique_together = ['genre', 'playlist']
+        verbose_name = _('Жанр плейлиста')
+        verbose_name_plural = _('Жанры плейлистов')
+
+    def __str__(self):
+        return f"{self.playlist}: {self.genre}"
+
+
+# 10. Гистограмма оценок главы (поддерживается в cinema.ratings)
+class ChapterRatingHistogram(models.Model):
+    chapter = models.OneToOneField(Chapter, related_name='rating_histogram', on_delete=models.CASCADE, primary_key=True, verbose_name=_('Глава'))
+    score_1 = models.PositiveIntegerField('1', default=0)
+    score_2 = models.PositiveIntegerField('2', default=0)
+    score_3 = models.PositiveIntegerField('3', default=0)
+    score_4 = models.PositiveIntegerField('4', default=0)
+    score_5 = models.PositiveIntegerField('5', default=0)
+    score_6 = models.PositiveIntegerField('6', default=0)
+    score_7 = models.PositiveIntegerField('7', default=0)
+    score_8 = models.PositiveIntegerField('8', default=0)
+    score_9 = models.PositiveIntegerField('9', default=0)
+    score_10 = models.PositiveIntegerField('10', default=0)
+
+    SCORE_FIELDS = [f'score_{score}' for score in range(RATING_MIN_SCORE, RATING_MAX_SCORE + 1)]
+
+    class Meta:
+        verbose_name = _('Гистограмма оценок')
+        verbose_name_plural = _('Гистограммы оценок')
+
+    @property
+    def counts(self):
+        return [getattr(self, field) for field in self.SCORE_FIELDS]
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def mean(self):
+        total = self.total
+        if not total:
+            return None
+        return sum(score * count for score, count in enumerate(self.counts, start=RATING_MIN_SCORE)) / total
+
+    def median(self):
+        total = self.total
+        if not total:
+            return None
+        # Нижняя и верхняя медианы по накопленным частотам
+        lower, upper = (total - 1) // 2, total // 2
+        seen, low_value = 0, None
+        for score, count in enumerate(self.counts, start=RATING_MIN_SCORE):
+            if low_value is None and seen + count > lower:
+                low_value = score
+            if seen + count > upper:
+                return (low_value + score) / 2
+            seen += count
+
+    def bayesian_average(self, prior_mean, prior_weight):
+        """Среднее с априорным: prior_weight «виртуальных» оценок, равных prior_mean"""
+        total = self.total
+        weighted = sum(score * count for score, count in enumerate(self.counts, start=RATING_MIN_SCORE))
+        return (prior_mean * prior_weight + weighted) / (prior_weight + total) if prior_weight + total else None
+
+    def __str__(self):
+        return f"{self.chapter}: {self.counts}"
+
+
+# 11. Априорное среднее оценок каталога (одна строка; обновляется командой refresh_rating_prior)
+class RatingPrior(models.Model):
+    mean = models.FloatField(_('Средняя оценка'), default=0.0)
+    rating_count = models.PositiveBigIntegerField(_('Количество оценок'), default=0)
+    refreshed_at = models.DateTimeField(_('Обновлено'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('Априорная оценка')
+        verbose_name_plural = _('Априорные оценки')
+
+    def __str__(self):
+        return f"{self.mean:.2f} ({self.rating_count})"
@@ -0,0 +1,63 @@
+import logging
+
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import User, UserPaymentMethod
+
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_default_payment_methods(user_ids):
+    """
+    Пересчитать User.default_payment_method одним UPDATE:
+    действующий способ оплаты с самым поздним valid_until (при равенстве — последний добавленный).
+    """
+    best = UserPaymentMethod.objects.filter(
+        user_id=OuterRef('pk'), is_expired=False, valid_until__gt=timezone.now()
+    ).order_by('-valid_until', '-added_at').values('id')[:1]
+    return User.objects.filter(id__in=list(user_ids)).update(default_payment_method=Subquery(best))
+
+
+def sweep_expired_payment_methods(batch_size=1000):
+    """Пометить истёкшие способы оплаты пачками UPDATE и обновить указатели пользователей"""
+    stats = {'expired': 0, 'batches': 0, 'users': 0}
+    while True:
+        rows = list(
+            UserPaymentMethod.objects.filter(is_expired=False, valid_until__lte=timezone.now())
+            .order_by('valid_until')
+            .values_list('id', 'user_id')[:batch_size]
+        )
+        if not rows:
+            break
+
+        user_ids = {row[1] for row in rows}
+        stats['expired'] += UserPaymentMethod.objects.filter(id__in=[row[0] for row in rows]).update(is_expired=True)
+        stats['users'] += refresh_default_payment_methods(user_ids)
+        stats['batches'] += 1
+
+    logger.info('Payment method sweep: expired=%(expired)s batches=%(batches)s users=%(users)s', stats)
+    return stats
+
+
+def recompute_valid_until(batch_size=1000):
+    """
+    Пересчитать valid_until у всех способов оплаты (по сроку действия карты).
+    Нужен один раз для записей, сохранённых до появления compute_valid_until.
+    """
+    now = timezone.now()
+    last_id = 0
+    updated = 0
+    while True:
+        methods = list(UserPaymentMethod.objects.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not methods:
+            break
+        for method in methods:
+            method.valid_until = method.compute_valid_until()
+            method.is_expired = method.valid_until <= now
+        UserPaymentMethod.objects.bulk_update(methods, ['valid_until', 'is_expired'])
+        refresh_default_payment_methods({method.user_id for method in methods})
+        updated += len(methods)
+        last_id = methods[-1].id
+    return updated
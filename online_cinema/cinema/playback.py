@@ -0,0 +1,94 @@
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Episode, PlaybackProgress
+
+
+# Эпизод считается досмотренным, если позиция дошла до этой доли длительности
+FINISHED_RATIO = 0.95
+
+
+class PlaybackBuffer:
+    """
+    Буфер heartbeat-событий плеера.
+
+    Клиенты присылают позицию каждые несколько секунд; в памяти процесса хранится только
+    последняя позиция для пары (пользователь, эпизод). Буфер сбрасывается в БД одним
+    bulk upsert, когда накопилось max_pending пар или прошло flush_interval секунд.
+    """
+
+    def __init__(self, max_pending, flush_interval):
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def record(self, user_id, episode_id, position_seconds):
+        with self._lock:
+            self._pending[(user_id, episode_id)] = (position_seconds, timezone.now())
+            should_flush = (
+                len(self._pending) >= self.max_pending
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if should_flush:
+            self.flush()
+
+    def flush(self, user_id=None):
+        """Сбросить буфер в БД; с user_id — только позиции этого пользователя (остальные копятся дальше)"""
+        with self._lock:
+            if user_id is None:
+                pending, self._pending = self._pending, {}
+                self._last_flush = time.monotonic()
+            else:
+                pending = {key: self._pending.pop(key) for key in [key for key in self._pending if key[0] == user_id]}
+        if not pending:
+            return 0
+
+        try:
+            # Заодно отбрасываем несуществующие эпизоды: одна ошибка FK сорвала бы всю пачку
+            durations = dict(
+                Episode.objects.filter(id__in={episode_id for _, episode_id in pending})
+                .values_list('id', 'duration')
+            )
+            rows = [
+                PlaybackProgress(
+                    user_id=user_id,
+                    episode_id=episode_id,
+                    position_seconds=position,
+                    is_finished=is_finished(position, durations[episode_id]),
+                    updated_at=updated_at,
+                )
+                for (user_id, episode_id), (position, updated_at) in pending.items()
+                if episode_id in durations
+            ]
+            PlaybackProgress.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['user', 'episode'],
+                update_fields=['position_seconds', 'is_finished', 'updated_at'],
+            )
+        except Exception:
+            # Возвращаем события в буфер, не затирая пришедшие за время сброса
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)
+            raise
+        return len(rows)
+
+
+def is_finished(position_seconds, duration):
+    if not duration:
+        return False
+    return position_seconds >= duration.total_seconds() * FINISHED_RATIO
+
+
+playback_buffer = PlaybackBuffer(
+    max_pending=settings.PLAYBACK_FLUSH_MAX_PENDING,
+    flush_interval=settings.PLAYBACK_FLUSH_INTERVAL,
+)
+atexit.register(playback_buffer.flush)
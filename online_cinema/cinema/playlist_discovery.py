@@ -0,0 +1,116 @@
+import math
+
+from django.db import transaction
+from django.db.models import Avg, Count, Max
+
+from .models import Chapter, Playlist, PlaylistChapter, PlaylistFollow, PlaylistGenre, PlaylistRanking, Rating
+
+
+# Вклад свежести: плейлист, обновлённый на RECENCY_TAU позже, получает +1 к очкам.
+# Очки логарифмические, поэтому это то же, что умножить популярность на e^(Δt / tau):
+# свежесть «затухает» без периодического пересчёта, а порядок задаётся одним индексом по score
+RECENCY_TAU = 14 * 24 * 60 * 60
+FOLLOWER_WEIGHT = 1.0
+CHAPTER_WEIGHT = 0.5
+QUALITY_WEIGHT = 2.0
+
+
+def compute_score(follower_count, chapter_count, average_rating, active_at):
+    return (
+        FOLLOWER_WEIGHT * math.log1p(follower_count)
+        + CHAPTER_WEIGHT * math.log1p(chapter_count)
+        + QUALITY_WEIGHT * (average_rating or 0) / 10
+        + active_at.timestamp() / RECENCY_TAU
+    )
+
+
+def refresh_rankings(playlist_ids):
+    """
+    Пересчитать строки рейтинга и наборы жанров для указанных плейлистов.
+    Шесть запросов на пачку, независимо от её размера.
+    """
+    playlists = {
+        row['id']: row
+        for row in Playlist.objects.filter(id__in=playlist_ids).values('id', 'is_public', 'updated_at')
+    }
+    if not playlists:
+        return 0
+
+    chapters, last_added = {}, {}
+    for playlist_id, count, added_at in (
+        PlaylistChapter.objects.filter(playlist_id__in=playlists, chapter__isnull=False)
+        .values('playlist_id').annotate(count=Count('id'), last=Max('added_at')).values_list('playlist_id', 'count', 'last')
+    ):
+        chapters[playlist_id], last_added[playlist_id] = count, added_at
+    followers = dict(
+        PlaylistFollow.objects.filter(playlist_id__in=playlists)
+        .values('playlist_id').annotate(count=Count('id')).values_list('playlist_id', 'count')
+    )
+    ratings = dict(
+        Rating.objects.filter(chapter__playlist_entries__playlist_id__in=playlists, score__isnull=False)
+        .values('chapter__playlist_entries__playlist_id').annotate(avg=Avg('score'))
+        .values_list('chapter__playlist_entries__playlist_id', 'avg')
+    )
+    genres = (
+        Chapter.genres.through.objects.filter(chapter__playlist_entries__playlist_id__in=playlists)
+        .values('chapter__playlist_entries__playlist_id', 'genre_id').annotate(count=Count('chapter_id'))
+        .values_list('chapter__playlist_entries__playlist_id', 'genre_id', 'count')
+    )
+
+    with transaction.atomic():
+        PlaylistRanking.objects.bulk_create(
+            [
+                PlaylistRanking(
+                    playlist_id=playlist_id,
+                    is_public=row['is_public'],
+                    follower_count=followers.get(playlist_id, 0),
+                    chapter_count=chapters.get(playlist_id, 0),
+                    average_rating=ratings.get(playlist_id),
+                    score=compute_score(
+                        followers.get(playlist_id, 0),
+                        chapters.get(playlist_id, 0),
+                        ratings.get(playlist_id),
+                        max(row['updated_at'], last_added.get(playlist_id, row['updated_at'])),
+                    ),
+                )
+                for playlist_id, row in playlists.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['playlist'],
+            update_fields=['is_public', 'follower_count', 'chapter_count', 'average_rating', 'score', 'refreshed_at'],
+        )
+        PlaylistGenre.objects.filter(playlist_id__in=playlists).delete()
+        PlaylistGenre.objects.bulk_create(
+            [PlaylistGenre(playlist_id=playlist_id, genre_id=genre_id, chapter_count=count) for playlist_id, genre_id, count in genres],
+            batch_size=1000,
+        )
+    return len(playlists)
+
+
+def schedule_refresh(*playlist_ids):
+    """Пересчитать рейтинг плейлистов после коммита текущей транзакции"""
+    playlist_ids = {playlist_id for playlist_id in playlist_ids if playlist_id}
+    if playlist_ids:
+        transaction.on_commit(lambda: refresh_rankings(playlist_ids))
+
+
+def rebuild(batch_size=500):
+    """Полный пересчёт (раз в сутки): подтягивает оценки глав и изменения их жанров"""
+    refreshed = 0
+    last_id = 0
+    while True:
+        ids = list(Playlist.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return refreshed
+        refreshed += refresh_rankings(ids)
+        last_id = ids[-1]
+
+
+def discover(genre_ids=None):
+    """Публичные плейлисты по убыванию очков; genre_ids — хотя бы одна глава любого из жанров"""
+    rankings = PlaylistRanking.objects.filter(is_public=True).select_related('playlist__user')
+    if genre_ids:
+        rankings = rankings.filter(
+            playlist_id__in=PlaylistGenre.objects.filter(genre_id__in=genre_ids).values('playlist_id')
+        )
+    return rankings
@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import library, playlist_discovery, trending
+from .models import Chapter, PlaylistChapter
+
+
+GAP = PlaylistChapter.POSITION_GAP
+
+
+def add_chapters(playlist, chapter_ids):
+    """
+    Добавить главы в конец плейлиста одним INSERT.
+    Уже добавленные и несуществующие главы пропускаются. Возвращает список добавленных id.
+    """
+    with transaction.atomic():
+        entries = PlaylistChapter.objects.select_for_update().filter(playlist=playlist)
+        present = set(entries.values_list('chapter_id', flat=True))
+        existing = set(Chapter.objects.filter(id__in=chapter_ids).values_list('id', flat=True))
+        added = [chapter_id for chapter_id in dict.fromkeys(chapter_ids) if chapter_id in existing and chapter_id not in present]
+        last = entries.aggregate(last=Max('position'))['last'] or 0
+        PlaylistChapter.objects.bulk_create(
+            [
+                PlaylistChapter(playlist=playlist, chapter_id=chapter_id, position=last + GAP * index)
+                for index, chapter_id in enumerate(added, start=1)
+            ],
+            ignore_conflicts=True,
+        )
+    now = timezone.now()
+    trending.bump((chapter_id, 'playlist', now) for chapter_id in added)
+    library.invalidate(playlist.user_id)
+    playlist_discovery.schedule_refresh(playlist.pk)
+    return added
+
+
+def remove_chapters(playlist, chapter_ids):
+    """Убрать главы из плейлиста одним DELETE. Возвращает число удалённых записей"""
+    deleted, _ = PlaylistChapter.objects.filter(playlist=playlist, chapter_id__in=chapter_ids).delete()
+    library.invalidate(playlist.user_id)
+    playlist_discovery.schedule_refresh(playlist.pk)
+    return deleted
+
+
+def respace(playlist):
+    """Переразметить позиции плейлиста с шагом GAP (нужно, только когда промежуток исчерпан)"""
+    entries = list(PlaylistChapter.objects.filter(playlist=playlist).order_by('position', 'id').only('id'))
+    for index, entry in enumerate(entries, start=1):
+        entry.position = index * GAP
+    PlaylistChapter.objects.bulk_update(entries, ['position'], batch_size=500)
+
+
+def _neighbour_positions(entry, after_chapter_id):
+    others = PlaylistChapter.objects.filter(playlist_id=entry.playlist_id).exclude(pk=entry.pk)
+    if after_chapter_id is None:
+        low = None
+        high = others.order_by('position').values_list('position', flat=True).first()
+    else:
+        low = others.get(chapter_id=after_chapter_id).position
+        high = others.filter(position__gt=low).order_by('position').values_list('position', flat=True).first()
+    return low, high
+
+
+def move_chapter(playlist, chapter_id, after_chapter_id=None):
+    """
+    Поставить главу сразу после after_chapter_id (None — в начало).
+    Обычно меняется одна строка; если между соседями не осталось места, плейлист переразмечается.
+    Бросает PlaylistChapter.DoesNotExist, если какой-то из глав нет в плейлисте.
+    """
+    with transaction.atomic():
+        entry = PlaylistChapter.objects.select_for_update().get(playlist=playlist, chapter_id=chapter_id)
+        low, high = _neighbour_positions(entry, after_chapter_id)
+        if low is not None and high is not None and high - low < 2:
+            respace(playlist)
+            low, high = _neighbour_positions(entry, after_chapter_id)
+
+        if low is None and high is None:
+            position = GAP
+        elif low is None:
+            position = high - GAP
+        elif high is None:
+            position = low + GAP
+        else:
+            position = (low + high) // 2
+        PlaylistChapter.objects.filter(pk=entry.pk).update(position=position)
+    return position
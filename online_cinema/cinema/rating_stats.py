@@ -0,0 +1,89 @@
+from django.core.cache import cache
+from django.db.models import Case, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
+
+from .models import Chapter, ChapterRatingHistogram, RatingPrior, RATING_MIN_SCORE
+
+
+PRIOR_CACHE_KEY = 'ratings:prior'
+PRIOR_CACHE_TTL = 60 * 60
+# Сколько «виртуальных» оценок, равных среднему по каталогу, добавляется к оценкам главы
+PRIOR_WEIGHT = 10
+
+
+def catalog_mean():
+    """Среднее по всем оценкам каталога прямо из агрегатов глав: (mean, count)"""
+    totals = Chapter.objects.aggregate(total=Sum('rating_sum'), count=Sum('rating_count'))
+    count = totals['count'] or 0
+    return (totals['total'] / count if count else 0.0), count
+
+
+def rating_prior():
+    """
+    Среднее по всем оценкам каталога из RatingPrior (обновляется refresh_prior).
+    None, пока RatingPrior не посчитан ни по одной оценке: нулевое среднее тянуло бы все оценки к нулю,
+    поэтому такое значение не кэшируется и не применяется (см. apply_rating_changes).
+    """
+    prior = cache.get(PRIOR_CACHE_KEY)
+    if prior is None:
+        mean, count = RatingPrior.objects.values_list('mean', 'rating_count').first() or (0.0, 0)
+        if not count:
+            return None
+        prior = mean
+        cache.set(PRIOR_CACHE_KEY, prior, PRIOR_CACHE_TTL)
+    return prior
+
+
+def weighted_score(prior, total=0, count=0):
+    """
+    Выражение байесовского среднего главы: (prior * PRIOR_WEIGHT + rating_sum) / (PRIOR_WEIGHT + rating_count).
+    total и count — дельты, которые прибавляются к текущим rating_sum и rating_count в том же UPDATE.
+    У глав без оценок 0: иначе они стояли бы в топе на уровне среднего по каталогу.
+    """
+    return Case(
+        When(rating_count__lte=-count, then=Value(0.0)),
+        default=(
+            (Cast(F('rating_sum') + total, FloatField()) + Value(prior * PRIOR_WEIGHT))
+            / (Cast(F('rating_count') + count, FloatField()) + Value(float(PRIOR_WEIGHT)))
+        ),
+        output_field=FloatField(),
+    )
+
+
+def refresh_prior():
+    """
+    Пересчитать среднее каталога одним агрегатом по главам и переписать weighted_score всех глав одним UPDATE.
+    Возвращает сохранённый RatingPrior.
+    """
+    mean, count = catalog_mean()
+    prior, _ = RatingPrior.objects.update_or_create(pk=1, defaults={'mean': mean, 'rating_count': count})
+    Chapter.objects.update(weighted_score=weighted_score(mean))
+    cache.set(PRIOR_CACHE_KEY, mean, PRIOR_CACHE_TTL)
+    return prior
+
+
+_LOOKUP = object()
+
+
+def distribution(chapter, prior=_LOOKUP):
+    """
+    Гистограмма оценок главы и статистики по ней: среднее, медиана и байесовское среднее.
+    prior (результат rating_prior, в т.ч. None) можно передать заранее, чтобы не обращаться к кэшу/БД
+    (асинхронные представления).
+    """
+    if prior is _LOOKUP:
+        prior = rating_prior()
+    try:
+        histogram = chapter.rating_histogram
+    except ChapterRatingHistogram.DoesNotExist:
+        histogram = ChapterRatingHistogram(chapter=chapter)
+    if prior is None:
+        # Среднего по каталогу ещё нет — байесовское среднее совпадает со средним главы
+        prior = histogram.mean() or 0.0
+    return {
+        'counts': dict(enumerate(histogram.counts, start=RATING_MIN_SCORE)),
+        'total': histogram.total,
+        'mean': histogram.mean(),
+        'median': histogram.median(),
+        'bayesian_average': histogram.bayesian_average(prior, PRIOR_WEIGHT),
+    }
@@ -0,0 +1,132 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from . import filmography, library, trending
+from .models import Chapter, ChapterPersonRole, ChapterRatingHistogram, Rating
+from .rating_stats import rating_prior, refresh_prior, weighted_score
+
+
+def apply_rating_changes(changes):
+    """
+    Учесть изменения оценок в агрегатах глав одним UPDATE.
+    changes — итерируемое из (chapter_id, old_score, new_score); None — оценки не было (нет).
+    rating_cache и weighted_score пересчитываются в том же UPDATE из старых значений и дельт;
+    гистограмма оценок обновляется вторым UPDATE (плюс INSERT недостающих строк).
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    buckets = defaultdict(lambda: defaultdict(int))
+    for chapter_id, old_score, new_score in changes:
+        if not chapter_id or old_score == new_score:
+            continue
+        deltas[chapter_id][0] += (new_score or 0) - (old_score or 0)
+        deltas[chapter_id][1] += (new_score is not None) - (old_score is not None)
+        if old_score is not None:
+            buckets[chapter_id][f'score_{old_score}'] -= 1
+        if new_score is not None:
+            buckets[chapter_id][f'score_{new_score}'] += 1
+    _apply_histogram_changes(buckets)
+    deltas = {chapter_id: delta for chapter_id, delta in deltas.items() if delta != [0, 0]}
+    if not deltas:
+        return 0
+
+    prior = rating_prior()
+    fields = ['rating_sum', 'rating_count', 'rating_cache']
+    chapters = [
+        Chapter(
+            pk=chapter_id,
+            rating_sum=F('rating_sum') + total,
+            rating_count=F('rating_count') + count,
+            rating_cache=Coalesce(
+                Cast(F('rating_sum') + total, FloatField()) / NullIf(F('rating_count') + count, Value(0)), Value(0.0)
+            ),
+            weighted_score=weighted_score(prior, total, count) if prior is not None else None,
+        )
+        for chapter_id, (total, count) in deltas.items()
+    ]
+    Chapter.objects.bulk_update(chapters, fields + (['weighted_score'] if prior is not None else []), batch_size=500)
+    if prior is None:
+        # Первые оценки каталога: считаем среднее уже с ними и один раз переписываем weighted_score всех глав
+        refresh_prior()
+    return len(deltas)
+
+
+def _apply_histogram_changes(buckets):
+    """buckets — {chapter_id: {'score_N': дельта}}; нулевые дельты пропускаются"""
+    buckets = {
+        chapter_id: {field: delta for field, delta in fields.items() if delta}
+        for chapter_id, fields in buckets.items()
+    }
+    buckets = {chapter_id: fields for chapter_id, fields in buckets.items() if fields}
+    if not buckets:
+        return
+    # Строку создаём только там, где оценка появляется. Одни уменьшения — это удаление оценок, в том числе
+    # каскадом вместе с главой, когда строка гистограммы уже удалена: тогда UPDATE просто не найдёт строк
+    ChapterRatingHistogram.objects.bulk_create(
+        [
+            ChapterRatingHistogram(chapter_id=chapter_id)
+            for chapter_id, changed in buckets.items() if any(delta > 0 for delta in changed.values())
+        ],
+        ignore_conflicts=True,
+        batch_size=500,
+    )
+    fields = sorted({field for changed in buckets.values() for field in changed})
+    ChapterRatingHistogram.objects.bulk_update(
+        [
+            ChapterRatingHistogram(
+                pk=chapter_id, **{field: F(field) + changed.get(field, 0) for field in fields}
+            )
+            for chapter_id, changed in buckets.items()
+        ],
+        fields,
+        batch_size=500,
+    )
+
+
+def bulk_upsert(user, items):
+    """
+    Записать пачку оценок пользователя одним INSERT … ON CONFLICT (user, chapter) DO UPDATE.
+    items — список {'chapter': id, 'score': 1..10}; при повторе главы побеждает последняя оценка.
+    Возвращает результат по каждой главе: created / updated / unchanged / not_found.
+    """
+    scores = {item['chapter']: item['score'] for item in items}
+    existing = set(Chapter.objects.filter(id__in=scores).values_list('id', flat=True))
+
+    with transaction.atomic():
+        previous = dict(
+            Rating.objects.select_for_update().filter(user=user, chapter_id__in=existing).values_list('chapter_id', 'score')
+        )
+        Rating.objects.bulk_create(
+            [Rating(user=user, chapter_id=chapter_id, score=scores[chapter_id]) for chapter_id in existing],
+            update_conflicts=True,
+            unique_fields=['user', 'chapter'],
+            update_fields=['score'],
+            batch_size=500,
+        )
+        apply_rating_changes((chapter_id, previous.get(chapter_id), scores[chapter_id]) for chapter_id in existing)
+
+    results = []
+    for chapter_id, score in scores.items():
+        if chapter_id not in existing:
+            status = 'not_found'
+        elif chapter_id not in previous:
+            status = 'created'
+        elif previous[chapter_id] == score:
+            status = 'unchanged'
+        else:
+            status = 'updated'
+        results.append({'chapter': chapter_id, 'score': score, 'status': status})
+
+    # bulk_create не отправляет post_save: зависящие от оценок данные обновляем явно
+    changed = [result['chapter'] for result in results if result['status'] in ('created', 'updated')]
+    now = timezone.now()
+    trending.bump((result['chapter'], 'rating', now) for result in results if result['status'] == 'created')
+    filmography.schedule_refresh(
+        ChapterPersonRole.objects.filter(chapter_id__in=changed, person__isnull=False)
+        .values_list('person_id', flat=True).distinct()
+    )
+    library.invalidate(user.pk)
+    return results
@@ -0,0 +1,215 @@
+import os
+import shutil
+import threading
+import time
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db.models import IntegerField, Value
+from scipy import sparse
+
+from .models import PlaylistChapter, Rating, ViewHistory
+
+
+# Вес взаимодействия: просмотр, добавление в плейлист и оценка (score / 10 * RATING_WEIGHT)
+VIEW_WEIGHT = 1.0
+PLAYLIST_WEIGHT = 2.0
+RATING_WEIGHT = 3.0
+
+# Максимальный размер плотного блока сходств (строк * столбцов), ~128 МБ float32
+MAX_BLOCK_CELLS = 2 ** 25
+
+CURRENT_FILE = 'CURRENT'
+
+
+def _read_chunks(queryset, chunk_size):
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield np.array(chunk, dtype=np.int64).reshape(-1, 3)
+
+
+def load_interactions(chunk_size=100_000):
+    """
+    Прочитать все взаимодействия пользователь–глава кусками.
+    Возвращает массивы (user_id, chapter_id, weight); в памяти держатся только numpy-массивы.
+    """
+    one = Value(1, output_field=IntegerField())
+    sources = [
+        (Rating.objects.filter(user__isnull=False, chapter__isnull=False, score__isnull=False)
+         .values_list('user_id', 'chapter_id', 'score'), RATING_WEIGHT / 10),
+        (ViewHistory.objects.filter(user__isnull=False, chapter__isnull=False)
+         .annotate(weight=one).values_list('user_id', 'chapter_id', 'weight'), VIEW_WEIGHT),
+        (PlaylistChapter.objects.filter(playlist__user__isnull=False, chapter__isnull=False)
+         .annotate(weight=one).values_list('playlist__user_id', 'chapter_id', 'weight'), PLAYLIST_WEIGHT),
+    ]
+
+    users, chapters, weights = [], [], []
+    for queryset, scale in sources:
+        for chunk in _read_chunks(queryset, chunk_size):
+            users.append(chunk[:, 0])
+            chapters.append(chunk[:, 1])
+            weights.append((chunk[:, 2] * scale).astype(np.float32))
+
+    if not users:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float32)
+    return np.concatenate(users), np.concatenate(chapters), np.concatenate(weights)
+
+
+def build_similarity(top_k=50, block_size=1024, chunk_size=100_000):
+    """
+    Построить матрицу сходства глав (косинус по векторам пользователей) и оставить top_k соседей.
+
+    Матрица пользователь×глава хранится разреженной; произведение item×item считается блоками
+    строк, чтобы в памяти одновременно был только блок block_size×(число глав).
+    Возвращает (chapter_ids, neighbors, scores): neighbors — индексы в chapter_ids, -1 — пусто.
+    """
+    user_ids, chapter_ids, weights = load_interactions(chunk_size)
+    items, item_index = np.unique(chapter_ids, return_inverse=True)
+    _, user_index = np.unique(user_ids, return_inverse=True)
+    n_items = len(items)
+
+    neighbors = np.full((n_items, top_k), -1, dtype=np.int32)
+    scores = np.zeros((n_items, top_k), dtype=np.float32)
+    if n_items < 2:
+        return items, neighbors, scores
+
+    matrix = sparse.csr_matrix(
+        (weights, (user_index, item_index)), shape=(user_index.max() + 1, n_items), dtype=np.float32
+    )
+    # Повторные взаимодействия суммируются; логарифм не даёт им перевесить разнообразие
+    matrix.data = np.log1p(matrix.data)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    matrix = matrix @ sparse.diags(1 / norms).astype(np.float32)
+    items_by_users = matrix.T.tocsr()
+
+    k = min(top_k, n_items - 1)
+    block_size = max(1, min(block_size, MAX_BLOCK_CELLS // n_items))
+    for start in range(0, n_items, block_size):
+        end = min(start + block_size, n_items)
+        block = (items_by_users[start:end] @ matrix).toarray()
+        block[np.arange(end - start), np.arange(start, end)] = 0
+
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        top[top_scores <= 0] = -1
+        neighbors[start:end, :k] = top
+        scores[start:end, :k] = np.maximum(top_scores, 0)
+
+    return items, neighbors, scores
+
+
+def save_index(directory, chapter_ids, neighbors, scores, keep=2):
+    """
+    Записать индекс в новый подкаталог версии и атомарно переключить на него файл CURRENT.
+    Процессы, уже отобразившие старую версию в память, продолжают её читать.
+    """
+    os.makedirs(directory, exist_ok=True)
+    version = str(time.time_ns())
+    path = os.path.join(directory, version)
+    os.makedirs(path)
+    np.save(os.path.join(path, 'chapter_ids.npy'), chapter_ids.astype(np.int64))
+    np.save(os.path.join(path, 'neighbors.npy'), neighbors)
+    np.save(os.path.join(path, 'scores.npy'), scores)
+
+    tmp = os.path.join(directory, CURRENT_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(directory, CURRENT_FILE))
+
+    versions = sorted(name for name in os.listdir(directory) if name.isdigit())
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return path
+
+
+class SimilarityIndex:
+    """Отображённый в память индекс соседей; перечитывает CURRENT не чаще раза в check_interval секунд"""
+
+    def __init__(self, directory, check_interval=60):
+        self.directory = str(directory)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0
+        self._data = None
+
+    def _load(self):
+        now = time.monotonic()
+        if self._data is not None and now - self._checked_at < self.check_interval:
+            return self._data
+        with self._lock:
+            self._checked_at = now
+            try:
+                with open(os.path.join(self.directory, CURRENT_FILE)) as f:
+                    version = f.read().strip()
+            except FileNotFoundError:
+                return None
+            if version != self._version:
+                path = os.path.join(self.directory, version)
+                self._data = tuple(
+                    np.load(os.path.join(path, name), mmap_mode='r')
+                    for name in ('chapter_ids.npy', 'neighbors.npy', 'scores.npy')
+                )
+                self._version = version
+            return self._data
+
+    def _rows(self, chapter_ids):
+        """Данные индекса, позиции chapter_ids в нём и маска найденных"""
+        data = self._load()
+        if data is None or len(data[0]) == 0:
+            return None, None, None
+        items = data[0]
+        wanted = np.asarray(chapter_ids, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(items, wanted), len(items) - 1)
+        return data, positions, items[positions] == wanted
+
+    def similar(self, chapter_id, limit=20):
+        """Соседи главы: список (chapter_id, score) по убыванию сходства"""
+        data, positions, mask = self._rows([chapter_id])
+        if data is None or not mask[0]:
+            return []
+        items, neighbors, scores = data
+        row = neighbors[positions[0]]
+        valid = row >= 0
+        return list(zip(items[row[valid]][:limit].tolist(), scores[positions[0]][valid][:limit].tolist()))
+
+    def recommend(self, seeds, exclude=(), limit=20):
+        """
+        Рекомендации по набору seeds {chapter_id: вес}: суммирует сходства соседей всех seed-глав.
+        """
+        if not seeds:
+            return []
+        seed_ids = list(seeds)
+        data, positions, mask = self._rows(seed_ids)
+        if data is None or not mask.any():
+            return []
+        items, neighbors, scores = data
+
+        seed_weights = np.array([seeds[chapter_id] for chapter_id in seed_ids], dtype=np.float32)[mask]
+        rows = neighbors[positions[mask]]
+        weighted = scores[positions[mask]] * seed_weights[:, None]
+        valid = rows >= 0
+        totals = np.bincount(rows[valid], weights=weighted[valid], minlength=len(items))
+
+        excluded = np.fromiter(set(exclude) | set(seed_ids), dtype=np.int64)
+        totals[np.isin(items, excluded)] = 0
+
+        count = min(limit, int((totals > 0).sum()))
+        if count == 0:
+            return []
+        best = np.argpartition(-totals, count - 1)[:count]
+        best = best[np.argsort(-totals[best])]
+        return list(zip(items[best].tolist(), totals[best].tolist()))
+
+
+similarity_index = SimilarityIndex(settings.RECOMMENDER_DIR)
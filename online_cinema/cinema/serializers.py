@@ -1,5 +1,9 @@
+from django.urls import reverse
 from rest_framework import serializers
-from .models import User, ViewHistory, UserPaymentMethod, PlaylistChapter, Subscription, UserSubscription, Genre, Franchise, Chapter, Episode, Person, ChapterPersonRole, Comment, Review, Rating, Playlist
+from .entitlements import can_access
+from .franchise_stats import franchise_stats
+from .rating_stats import distribution
+from .models import User, ViewHistory, UserPaymentMethod, PlaylistChapter, Subscription, UserSubscription, Genre, Franchise, Chapter, Episode, Person, ChapterPersonRole, Comment, Review, Rating, Playlist, PlaybackProgress, PersonSummary, PlaylistRanking, RATING_MIN_SCORE, RATING_MAX_SCORE
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -9,13 +13,19 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = [
             'id', 'username', 'email', 'profile_pic_url',
-            'description', 'login_code', 'groups', 'user_permissions'
+            'description', 'login_code', 'groups', 'user_permissions', 'default_payment_method'
         ]
 
 class UserPaymentMethodSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserPaymentMethod
-        fields = ['id', 'user', 'payment_type', 'provider_id', 'masked_card_number', 'card_brand', 'card_expiry_month', 'card_expiry_year', 'added_at', 'valid_until']
+        fields = ['id', 'user', 'payment_type', 'provider_id', 'masked_card_number', 'card_brand', 'card_expiry_month', 'card_expiry_year', 'added_at', 'valid_until', 'is_expired']
+        read_only_fields = ['valid_until', 'is_expired']
+
+    def validate_card_expiry_year(self, value):
+        if value is not None and 100 <= value < 2000:
+            raise serializers.ValidationError('Укажите год двумя цифрами или полностью')
+        return value
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -36,15 +46,56 @@ class GenreSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 class FranchiseSerializer(serializers.ModelSerializer):
+    chapter_count = serializers.SerializerMethodField()
+
     class Meta:
         model = Franchise
-        fields = ['id', 'title', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'chapter_count', 'created_at', 'updated_at']
+
+    def get_chapter_count(self, obj):
+        # Аннотируется в FranchiseViewSet; во вложенных представлениях не считается
+        return getattr(obj, 'chapter_count', None)
+
+
+class FranchiseDetailSerializer(FranchiseSerializer):
+    """Франшиза с хронологией глав и сводными показателями (кэшируются в cinema.franchise_stats)"""
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data.update(franchise_stats(instance.pk))
+        return data
 
 class PersonSerializer(serializers.ModelSerializer):
     class Meta:
         model = Person
         fields = ['id', 'first_name', 'last_name', 'birth_date', 'country', 'photo_url', 'biography']
 
+class ChapterShortSerializer(serializers.ModelSerializer):
+    """Облегчённое представление главы для списков (без вложенных франшизы, людей и обзора)"""
+    poster_img_url = serializers.ImageField(source='poster_image', read_only=True)
+
+    class Meta:
+        model = Chapter
+        fields = ['id', 'title', 'poster_img_url', 'release_date', 'content_type', 'age_rating', 'rating_cache', 'weighted_score', 'view_count']
+
+
+class PersonSummarySerializer(serializers.ModelSerializer):
+    average_rating = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = PersonSummary
+        fields = ['chapter_count', 'rating_count', 'average_rating', 'first_release', 'last_release']
+
+
+class FilmographyRoleSerializer(serializers.ModelSerializer):
+    """Роль в фильмографии: краткая карточка главы без каскада ChapterSerializer"""
+    chapter = ChapterShortSerializer()
+
+    class Meta:
+        model = ChapterPersonRole
+        fields = ['id', 'role', 'chapter']
+
+
 class ChapterSerializer(serializers.ModelSerializer):
     # Добавляем поля для сериализации связанных объектов
     franchise = FranchiseSerializer()  # Сериализуем связанную франшизу
@@ -55,10 +106,17 @@ class ChapterSerializer(serializers.ModelSerializer):
 
     # Новый метод для получения информации о франшизе
     franchise_overview = serializers.SerializerMethodField()
+    has_access = serializers.SerializerMethodField()
 
     class Meta:
         model = Chapter
-        fields = ['id', 'poster_img_url' , 'title', 'release_date', 'rating_cache', 'view_count', 'franchise', 'required_subscription', 'genres', 'people', 'franchise_overview']
+        fields = ['id', 'poster_img_url' , 'title', 'release_date', 'rating_cache', 'weighted_score', 'view_count', 'franchise', 'required_subscription', 'has_access', 'genres', 'people', 'franchise_overview']
+
+    def get_has_access(self, obj):
+        request = self.context.get('request')
+        if request is None:
+            return obj.required_subscription_id is None
+        return can_access(request.user, obj)
 
     def get_franchise_overview(self, obj):
         # Получаем франшизу, к которой относится глава
@@ -67,18 +125,37 @@ class ChapterSerializer(serializers.ModelSerializer):
             return franchise.get_chapter_overview()  # Используем метод get_chapter_overview() из модели Franchise
         return []  # Если франшиза не указана, возвращаем пустой список
 
+
+class ChapterDetailSerializer(ChapterSerializer):
+    rating_distribution = serializers.SerializerMethodField()
+
+    class Meta(ChapterSerializer.Meta):
+        fields = ChapterSerializer.Meta.fields + ['rating_count', 'rating_distribution']
+
+    def get_rating_distribution(self, obj):
+        if 'rating_prior' in self.context:
+            return distribution(obj, self.context['rating_prior'])
+        return distribution(obj)
+
+
 class EpisodeSerializer(serializers.ModelSerializer):
-    video_url = serializers.FileField(source='episode_videos', read_only=True)
-    thumbnail_url = serializers.ImageField(source='episode_thumbnail_imgs', read_only=True)
+    video_url = serializers.FileField(source='video_file', read_only=True)
+    thumbnail_url = serializers.ImageField(source='thumbnail_img', read_only=True)
+    manifest_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Episode
         fields = [
             'id', 'chapter', 'episode_number', 'title',
-            'video_url', 'duration', 'release_date',
+            'video_url', 'manifest_url', 'duration', 'release_date',
             'thumbnail_url'
         ]
 
+    def get_manifest_url(self, obj):
+        if not obj.hls_manifest:
+            return None
+        return reverse('episode-manifest', kwargs={'pk': obj.pk})
+
 
 class ChapterPersonRoleSerializer(serializers.ModelSerializer):
     chapter = ChapterSerializer()
@@ -127,7 +204,34 @@ class PlaylistChapterSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PlaylistChapter
-        fields = ['id', 'playlist', 'playlist_id', 'chapter', 'chapter_id', 'added_at', 'note']
+        fields = ['id', 'playlist', 'playlist_id', 'chapter', 'chapter_id', 'position', 'added_at', 'note']
+        read_only_fields = ['position']
+
+
+class PlaylistEntrySerializer(serializers.ModelSerializer):
+    chapter = ChapterShortSerializer(read_only=True)
+
+    class Meta:
+        model = PlaylistChapter
+        fields = ['id', 'position', 'added_at', 'note', 'chapter']
+
+
+class PlaylistDetailSerializer(PlaylistSerializer):
+    """Плейлист с упорядоченными главами (записи предзагружаются в PlaylistViewSet)"""
+    entries = PlaylistEntrySerializer(source='playlist_chapters', many=True, read_only=True)
+
+    class Meta(PlaylistSerializer.Meta):
+        fields = PlaylistSerializer.Meta.fields + ['description', 'entries']
+
+
+class PlaylistChaptersSerializer(serializers.Serializer):
+    chapters = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+
+
+class PlaylistMoveSerializer(serializers.Serializer):
+    """Переместить главу сразу после after (null — в начало плейлиста)"""
+    chapter = serializers.IntegerField(min_value=1)
+    after = serializers.IntegerField(min_value=1, allow_null=True, required=False, default=None)
 
 
 class ViewHistorySerializer(serializers.ModelSerializer):
@@ -140,3 +244,99 @@ class ViewHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = ViewHistory
         fields = ['id', 'user', 'chapter', 'viewed_at', 'user_id', 'chapter_id']
+
+
+class PlaybackHeartbeatSerializer(serializers.Serializer):
+    episode = serializers.IntegerField(min_value=1)
+    position = serializers.IntegerField(min_value=0)
+
+
+class ContinueWatchingSerializer(serializers.ModelSerializer):
+    episode_id = serializers.IntegerField(source='episode.id', read_only=True)
+    episode_title = serializers.CharField(source='episode.title', read_only=True)
+    episode_number = serializers.IntegerField(source='episode.episode_number', read_only=True)
+    duration = serializers.DurationField(source='episode.duration', read_only=True)
+    chapter_id = serializers.IntegerField(source='episode.chapter_id', read_only=True)
+    chapter_title = serializers.CharField(source='episode.chapter.title', read_only=True, default=None)
+
+    class Meta:
+        model = PlaybackProgress
+        fields = ['episode_id', 'episode_title', 'episode_number', 'duration', 'chapter_id', 'chapter_title', 'position_seconds', 'updated_at']
+
+
+class EpisodeReorderSerializer(serializers.Serializer):
+    """Новый порядок эпизодов главы: все id эпизодов главы, каждый ровно один раз"""
+    episodes = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+    def validate_episodes(self, value):
+        existing = set(Episode.objects.filter(chapter_id=self.context['chapter_id']).values_list('id', flat=True))
+        if len(value) != len(set(value)) or set(value) != existing:
+            raise serializers.ValidationError('Нужно перечислить все эпизоды главы ровно по одному разу.')
+        return value
+
+
+class EpisodeInsertItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Episode
+        fields = ['title', 'duration', 'release_date']
+
+
+class EpisodeInsertSerializer(serializers.Serializer):
+    """Вставка эпизодов начиная с номера position; последующие эпизоды сдвигаются"""
+    position = serializers.IntegerField(min_value=1)
+    episodes = EpisodeInsertItemSerializer(many=True, allow_empty=False)
+
+
+class LibraryPlaylistSerializer(serializers.ModelSerializer):
+    chapter_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Playlist
+        fields = ['id', 'title', 'slug', 'is_public', 'is_favorite', 'cover_image_url', 'chapter_count', 'updated_at']
+
+
+class LibraryHistorySerializer(serializers.ModelSerializer):
+    chapter = ChapterShortSerializer(read_only=True)
+
+    class Meta:
+        model = ViewHistory
+        fields = ['id', 'viewed_at', 'chapter']
+
+
+class LibraryRatingSerializer(serializers.ModelSerializer):
+    chapter = ChapterShortSerializer(read_only=True)
+
+    class Meta:
+        model = Rating
+        fields = ['id', 'score', 'created_at', 'chapter']
+
+
+class LibrarySubscriptionSerializer(serializers.ModelSerializer):
+    subscription = SubscriptionSerializer(read_only=True)
+
+    class Meta:
+        model = UserSubscription
+        fields = ['id', 'subscription', 'start_date', 'end_date', 'auto_renew']
+
+
+class PlaylistDiscoverySerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='playlist.id', read_only=True)
+    title = serializers.CharField(source='playlist.title', read_only=True)
+    slug = serializers.CharField(source='playlist.slug', read_only=True)
+    description = serializers.CharField(source='playlist.description', read_only=True)
+    cover_image_url = serializers.URLField(source='playlist.cover_image_url', read_only=True)
+    owner = serializers.CharField(source='playlist.user.username', read_only=True, default=None)
+
+    class Meta:
+        model = PlaylistRanking
+        fields = ['id', 'title', 'slug', 'description', 'cover_image_url', 'owner', 'follower_count', 'chapter_count', 'average_rating', 'score']
+
+
+class BulkRatingItemSerializer(serializers.Serializer):
+    chapter = serializers.IntegerField(min_value=1)
+    score = serializers.IntegerField(min_value=RATING_MIN_SCORE, max_value=RATING_MAX_SCORE)
+
+
+class BulkRatingSerializer(serializers.Serializer):
+    """Пачка оценок текущего пользователя (офлайн-синхронизация мобильных клиентов)"""
+    ratings = BulkRatingItemSerializer(many=True, allow_empty=False, max_length=1000)
@@ -0,0 +1,179 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import content_similarity, entitlements, filmography, franchise_stats, library, playlist_discovery, ratings, trending
+from .episodes import refresh_total_runtime
+from .models import (
+    Chapter, ChapterPersonRole, Episode, Playlist, PlaylistChapter, PlaylistFollow, Rating, Review, UserPaymentMethod, UserSubscription,
+    ViewHistory,
+)
+from .payment_methods import refresh_default_payment_methods
+from .view_events import views_flushed
+
+
+@receiver([post_save, post_delete], sender=UserSubscription)
+def invalidate_user_entitlements(sender, instance, **kwargs):
+    entitlements.invalidate(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=UserPaymentMethod)
+def refresh_user_default_payment_method(sender, instance, **kwargs):
+    refresh_default_payment_methods([instance.user_id])
+
+
+@receiver(views_flushed)
+def bump_trending_views(sender, events, **kwargs):
+    trending.bump((chapter_id, 'view', viewed_at) for viewed_at, _, chapter_id, _ in events)
+
+
+TRENDING_SIGNALS = {
+    Rating: ('rating', 'created_at'),
+    Review: ('review', 'created_at'),
+    PlaylistChapter: ('playlist', 'added_at'),
+}
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=PlaylistChapter)
+def bump_trending_engagement(sender, instance, created, **kwargs):
+    if created:
+        signal, time_field = TRENDING_SIGNALS[sender]
+        trending.bump([(instance.chapter_id, signal, getattr(instance, time_field))])
+
+
+@receiver(post_save, sender=Chapter)
+def reindex_chapter_content(sender, instance, **kwargs):
+    content_similarity.schedule_index(instance.pk)
+
+
+@receiver(pre_save, sender=ChapterPersonRole)
+def remember_previous_role_links(sender, instance, **kwargs):
+    # Роль могли перевесить на другую персону или главу — пересчитать нужно и прежние
+    instance._previous_chapter_id, instance._previous_person_id = None, None
+    if instance.pk:
+        instance._previous_chapter_id, instance._previous_person_id = (
+            ChapterPersonRole.objects.filter(pk=instance.pk).values_list('chapter_id', 'person_id').first()
+            or (None, None)
+        )
+
+
+@receiver([post_save, post_delete], sender=ChapterPersonRole)
+def reindex_chapter_roles(sender, instance, **kwargs):
+    content_similarity.schedule_index(instance.chapter_id, getattr(instance, '_previous_chapter_id', None))
+
+
+@receiver(m2m_changed, sender=Chapter.genres.through)
+def reindex_chapter_genres(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            content_similarity.schedule_index(instance.pk)
+    elif action == 'pre_clear':
+        # После очистки со стороны жанра затронутые главы уже не узнать
+        content_similarity.schedule_index(*instance.chapters.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        content_similarity.schedule_index(*pk_set)
+
+
+@receiver([post_save, post_delete], sender=ChapterPersonRole)
+def refresh_role_person_summary(sender, instance, **kwargs):
+    filmography.schedule_refresh([instance.person_id, getattr(instance, '_previous_person_id', None)])
+
+
+@receiver(post_save, sender=Chapter)
+def refresh_chapter_people_summaries(sender, instance, created, **kwargs):
+    if not created:
+        filmography.schedule_refresh(filmography.person_ids_for_chapter(instance.pk))
+
+
+@receiver(post_save, sender=Rating)
+def add_rating_to_person_summaries(sender, instance, created, **kwargs):
+    if created:
+        filmography.add_rating(instance.chapter_id, instance.score)
+    else:
+        chapter_ids = {instance.chapter_id, getattr(instance, '_previous_chapter_id', None)} - {None}
+        filmography.schedule_refresh(
+            [person_id for chapter_id in chapter_ids for person_id in filmography.person_ids_for_chapter(chapter_id)]
+        )
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_person_summaries(sender, instance, **kwargs):
+    filmography.schedule_refresh(filmography.person_ids_for_chapter(instance.chapter_id))
+
+
+@receiver(pre_save, sender=Chapter)
+def remember_chapter_franchise(sender, instance, **kwargs):
+    # Глава могла переехать в другую франшизу — сбросить нужно обе
+    if instance.pk:
+        instance._previous_franchise_id = (
+            Chapter.objects.filter(pk=instance.pk).values_list('franchise_id', flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=Chapter)
+def invalidate_chapter_franchise_stats(sender, instance, **kwargs):
+    franchise_stats.invalidate(instance.franchise_id, getattr(instance, '_previous_franchise_id', None))
+
+
+@receiver([post_save, post_delete], sender=Episode)
+def invalidate_episode_franchise_stats(sender, instance, **kwargs):
+    franchise_stats.invalidate(
+        Chapter.objects.filter(pk=instance.chapter_id).values_list('franchise_id', flat=True).first()
+    )
+
+
+@receiver([post_save, post_delete], sender=Episode)
+def refresh_chapter_runtime(sender, instance, **kwargs):
+    if instance.chapter_id:
+        refresh_total_runtime([instance.chapter_id])
+
+
+@receiver([post_save, post_delete], sender=Playlist)
+@receiver([post_save, post_delete], sender=Rating)
+@receiver([post_save, post_delete], sender=ViewHistory)
+@receiver([post_save, post_delete], sender=UserSubscription)
+def invalidate_user_library(sender, instance, **kwargs):
+    library.invalidate(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=PlaylistChapter)
+def invalidate_playlist_owner_library(sender, instance, **kwargs):
+    library.invalidate(Playlist.objects.filter(pk=instance.playlist_id).values_list('user_id', flat=True).first())
+
+
+@receiver(post_save, sender=Playlist)
+def refresh_playlist_ranking(sender, instance, **kwargs):
+    playlist_discovery.schedule_refresh(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=PlaylistChapter)
+@receiver([post_save, post_delete], sender=PlaylistFollow)
+def refresh_related_playlist_ranking(sender, instance, **kwargs):
+    playlist_discovery.schedule_refresh(instance.playlist_id)
+
+
+@receiver(pre_save, sender=Rating)
+def remember_previous_score(sender, instance, **kwargs):
+    # Оценку могли перенести на другую главу (например, в админке) — запоминаем и главу, и балл
+    instance._previous_chapter_id, instance._previous_score = None, None
+    if instance.pk:
+        instance._previous_chapter_id, instance._previous_score = (
+            Rating.objects.filter(pk=instance.pk).values_list('chapter_id', 'score').first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Rating)
+def apply_rating_to_chapter(sender, instance, **kwargs):
+    if instance._previous_chapter_id not in (None, instance.chapter_id):
+        ratings.apply_rating_changes([
+            (instance._previous_chapter_id, instance._previous_score, None),
+            (instance.chapter_id, None, instance.score),
+        ])
+    else:
+        ratings.apply_rating_changes([(instance.chapter_id, instance._previous_score, instance.score)])
+
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_chapter(sender, instance, **kwargs):
+    ratings.apply_rating_changes([(instance.chapter_id, instance.score, None)])
@@ -0,0 +1,129 @@
+import re
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, CharField, Max, Q, Value, When
+from django.db.models.functions import Cast, Substr
+from django.utils.text import slugify
+
+
+# Транслитерация кириллицы (упрощённая ГОСТ 7.79-2000, схема Б)
+CYRILLIC = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'zh', 'з': 'z',
+    'и': 'i', 'й': 'j', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'x', 'ц': 'cz', 'ч': 'ch', 'ш': 'sh', 'щ': 'shh',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'і': 'i', 'ї': 'yi', 'є': 'ye', 'ґ': 'g',
+}
+_TRANSLATION = str.maketrans({
+    **CYRILLIC,
+    **{letter.upper(): latin.capitalize() for letter, latin in CYRILLIC.items()},
+})
+
+# Запас под суффикс «-N» в пределах max_length поля
+SUFFIX_RESERVE = 8
+
+# Сколько разных base проверять одним запросом при массовом создании
+BASES_PER_QUERY = 100
+
+# Сколько раз подбирать слаг заново, если параллельный запрос занял его между подбором и INSERT
+SAVE_ATTEMPTS = 5
+
+
+def transliterate(text):
+    return (text or '').translate(_TRANSLATION)
+
+
+def make_base(text, fallback, max_length=50):
+    base = slugify(transliterate(text))[:max_length - SUFFIX_RESERVE].strip('-')
+    return base or fallback
+
+
+def _taken_numbers(model, field, bases):
+    """
+    Наибольший занятый номер для каждого base: {base: N}, где сам base считается номером 1.
+
+    Один запрос на пачку (UNION ALL по base): строки выбираются диапазоном по индексу
+    уникального поля (base и base-0… base-9…), а максимум считается в БД — сколько бы ни было
+    «izbrannoe-1…izbrannoe-10000», с сервера приходит по одной строке на base.
+    """
+    queries = []
+    for base in bases:
+        suffixed = Q(**{
+            f'{field}__gte': f'{base}-0',
+            f'{field}__lt': f'{base}-:',
+            f'{field}__regex': rf'^{re.escape(base)}-[0-9]+$',
+        })
+        number = Case(
+            When(suffixed, then=Cast(Substr(field, len(base) + 2), BigIntegerField())),
+            default=Value(1),
+            output_field=BigIntegerField(),
+        )
+        queries.append(
+            model._default_manager.filter(Q(**{field: base}) | suffixed)
+            .order_by()
+            .values(slug_base=Value(base, output_field=CharField()))
+            .annotate(taken=Max(number))
+            .values_list('slug_base', 'taken')
+        )
+    rows = queries[0].union(*queries[1:], all=True) if len(queries) > 1 else queries[0]
+    return {base: taken for base, taken in rows if taken is not None}
+
+
+def allocate_slugs(model, titles, fallback, field='slug'):
+    """
+    Подобрать уникальные слаги для списка названий одним запросом к БД.
+
+    Новые слаги получают следующий свободный номер: base, base-2, base-3 и т.д.,
+    повторы внутри одного списка нумеруются подряд. Окончательную уникальность по-прежнему
+    гарантирует ограничение в БД.
+    """
+    max_length = model._meta.get_field(field).max_length
+    bases = [make_base(title, fallback, max_length) for title in titles]
+    if not bases:
+        return []
+
+    unique_bases = list(dict.fromkeys(bases))
+    taken = defaultdict(int)
+    for start in range(0, len(unique_bases), BASES_PER_QUERY):
+        taken.update(_taken_numbers(model, field, unique_bases[start:start + BASES_PER_QUERY]))
+
+    slugs = []
+    for base in bases:
+        number = taken[base] + 1
+        taken[base] = number
+        slugs.append(base if number == 1 else f'{base}-{number}')
+    return slugs
+
+
+def allocate_slug(model, title, fallback, field='slug'):
+    return allocate_slugs(model, [title], fallback, field)[0]
+
+
+def save_with_slug(obj, save, fallback, source='title', field='slug'):
+    """
+    Сохранить объект, подобрав ему слаг; save — сохранение без аргументов (super().save с параметрами).
+
+    Два запроса могут одновременно получить один и тот же свободный номер. Тогда INSERT второго
+    упирается в уникальный индекс: сохранение откатывается до точки сохранения, и слаг подбирается заново.
+    """
+    model = type(obj)
+    for attempt in range(SAVE_ATTEMPTS):
+        setattr(obj, field, allocate_slug(model, getattr(obj, source), fallback, field))
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            taken = model._default_manager.filter(**{field: getattr(obj, field)}).exists()
+            if not taken or attempt == SAVE_ATTEMPTS - 1:
+                raise
+
+
+def assign_slugs(objects, fallback, source='title', field='slug'):
+    """Проставить слаги объектам без слага перед bulk_create (один запрос на всю пачку)"""
+    pending = [obj for obj in objects if not getattr(obj, field)]
+    if pending:
+        model = type(pending[0])
+        for obj, slug in zip(pending, allocate_slugs(model, [getattr(obj, source) for obj in pending], fallback, field)):
+            setattr(obj, field, slug)
+    return objects
@@ -0,0 +1,164 @@
+import os
+import re
+import mimetypes
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BLOCK_SIZE = 64 * 1024
+# Диапазон с начала файла меньше этого — проба плеера (размер, метаданные), а не начало просмотра
+MIN_PLAYBACK_RANGE_BYTES = 1024 * 1024
+
+# Системные mime.types часто не знают о HLS-сегментах
+mimetypes.add_type('video/mp2t', '.ts')
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class VideoFileResponse(FileResponse):
+    block_size = STREAM_BLOCK_SIZE
+
+
+class RangeFile:
+    """Файловый объект, ограниченный диапазоном [start, end]"""
+
+    def __init__(self, file, start, end):
+        self.file = file
+        self.remaining = end - start + 1
+        self.file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range_header(header, size):
+    """
+    Разобрать заголовок Range. Возвращает (start, end) или None, если диапазон
+    не задан или не поддерживается (несколько диапазонов) — тогда отдаём файл целиком.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N — последние N байт
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def starts_playback(request):
+    """
+    Начинает ли запрос просмотр: GET целиком или с начала файла — открытым диапазоном bytes=0-
+    либо диапазоном не меньше MIN_PLAYBACK_RANGE_BYTES. HEAD, перемотки и короткие пробы не считаются.
+    """
+    if request.method != 'GET':
+        return False
+    header = request.headers.get('Range')
+    if not header:
+        return True
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) != '0':
+        return False
+    last = match.group(2)
+    return not last or int(last) + 1 >= MIN_PLAYBACK_RANGE_BYTES
+
+
+def make_etag(stat):
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def if_range_matches(request, etag, mtime):
+    """Проверка If-Range: диапазон отдаём, только если файл не изменился"""
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag
+    since = parse_http_date_safe(value)
+    return since is not None and int(mtime) <= since
+
+
+def accel_redirect_response(name, content_type):
+    """Передать отдачу файла фронт-прокси (nginx X-Accel-Redirect)"""
+    location = settings.VIDEO_ACCEL_REDIRECT_LOCATION.rstrip('/')
+    response = HttpResponse(content_type=content_type)
+    response['X-Accel-Redirect'] = f"{location}/{name}"
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def stream_file_response(request, name):
+    """
+    Отдать файл из MEDIA_ROOT (name — путь относительно хранилища) с поддержкой Range/If-Range.
+
+    Запрос без диапазона и открытый диапазон (bytes=N-) отдаются через FileResponse,
+    так что WSGI-сервер может использовать file_wrapper/sendfile без копирования.
+    Ограниченный диапазон отдаётся блоками через RangeFile.
+    """
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if getattr(settings, 'VIDEO_ACCEL_REDIRECT_LOCATION', None):
+        return accel_redirect_response(name, content_type)
+
+    path = default_storage.path(name)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('Файл не найден')
+    size = stat.st_size
+    etag = make_etag(stat)
+
+    try:
+        byte_range = None
+        if if_range_matches(request, etag, stat.st_mtime):
+            byte_range = parse_range_header(request.headers.get('Range'), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = VideoFileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        if end == size - 1:
+            file.seek(start)
+            response = VideoFileResponse(file, status=206, content_type=content_type)
+        else:
+            response = VideoFileResponse(RangeFile(file, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
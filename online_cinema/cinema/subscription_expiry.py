@@ -0,0 +1,63 @@
+import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import entitlements, library
+from .models import UserSubscription
+
+
+logger = logging.getLogger(__name__)
+
+
+def expire_subscriptions(batch_size=1000):
+    """
+    Перевести истёкшие подписки в неактивные.
+
+    Работает пачками: id очередной пачки выбираются по индексу (is_active, end_date),
+    затем вся пачка гасится одним UPDATE. Подпискам с автопродлением даётся
+    SUBSCRIPTION_RENEWAL_GRACE_DAYS на списание оплаты, после этого они тоже гасятся.
+    Возвращает статистику прогона.
+    """
+    started = time.monotonic()
+    grace = datetime.timedelta(days=settings.SUBSCRIPTION_RENEWAL_GRACE_DAYS)
+    stats = {'expired': 0, 'batches': 0, 'renewal_due': 0, 'in_grace': 0}
+    touched_users = set()
+
+    while True:
+        rows = list(
+            UserSubscription.objects.due_for_expiry(grace)
+            .order_by('end_date')
+            .values_list('id', 'user_id')[:batch_size]
+        )
+        if not rows:
+            break
+
+        ids = [row[0] for row in rows]
+        user_ids = {row[1] for row in rows}
+        updated = UserSubscription.objects.filter(id__in=ids, is_active=True).update(
+            is_active=False, updated_at=timezone.now()
+        )
+        # UPDATE не вызывает сигналы — сбрасываем кэш прав сами
+        entitlements.invalidate(*user_ids)
+        library.invalidate(*user_ids)
+
+        stats['expired'] += updated
+        touched_users |= user_ids
+        stats['batches'] += 1
+
+    now = timezone.now()
+    stats['users'] = len(touched_users)
+    stats['renewal_due'] = UserSubscription.objects.due_for_renewal().count()
+    stats['in_grace'] = UserSubscription.objects.filter(
+        is_active=True, auto_renew=True, canceled_at__isnull=True, end_date__lt=now
+    ).count()
+    stats['duration'] = round(time.monotonic() - started, 3)
+
+    logger.info(
+        'Subscription expiry run: expired=%(expired)s batches=%(batches)s users=%(users)s '
+        'renewal_due=%(renewal_due)s in_grace=%(in_grace)s duration=%(duration)ss', stats
+    )
+    return stats
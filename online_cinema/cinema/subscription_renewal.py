@@ -0,0 +1,164 @@
+import datetime
+import logging
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import entitlements, library
+from .billing import get_payment_provider
+from .models import BillingRun, RenewalCharge, UserSubscription
+
+
+logger = logging.getLogger(__name__)
+
+
+def renewal_key(user_subscription, attempt=1):
+    """Ключ идемпотентности: одна подписка + один продлеваемый период + номер попытки списания"""
+    return f'renewal:{user_subscription.pk}:{user_subscription.end_date.isoformat()}:{attempt}'
+
+
+def iter_due_batches(within, batch_size):
+    """Id подписок к продлению, пачками с keyset-пагинацией по id"""
+    last_id = 0
+    while True:
+        ids = list(
+            UserSubscription.objects.due_for_renewal(within)
+            .filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def process_batch(run, provider, ids):
+    """
+    Продлить одну пачку подписок.
+
+    Перед обращением к провайдеру списание фиксируется в RenewalCharge со статусом pending
+    и уникальным ключом попытки. Если процесс упадёт после списания, повторный прогон
+    отправит тот же ключ, и провайдер вернёт уже совершённое списание вместо нового.
+    Отклонённое списание следующий прогон повторяет новой попыткой (со свежим способом оплаты);
+    в рамках одного прогона отказ окончательный.
+    Продление end_date и итоговые статусы списаний записываются одной транзакцией.
+    """
+    try:
+        now = timezone.now()
+        subscriptions = list(
+            UserSubscription.objects.filter(id__in=ids)
+            .select_related('subscription', 'user__default_payment_method')
+        )
+
+        attempts = defaultdict(list)
+        for charge in RenewalCharge.objects.filter(
+            user_subscription__in=subscriptions, period_end__in={sub.end_date for sub in subscriptions}
+        ):
+            attempts[charge.user_subscription_id, charge.period_end].append(charge)
+
+        keys, new_charges = {}, []
+        for sub in subscriptions:
+            previous = attempts[sub.pk, sub.end_date]
+            if any(c.status == 'succeeded' or (c.status == 'failed' and c.run_id == run.pk) for c in previous):
+                continue
+            pending = next((c for c in previous if c.status == 'pending'), None)
+            if pending is not None:
+                # Незавершённую попытку повторяем с тем же ключом и способом оплаты
+                keys[sub.pk] = pending.idempotency_key
+                continue
+            keys[sub.pk] = renewal_key(sub, len(previous) + 1)
+            new_charges.append(RenewalCharge(
+                run=run,
+                user_subscription=sub,
+                payment_method=sub.user.default_payment_method,
+                idempotency_key=keys[sub.pk],
+                period_end=sub.end_date,
+                amount=sub.subscription.price_usd,
+            ))
+
+        RenewalCharge.objects.bulk_create(new_charges, ignore_conflicts=True)
+        charges = RenewalCharge.objects.select_related('payment_method').in_bulk(
+            keys.values(), field_name='idempotency_key'
+        )
+
+        renewed, changed = [], []
+        for sub in subscriptions:
+            if sub.pk not in keys:
+                continue
+            charge = charges[keys[sub.pk]]
+            if charge.status != 'pending':
+                continue
+            charge.run = run
+
+            if charge.payment_method is None or not charge.payment_method.is_usable():
+                charge.status = 'failed'
+                charge.error = 'Нет действующего способа оплаты'
+            else:
+                result = provider.charge(charge.payment_method, charge.amount, 'USD', charge.idempotency_key)
+                if result.succeeded:
+                    charge.status = 'succeeded'
+                    charge.provider_charge_id = result.charge_id
+                    sub.end_date += datetime.timedelta(days=sub.subscription.duration_days)
+                    sub.updated_at = now
+                    renewed.append(sub)
+                else:
+                    charge.status = 'failed'
+                    charge.error = result.error
+            charge.updated_at = now
+            changed.append(charge)
+
+        with transaction.atomic():
+            UserSubscription.objects.bulk_update(renewed, ['end_date', 'updated_at'])
+            RenewalCharge.objects.bulk_update(changed, ['run', 'status', 'provider_charge_id', 'error', 'updated_at'])
+        entitlements.invalidate(*{sub.user_id for sub in renewed})
+        library.invalidate(*{sub.user_id for sub in renewed})
+        return len(renewed)
+    finally:
+        # Каждый поток пула открывает своё соединение с БД
+        connection.close()
+
+
+def renew_subscriptions(run_key=None, batch_size=500, workers=4, within=datetime.timedelta(days=1)):
+    """
+    Прогон автопродления: выбрать подписки к продлению и списать оплату.
+
+    Пачки обрабатываются параллельно в пуле из workers потоков. Прогон с тем же run_key
+    можно безопасно перезапускать: уже обработанные периоды пропускаются.
+    """
+    run_key = run_key or f'renewal-{timezone.now().date().isoformat()}'
+    run, _ = BillingRun.objects.get_or_create(key=run_key)
+    BillingRun.objects.filter(pk=run.pk).update(status='running', finished_at=None)
+    provider = get_payment_provider()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            in_flight = set()
+            for ids in iter_due_batches(within, batch_size):
+                in_flight.add(pool.submit(process_batch, run, provider, ids))
+                if len(in_flight) >= workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+            for future in in_flight:
+                future.result()
+    except Exception:
+        BillingRun.objects.filter(pk=run.pk).update(status='failed', finished_at=timezone.now())
+        logger.exception('Renewal run %s failed', run_key)
+        raise
+
+    totals = run.charges.aggregate(
+        succeeded=Count('id', filter=Q(status='succeeded')),
+        failed=Count('id', filter=Q(status='failed')),
+    )
+    BillingRun.objects.filter(pk=run.pk).update(
+        status='finished',
+        finished_at=timezone.now(),
+        succeeded_count=totals['succeeded'],
+        failed_count=totals['failed'],
+    )
+    logger.info('Renewal run %s: succeeded=%s failed=%s', run_key, totals['succeeded'], totals['failed'])
+    return totals
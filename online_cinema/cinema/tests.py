@@ -1,3 +1,797 @@
-from django.test import TestCase
+import datetime
+import io
+import math
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import content_similarity, entitlements, episodes, library, playlists, rating_stats, ratings, slugs, trending
+from .billing import FakePaymentProvider
+from .subscription_expiry import expire_subscriptions
+from .subscription_renewal import renew_subscriptions
+from .models import (
+    BillingRun, Chapter, ChapterDailyViews, ChapterLSHBucket, ChapterPersonRole, ChapterRatingHistogram, ChapterTrendingScore, Episode, Franchise,
+    Genre, GenreDailyViews, PlaybackProgress, Person, PersonSummary, Playlist, PlaylistChapter, PlaylistFollow, Rating, RatingPrior, Subscription, User, UserPaymentMethod, UserSubscription,
+)
+from .playback import PlaybackBuffer
+from .serializers import UserPaymentMethodSerializer
+from .slugs import allocate_slugs, assign_slugs, transliterate
+from .video_packaging import MANIFEST_NAME, package_episode, rendition_dir
+from .view_events import ViewEventLog, view_event_log, views_flushed
+
+
+# Файловый кэш из настроек переживает запуск тестов, а id в тестовой БД повторяются
+_cache_override = override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+
+
+def setUpModule():
+    _cache_override.enable()
+    # Журнал просмотров — объект уровня модуля; пишем его сегменты во временный каталог
+    global _view_events_dir, _view_events_original_dir
+    _view_events_dir = tempfile.mkdtemp()
+    _view_events_original_dir, view_event_log.directory = view_event_log.directory, _view_events_dir
+
+
+def tearDownModule():
+    _cache_override.disable()
+    view_event_log._pending.clear()
+    view_event_log.directory = _view_events_original_dir
+    shutil.rmtree(_view_events_dir, ignore_errors=True)
+
+
+def make_chapter(title, **kwargs):
+    kwargs.setdefault('release_date', datetime.date(2020, 1, 1))
+    kwargs.setdefault('content_type', 'movie')
+    kwargs.setdefault('age_rating', 12)
+    return Chapter.objects.create(title=title, **kwargs)
+
+
+def make_users(count, prefix='user'):
+    return [User.objects.create(username=f'{prefix}{i}') for i in range(count)]
+
+
+class RatingAggregatesTests(TestCase):
+    def setUp(self):
+        self.users = make_users(3)
+        self.chapter = make_chapter('Глава')
+
+    def histogram(self, chapter):
+        return ChapterRatingHistogram.objects.get(pk=chapter.pk).counts
+
+    def assert_aggregates(self, chapter, total, count, histogram):
+        chapter.refresh_from_db()
+        self.assertEqual((chapter.rating_sum, chapter.rating_count), (total, count))
+        self.assertAlmostEqual(chapter.rating_cache, total / count if count else 0.0)
+        self.assertEqual(self.histogram(chapter), histogram)
+
+    def test_create_update_delete(self):
+        rating = Rating.objects.create(user=self.users[0], chapter=self.chapter, score=8)
+        Rating.objects.create(user=self.users[1], chapter=self.chapter, score=4)
+        self.assert_aggregates(self.chapter, 12, 2, [0, 0, 0, 1, 0, 0, 0, 1, 0, 0])
+
+        rating.score = 10
+        rating.save()
+        self.assert_aggregates(self.chapter, 14, 2, [0, 0, 0, 1, 0, 0, 0, 0, 0, 1])
+
+        rating.delete()
+        self.assert_aggregates(self.chapter, 4, 1, [0, 0, 0, 1, 0, 0, 0, 0, 0, 0])
+
+    def test_move_rating_to_another_chapter(self):
+        other = make_chapter('Другая глава')
+        rating = Rating.objects.create(user=self.users[0], chapter=self.chapter, score=6)
+        Rating.objects.create(user=self.users[1], chapter=other, score=2)
+
+        rating.chapter = other
+        rating.score = 7
+        rating.save()
+
+        self.assert_aggregates(self.chapter, 0, 0, [0] * 10)
+        self.assert_aggregates(other, 9, 2, [0, 1, 0, 0, 0, 0, 1, 0, 0, 0])
+
+    def test_bulk_upsert(self):
+        other = make_chapter('Другая глава')
+        Rating.objects.create(user=self.users[0], chapter=self.chapter, score=3)
+
+        results = ratings.bulk_upsert(self.users[0], [
+            {'chapter': self.chapter.pk, 'score': 9},
+            {'chapter': other.pk, 'score': 5},
+            {'chapter': other.pk + 1000, 'score': 5},
+        ])
+
+        self.assertEqual([result['status'] for result in results], ['updated', 'created', 'not_found'])
+        self.assert_aggregates(self.chapter, 9, 1, [0, 0, 0, 0, 0, 0, 0, 0, 1, 0])
+        self.assert_aggregates(other, 5, 1, [0, 0, 0, 0, 1, 0, 0, 0, 0, 0])
+
+        results = ratings.bulk_upsert(self.users[0], [{'chapter': other.pk, 'score': 5}])
+        self.assertEqual(results[0]['status'], 'unchanged')
+        self.assert_aggregates(other, 5, 1, [0, 0, 0, 0, 1, 0, 0, 0, 0, 0])
+
+    def test_delete_chapter_with_ratings(self):
+        for user, score in zip(self.users, (5, 5, 9)):
+            Rating.objects.create(user=user, chapter=self.chapter, score=score)
+
+        self.chapter.delete()
+
+        self.assertFalse(Rating.objects.exists())
+        self.assertFalse(ChapterRatingHistogram.objects.exists())
+
+    def test_delete_franchise_with_rated_chapters(self):
+        franchise = Franchise.objects.create(title='Франшиза')
+        chapter = make_chapter('Глава франшизы', franchise=franchise, chapter_number=1)
+        Rating.objects.create(user=self.users[0], chapter=chapter, score=7)
+
+        franchise.delete()
+
+        self.assertFalse(Chapter.objects.filter(pk=chapter.pk).exists())
+
+
+class RatingPriorTests(TestCase):
+    def setUp(self):
+        cache.delete(rating_stats.PRIOR_CACHE_KEY)
+        self.addCleanup(cache.delete, rating_stats.PRIOR_CACHE_KEY)
+        self.users = make_users(2)
+        self.chapters = [make_chapter('Первая'), make_chapter('Вторая'), make_chapter('Третья')]
+
+    def weighted_scores(self):
+        return [Chapter.objects.get(pk=chapter.pk).weighted_score for chapter in self.chapters]
+
+    def test_first_ratings_on_empty_catalog(self):
+        self.assertIsNone(rating_stats.rating_prior())
+
+        Rating.objects.create(user=self.users[0], chapter=self.chapters[0], score=9)
+        self.assertEqual(RatingPrior.objects.get().rating_count, 1)
+        self.assertEqual(rating_stats.rating_prior(), 9.0)
+        self.assertAlmostEqual(self.weighted_scores()[0], 9.0)
+
+        Rating.objects.create(user=self.users[1], chapter=self.chapters[1], score=7)
+        first, second, unrated = self.weighted_scores()
+        self.assertAlmostEqual(second, (9.0 * rating_stats.PRIOR_WEIGHT + 7) / 11)
+        self.assertGreater(first, second)
+        self.assertEqual(unrated, 0.0)
+
+    def test_distribution_without_prior(self):
+        RatingPrior.objects.update_or_create(pk=1, defaults={'mean': 0.0, 'rating_count': 0})
+        ChapterRatingHistogram.objects.create(chapter=self.chapters[0], score_8=1, score_6=1)
+
+        stats = rating_stats.distribution(self.chapters[0])
+
+        self.assertEqual((stats['mean'], stats['bayesian_average']), (7.0, 7.0))
+
+    def test_refresh_prior(self):
+        Rating.objects.create(user=self.users[0], chapter=self.chapters[0], score=8)
+        Rating.objects.create(user=self.users[1], chapter=self.chapters[0], score=6)
+
+        prior = rating_stats.refresh_prior()
+
+        self.assertEqual((prior.mean, prior.rating_count), (7.0, 2))
+        self.assertEqual(rating_stats.rating_prior(), 7.0)
+        self.assertAlmostEqual(self.weighted_scores()[0], (70 + 14) / 12)
+
+
+class EntitlementCacheTests(TestCase):
+    def setUp(self):
+        self.user, = make_users(1)
+        self.plan = Subscription.objects.create(title='Премиум', price_usd=5, duration_days=30, description='')
+        self.chapter = make_chapter('Платная глава', required_subscription=self.plan)
+        cache.delete(entitlements._cache_key(self.user.pk))
+
+    def fresh_user(self):
+        # Права запоминаются и на объекте пользователя — каждый «запрос» берёт нового
+        return User.objects.get(pk=self.user.pk)
+
+    def test_subscription_changes_invalidate_cache(self):
+        self.assertFalse(entitlements.can_access(self.fresh_user(), self.chapter))
+
+        now = timezone.now()
+        subscription = UserSubscription.objects.create(
+            user=self.user, subscription=self.plan, start_date=now, end_date=now + datetime.timedelta(days=30)
+        )
+        self.assertTrue(entitlements.can_access(self.fresh_user(), self.chapter))
+
+        subscription.is_active = False
+        subscription.save()
+        self.assertFalse(entitlements.can_access(self.fresh_user(), self.chapter))
+
+    def test_cached_until_nearest_change(self):
+        now = timezone.now()
+        UserSubscription.objects.create(
+            user=self.user, subscription=self.plan,
+            start_date=now + datetime.timedelta(hours=1), end_date=now + datetime.timedelta(days=30),
+        )
+        with self.assertNumQueries(1):
+            self.assertFalse(entitlements.can_access(self.user, self.chapter))
+        # Другой объект пользователя (следующий запрос) получает права из кэша
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertFalse(entitlements.can_access(user, self.chapter))
+
+        with mock.patch('cinema.entitlements.timezone.now', return_value=now + datetime.timedelta(hours=2)):
+            cache.delete(entitlements._cache_key(self.user.pk))
+            self.assertTrue(entitlements.can_access(self.fresh_user(), self.chapter))
+
+
+class PaymentMethodExpiryTests(TestCase):
+    def setUp(self):
+        self.user, = make_users(1)
+
+    def card(self, month, year):
+        return {
+            'user': self.user.pk, 'payment_type': 'card', 'provider_id': 'card_1',
+            'card_expiry_month': month, 'card_expiry_year': year,
+        }
+
+    def test_valid_until_end_of_expiry_month(self):
+        serializer = UserPaymentMethodSerializer(data=self.card(12, 30))
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        method = serializer.save()
+
+        self.assertEqual(method.valid_until, datetime.datetime(2031, 1, 1, tzinfo=datetime.timezone.utc))
+        self.assertFalse(method.is_expired)
+
+    def test_out_of_range_expiry_rejected(self):
+        for month, year, field in ((13, 2030, 'card_expiry_month'), (0, 2030, 'card_expiry_month'),
+                                   (5, 999, 'card_expiry_year'), (5, 10000, 'card_expiry_year')):
+            serializer = UserPaymentMethodSerializer(data=self.card(month, year))
+            self.assertFalse(serializer.is_valid())
+            self.assertIn(field, serializer.errors)
+        self.assertFalse(UserPaymentMethod.objects.exists())
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.chapters = [make_chapter('Первая'), make_chapter('Вторая')]
+        self.start = timezone.now()
+
+    def scores(self, window='24h'):
+        return dict(ChapterTrendingScore.objects.filter(window=window).values_list('chapter_id', 'score'))
+
+    def test_newer_events_weigh_more(self):
+        trending.bump([(self.chapters[0].pk, 'view', self.start)] * 2)
+        trending.bump([(self.chapters[1].pk, 'view', self.start + datetime.timedelta(hours=24))])
+
+        scores = self.scores()
+        # Два просмотра суткой раньше весят как 2/e одного свежего
+        self.assertAlmostEqual(scores[self.chapters[0].pk] * math.e / 2, scores[self.chapters[1].pk])
+
+    def test_rebase_keeps_order(self):
+        trending.get_epochs()
+        trending.bump([(self.chapters[0].pk, 'review', self.start), (self.chapters[1].pk, 'rating', self.start)])
+        before = self.scores('7d')
+
+        later = self.start + datetime.timedelta(days=3)
+        with mock.patch('cinema.trending.timezone.now', return_value=later):
+            trending.rebase()
+        trending.bump([(self.chapters[1].pk, 'view', later)])
+
+        after = self.scores('7d')
+        factor = after[self.chapters[0].pk] / before[self.chapters[0].pk]
+        self.assertAlmostEqual(factor, math.exp(-3 / 7), places=4)
+        self.assertAlmostEqual(after[self.chapters[1].pk], before[self.chapters[1].pk] * factor + 1.0, places=4)
+
+
+class FilmographyTests(TestCase):
+    def setUp(self):
+        self.people = [Person.objects.create(first_name='Анна'), Person.objects.create(first_name='Борис')]
+        self.chapter = make_chapter('Фильм')
+
+    def chapter_count(self, person):
+        return PersonSummary.objects.get(pk=person.pk).chapter_count
+
+    def test_moving_role_refreshes_both_people(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            role = ChapterPersonRole.objects.create(chapter=self.chapter, person=self.people[0], role='actor')
+        self.assertEqual(self.chapter_count(self.people[0]), 1)
+
+        role.person = self.people[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            role.save()
+
+        self.assertEqual(self.chapter_count(self.people[0]), 0)
+        self.assertEqual(self.chapter_count(self.people[1]), 1)
+
+    def test_unknown_role_is_listed(self):
+        ChapterPersonRole.objects.create(chapter=self.chapter, person=self.people[0], role='actor')
+        ChapterPersonRole.objects.filter(person=self.people[0]).update(role='composer')
+
+        response = APIClient().get(f'/api/v1/people/{self.people[0].pk}/filmography/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['roles']), ['composer'])
+
+
+class PlaylistFollowTests(TestCase):
+    def setUp(self):
+        self.owner, self.reader = make_users(2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def follow_url(self, playlist):
+        return f'/api/v1/playlists/{playlist.pk}/follow/'
+
+    def test_follow_public_playlist(self):
+        playlist = Playlist.objects.create(user=self.owner, title='Открытый', is_public=True)
+
+        self.assertEqual(self.client.post(self.follow_url(playlist)).status_code, 201)
+        self.assertEqual(self.client.post(self.follow_url(playlist)).status_code, 200)
+        self.assertEqual(self.client.delete(self.follow_url(playlist)).status_code, 204)
+        self.assertFalse(PlaylistFollow.objects.exists())
+
+    def test_private_playlist_only_for_owner(self):
+        playlist = Playlist.objects.create(user=self.owner, title='Закрытый')
+
+        self.assertEqual(self.client.post(self.follow_url(playlist)).status_code, 404)
+        self.assertFalse(PlaylistFollow.objects.exists())
+
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.client.post(self.follow_url(playlist)).status_code, 201)
+
+
+class AsyncCatalogTests(TestCase):
+    def setUp(self):
+        self.chapter = make_chapter('Фильм')
+        Episode.objects.create(chapter=self.chapter, episode_number=1, duration=datetime.timedelta(minutes=90))
+
+    async def test_matches_drf_responses(self):
+        for path in (f'chapters/{self.chapter.pk}/', f'chapters/{self.chapter.pk}/episodes/', 'genres/'):
+            response = await self.async_client.get(f'/api/v1/async/{path}')
+            expected = await self.async_client.get(f'/api/v1/{path}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), expected.json())
+
+    async def test_not_found_is_json(self):
+        for path in (f'chapters/{self.chapter.pk + 1}/', f'chapters/{self.chapter.pk + 1}/episodes/', 'franchises/1/'):
+            response = await self.async_client.get(f'/api/v1/async/{path}')
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json(), {'detail': 'Not found.'})
+
+
+class ContentSimilarityTests(TestCase):
+    def setUp(self):
+        self.director = Person.objects.create(first_name='Режиссёр')
+        self.actors = [Person.objects.create(first_name=f'Актёр {i}') for i in range(3)]
+
+    def make_film(self, title, actors):
+        chapter = make_chapter(title, country='Франция')
+        ChapterPersonRole.objects.create(chapter=chapter, person=self.director, role='director')
+        for actor in actors:
+            ChapterPersonRole.objects.create(chapter=chapter, person=actor, role='actor')
+        return chapter
+
+    def test_similar_films_share_buckets(self):
+        first = self.make_film('Первый', self.actors)
+        second = self.make_film('Второй', self.actors)
+        other = make_chapter('Чужой', country='Япония')
+        content_similarity.index_chapters([first.pk, second.pk, other.pk])
+
+        self.assertEqual(content_similarity.similar(first.pk), [(second.pk, 1.0)])
+
+    def test_low_feature_chapters_skip_lsh(self):
+        bare = [make_chapter(f'Без описания {i}', country='США') for i in range(3)]
+        content_similarity.index_chapters([chapter.pk for chapter in bare])
+
+        self.assertFalse(ChapterLSHBucket.objects.exists())
+        self.assertEqual(content_similarity.similar(bare[0].pk), [])
+
+    def test_type_and_age_do_not_make_chapters_similar(self):
+        first = self.make_film('Первый', self.actors)
+        strangers = [Person.objects.create(first_name=f'Незнакомец {i}') for i in range(4)]
+        other = make_chapter('Другой', country='Япония')
+        for person in strangers:
+            ChapterPersonRole.objects.create(chapter=other, person=person, role='actor')
+        content_similarity.index_chapters([first.pk, other.pk])
+
+        self.assertEqual(ChapterLSHBucket.objects.filter(chapter=first).count(), content_similarity.BANDS)
+        self.assertEqual(content_similarity.similar(first.pk), [])
+
+
+class SubscriptionExpiryTests(TestCase):
+    def setUp(self):
+        self.users = make_users(4)
+        self.plan = Subscription.objects.create(title='Премиум', price_usd=5, duration_days=30, description='')
+        self.now = timezone.now()
+
+    def subscribe(self, user, ended_days_ago, **kwargs):
+        end_date = self.now - datetime.timedelta(days=ended_days_ago)
+        return UserSubscription.objects.create(
+            user=user, subscription=self.plan, start_date=end_date - datetime.timedelta(days=30), end_date=end_date, **kwargs
+        )
+
+    def test_expire_in_batches_with_renewal_grace(self):
+        expired = self.subscribe(self.users[0], 1)
+        current = self.subscribe(self.users[1], -5)
+        in_grace = self.subscribe(self.users[2], 1, auto_renew=True)
+        past_grace = self.subscribe(self.users[3], 10, auto_renew=True)
+
+        with override_settings(SUBSCRIPTION_RENEWAL_GRACE_DAYS=3):
+            stats = expire_subscriptions(batch_size=1)
+
+        self.assertEqual((stats['expired'], stats['batches'], stats['users'], stats['in_grace']), (2, 2, 2, 1))
+        active = set(UserSubscription.objects.filter(is_active=True).values_list('id', flat=True))
+        self.assertEqual(active, {current.pk, in_grace.pk})
+        self.assertEqual(set(UserSubscription.objects.active().values_list('id', flat=True)), {current.pk})
+        self.assertEqual(
+            set(UserSubscription.objects.expired().values_list('id', flat=True)), {expired.pk, in_grace.pk, past_grace.pk}
+        )
+
+    def test_expiry_drops_cached_entitlements(self):
+        chapter = make_chapter('Платная глава', required_subscription=self.plan)
+        subscription = self.subscribe(self.users[0], -1)
+        self.assertTrue(entitlements.can_access(User.objects.get(pk=self.users[0].pk), chapter))
+
+        UserSubscription.objects.filter(pk=subscription.pk).update(end_date=self.now - datetime.timedelta(days=1))
+        expire_subscriptions()
+
+        self.assertFalse(entitlements.can_access(User.objects.get(pk=self.users[0].pk), chapter))
+
+
+class SubscriptionRenewalTests(TransactionTestCase):
+    # Пачки продлеваются в потоках пула со своими соединениями — им нужны зафиксированные данные.
+    # Один поток: SQLite в памяти блокирует таблицу целиком при параллельной записи
+    def setUp(self):
+        self.plan = Subscription.objects.create(title='Премиум', price_usd=5, duration_days=30, description='')
+        self.end_date = timezone.now() + datetime.timedelta(hours=6)
+        self.subscriptions = []
+        for index, provider_id in enumerate(['card_ok', 'decline_card', None]):
+            user = User.objects.create(username=f'subscriber{index}')
+            if provider_id:
+                UserPaymentMethod.objects.create(user=user, payment_type='paypal', provider_id=provider_id)
+            self.subscriptions.append(UserSubscription.objects.create(
+                user=user, subscription=self.plan, auto_renew=True,
+                start_date=self.end_date - datetime.timedelta(days=30), end_date=self.end_date,
+            ))
+
+    def end_dates(self):
+        return [UserSubscription.objects.get(pk=sub.pk).end_date for sub in self.subscriptions]
+
+    def test_renewal_run_is_idempotent(self):
+        charges_before = FakePaymentProvider.charges_count()
+
+        totals = renew_subscriptions(run_key='test-run', batch_size=2, workers=1)
+
+        self.assertEqual(totals, {'succeeded': 1, 'failed': 2})
+        renewed = self.end_date + datetime.timedelta(days=30)
+        self.assertEqual(self.end_dates(), [renewed, self.end_date, self.end_date])
+        self.assertEqual(BillingRun.objects.get(key='test-run').status, 'finished')
+
+        self.assertEqual(renew_subscriptions(run_key='test-run', batch_size=2, workers=1), totals)
+        self.assertEqual(self.end_dates(), [renewed, self.end_date, self.end_date])
+        self.assertEqual(FakePaymentProvider.charges_count(), charges_before + 1)
+
+    def test_failed_charge_retried_by_next_run(self):
+        renew_subscriptions(run_key='test-run-1', batch_size=2, workers=1)
+        declined = UserPaymentMethod.objects.get(user=self.subscriptions[1].user)
+        declined.provider_id = 'card_new'
+        declined.save()
+
+        totals = renew_subscriptions(run_key='test-run-2', batch_size=2, workers=1)
+
+        self.assertEqual(totals, {'succeeded': 1, 'failed': 1})
+        renewed = self.end_date + datetime.timedelta(days=30)
+        self.assertEqual(self.end_dates(), [renewed, renewed, self.end_date])
+        self.assertEqual(
+            list(self.subscriptions[1].renewal_charges.order_by('created_at', 'id').values_list('status', flat=True)),
+            ['failed', 'succeeded'],
+        )
+        self.assertEqual(self.subscriptions[0].renewal_charges.count(), 1)
+
+
+class PlaylistPositionTests(TestCase):
+    def setUp(self):
+        self.user, = make_users(1)
+        self.playlist = Playlist.objects.create(user=self.user, title='Плейлист')
+        self.chapters = [make_chapter(f'Глава {i}').pk for i in range(4)]
+
+    def order(self):
+        return list(
+            PlaylistChapter.objects.filter(playlist=self.playlist).order_by('position', 'id').values_list('chapter_id', flat=True)
+        )
+
+    def test_add_skips_duplicates_and_missing(self):
+        a, b, c, d = self.chapters
+        self.assertEqual(playlists.add_chapters(self.playlist, [b, a, b, d + 100]), [b, a])
+        self.assertEqual(playlists.add_chapters(self.playlist, [a, c]), [c])
+
+        self.assertEqual(self.order(), [b, a, c])
+        self.assertEqual(playlists.remove_chapters(self.playlist, [a, d]), 1)
+        self.assertEqual(self.order(), [b, c])
+
+    def test_move_touches_one_row(self):
+        a, b, c, d = self.chapters
+        playlists.add_chapters(self.playlist, self.chapters)
+
+        with CaptureQueriesContext(connection) as queries:
+            playlists.move_chapter(self.playlist, d, after_chapter_id=a)
+        self.assertEqual([query['sql'].split()[0] for query in queries].count('UPDATE'), 1)
+        self.assertEqual(self.order(), [a, d, b, c])
+
+        playlists.move_chapter(self.playlist, c, after_chapter_id=None)
+        self.assertEqual(self.order(), [c, a, d, b])
+
+        with self.assertRaises(PlaylistChapter.DoesNotExist):
+            playlists.move_chapter(self.playlist, c, after_chapter_id=c + 100)
+
+    def test_exhausted_gap_respaces(self):
+        a, b, c, _ = self.chapters
+        playlists.add_chapters(self.playlist, [a, b, c])
+        # Каждое перемещение делит промежуток между a и следующей главой пополам
+        for _ in range(12):
+            playlists.move_chapter(self.playlist, c, after_chapter_id=a)
+            playlists.move_chapter(self.playlist, b, after_chapter_id=a)
+
+        self.assertEqual(self.order(), [a, b, c])
+        positions = list(PlaylistChapter.objects.filter(playlist=self.playlist).values_list('position', flat=True))
+        self.assertEqual(len(set(positions)), 3)
+
+
+class SlugAllocationTests(TestCase):
+    def setUp(self):
+        self.user, = make_users(1)
+
+    def test_transliterated_and_numbered(self):
+        self.assertEqual(transliterate('Щука и Ёж'), 'Shhuka i Yozh')
+        first = Playlist.objects.create(user=self.user, title='Избранное')
+        second = Playlist.objects.create(user=self.user, title='Избранное')
+        untitled = Playlist.objects.create(user=self.user, title='')
+
+        self.assertEqual((first.slug, second.slug, untitled.slug), ('izbrannoe', 'izbrannoe-2', 'playlist'))
+
+    def test_next_number_after_highest_taken(self):
+        Playlist.objects.bulk_create([
+            Playlist(user=self.user, title='Избранное', slug=slug)
+            for slug in ('izbrannoe', 'izbrannoe-9', 'izbrannoe-10', 'izbrannoe-stariy')
+        ])
+
+        with self.assertNumQueries(1):
+            slugs = allocate_slugs(Playlist, ['Избранное', 'Новое', 'Избранное'], 'playlist')
+        self.assertEqual(slugs, ['izbrannoe-11', 'novoe', 'izbrannoe-12'])
+
+    def test_save_retries_slug_taken_concurrently(self):
+        Playlist.objects.create(user=self.user, title='Избранное')
+        taken_numbers = slugs._taken_numbers
+        playlist = Playlist(user=self.user, title='Избранное')
+        # Первый подбор не видит строку, вставленную «параллельным» запросом
+        with mock.patch.object(slugs, '_taken_numbers') as lookup:
+            lookup.side_effect = lambda *args: {} if lookup.call_count == 1 else taken_numbers(*args)
+            playlist.save()
+
+        self.assertEqual(playlist.slug, 'izbrannoe-2')
+        self.assertEqual(lookup.call_count, 2)
+
+    def test_assign_slugs_before_bulk_create(self):
+        objects = [Playlist(user=self.user, title='Лето'), Playlist(user=self.user, title='Лето', slug='custom')]
+        Playlist.objects.bulk_create(assign_slugs(objects, 'playlist'))
+
+        self.assertEqual(sorted(Playlist.objects.values_list('slug', flat=True)), ['custom', 'leto'])
+
+
+class LibraryCacheTests(TestCase):
+    def setUp(self):
+        self.user, = make_users(1)
+        self.chapter = make_chapter('Глава')
+        self.pages = library.parse_pages({'ratings_limit': '1'})
+
+    def test_cached_until_user_writes(self):
+        Rating.objects.create(user=self.user, chapter=self.chapter, score=7)
+        first = library.get_library(self.user, self.pages)
+        self.assertEqual(len(first['ratings']['results']), 1)
+        self.assertIsNone(first['ratings']['next_offset'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(library.get_library(self.user, self.pages), first)
+
+        Rating.objects.create(user=self.user, chapter=make_chapter('Другая'), score=9)
+        updated = library.get_library(self.user, self.pages)
+        self.assertEqual(updated['ratings']['next_offset'], 1)
+
+
+class PlaybackBufferTests(TestCase):
+    def setUp(self):
+        self.users = make_users(2)
+        chapter = make_chapter('Сериал', content_type='series')
+        self.episode = Episode.objects.create(chapter=chapter, episode_number=1, duration=datetime.timedelta(minutes=40))
+        self.buffer = PlaybackBuffer(max_pending=100, flush_interval=3600)
+
+    def test_record_keeps_last_position(self):
+        self.buffer.record(self.users[0].pk, self.episode.pk, 10)
+        self.buffer.record(self.users[0].pk, self.episode.pk, 2390)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        progress = PlaybackProgress.objects.get()
+        self.assertEqual(progress.position_seconds, 2390)
+        self.assertTrue(progress.is_finished)
+
+    def test_flush_single_user(self):
+        self.buffer.record(self.users[0].pk, self.episode.pk, 60)
+        self.buffer.record(self.users[1].pk, self.episode.pk, 120)
+
+        self.assertEqual(self.buffer.flush(user_id=self.users[0].pk), 1)
+        self.assertEqual(list(PlaybackProgress.objects.values_list('user_id', flat=True)), [self.users[0].pk])
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(PlaybackProgress.objects.count(), 2)
+
+
+class ViewEventLogTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        original, view_event_log.directory = view_event_log.directory, directory
+        self.addCleanup(setattr, view_event_log, 'directory', original)
+        view_event_log._pending.clear()
+        self.users = make_users(2)
+        self.genre = Genre.objects.create(name='Драма')
+        self.chapters = [make_chapter('Первая'), make_chapter('Вторая')]
+        self.chapters[0].genres.add(self.genre)
+        self.today = timezone.now().date()
+
+    def test_concurrent_flushes_keep_segment_readable(self):
+        log = ViewEventLog(view_event_log.directory, max_pending=1, flush_interval=60)
+
+        def record_many():
+            for _ in range(50):
+                log.record(self.users[0].pk, self.chapters[0].pk)
+
+        # Приёмники views_flushed пишут в БД, а тестовая SQLite в памяти не принимает запись из нескольких потоков
+        with mock.patch.object(views_flushed, 'send'):
+            threads = [threading.Thread(target=record_many) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            log.flush()
+
+        self.assertEqual(len(list(log.iter_day(self.today))), 200)
+
+    def test_rollup_is_idempotent(self):
+        first, second = self.chapters
+        for user in self.users:
+            view_event_log.record(user.pk, first.pk)
+        view_event_log.record(self.users[0].pk, first.pk)
+        view_event_log.record(None, second.pk)
+
+        for _ in range(2):
+            call_command('rollup_view_events', date=self.today.isoformat(), stdout=io.StringIO())
+
+        daily = {row.chapter_id: (row.views, row.unique_viewers) for row in ChapterDailyViews.objects.filter(date=self.today)}
+        self.assertEqual(daily, {first.pk: (3, 2), second.pk: (1, 0)})
+        self.assertEqual(GenreDailyViews.objects.get(genre=self.genre, date=self.today).views, 3)
+        self.assertEqual([Chapter.objects.get(pk=c.pk).view_count for c in self.chapters], [3, 1])
+
+
+class EpisodeOrderTests(TestCase):
+    def setUp(self):
+        self.chapter = make_chapter('Сериал')
+        self.episodes = [
+            Episode.objects.create(chapter=self.chapter, episode_number=number, title=f'E{number}',
+                                   duration=datetime.timedelta(minutes=20))
+            for number in range(1, 4)
+        ]
+
+    def order(self):
+        return list(Episode.objects.filter(chapter=self.chapter).order_by('episode_number').values_list('title', 'episode_number'))
+
+    def test_insert_in_middle(self):
+        created = episodes.insert_episodes(self.chapter.pk, 2, [
+            {'title': 'N1', 'duration': datetime.timedelta(minutes=30)}, {'title': 'N2'},
+        ])
+
+        self.assertEqual([episode.episode_number for episode in created], [2, 3])
+        self.assertEqual(self.order(), [('E1', 1), ('N1', 2), ('N2', 3), ('E2', 4), ('E3', 5)])
+        self.chapter.refresh_from_db()
+        self.assertEqual(self.chapter.total_runtime, datetime.timedelta(minutes=90))
+
+    def test_insert_past_end_and_at_occupied_start(self):
+        episodes.insert_episodes(self.chapter.pk, 10, [{'title': 'E4'}])
+        episodes.insert_episodes(self.chapter.pk, 1, [{'title': 'E0'}])
+
+        self.assertEqual(self.order(), [('E0', 1), ('E1', 2), ('E2', 3), ('E3', 4), ('E4', 5)])
+
+    def test_reorder(self):
+        first, second, third = self.episodes
+        episodes.reorder_episodes(self.chapter.pk, [third.pk, first.pk, second.pk])
+        self.assertEqual(self.order(), [('E3', 1), ('E1', 2), ('E2', 3)])
+
+        # Эпизод, добавленный после проверки списка, встаёт в конец, а не сталкивается с занятыми номерами
+        episodes.insert_episodes(self.chapter.pk, 4, [{'title': 'E4'}])
+        episodes.reorder_episodes(self.chapter.pk, [first.pk, second.pk, third.pk])
+        self.assertEqual(self.order(), [('E1', 1), ('E2', 2), ('E3', 3), ('E4', 4)])
+
+
+class EpisodeStreamTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root, VIDEO_ACCEL_REDIRECT_LOCATION=None)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        os.makedirs(os.path.join(self.media_root, 'episode_videos'))
+        with open(os.path.join(self.media_root, 'episode_videos', 'video.mp4'), 'wb') as f:
+            f.write(bytes(range(256)) * 4)
+        self.chapter = make_chapter('Фильм')
+        self.episode = Episode.objects.create(chapter=self.chapter, episode_number=1, video_file='episode_videos/video.mp4')
+        self.client = APIClient()
+
+    def test_range_request(self):
+        response = self.client.get(f'/api/v1/episodes/{self.episode.pk}/stream/', HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(f'/api/v1/episodes/{self.episode.pk}/stream/', HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_missing_file(self):
+        self.episode.video_file = 'episode_videos/missing.mp4'
+        self.episode.save()
+
+        response = self.client.get(f'/api/v1/episodes/{self.episode.pk}/stream/')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_only_playback_starts_are_recorded(self):
+        url = f'/api/v1/episodes/{self.episode.pk}/stream/'
+        with mock.patch.object(view_event_log, 'record') as record:
+            self.client.head(url)
+            self.client.get(url, HTTP_RANGE='bytes=0-1')
+            self.client.get(url, HTTP_RANGE='bytes=512-')
+            self.assertEqual(record.call_count, 0)
+
+            self.client.get(url, HTTP_RANGE='bytes=0-')
+            self.client.get(url)
+            self.assertEqual(record.call_count, 2)
+
+    def test_missing_manifest(self):
+        self.episode.hls_manifest = f'{rendition_dir(self.episode)}/{MANIFEST_NAME}'
+        self.episode.save()
+
+        response = self.client.get(f'/api/v1/episodes/{self.episode.pk}/manifest/')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_missing_segment(self):
+        self.episode.hls_manifest = f'{rendition_dir(self.episode)}/{MANIFEST_NAME}'
+        self.episode.save()
+
+        response = self.client.get(f'/api/v1/episodes/{self.episode.pk}/segments/segment_00042.ts/')
+
+        self.assertEqual(response.status_code, 404)
+
+    def fake_ffmpeg(self, segments):
+        def run(command, **kwargs):
+            workdir = os.path.dirname(command[-1])
+            for name in segments:
+                with open(os.path.join(workdir, name), 'w') as f:
+                    f.write(name)
+            with open(command[-1], 'w') as f:
+                f.write('#EXTM3U\n' + ''.join(f'{name}\n' for name in segments))
+            return subprocess.CompletedProcess(command, 0, '', '')
+        return mock.patch('cinema.video_packaging.subprocess.run', side_effect=run)
+
+    def test_repackaging_replaces_rendition(self):
+        with self.fake_ffmpeg(['segment_00000.ts', 'segment_00001.ts']):
+            package_episode(self.episode)
+        with self.fake_ffmpeg(['segment_00000.ts']):
+            package_episode(self.episode)
+
+        target = os.path.join(self.media_root, rendition_dir(self.episode))
+        self.assertEqual(sorted(os.listdir(target)), [MANIFEST_NAME, 'segment_00000.ts'])
+        self.assertEqual(stat.S_IMODE(os.stat(target).st_mode), 0o755)
+        self.assertEqual(os.listdir(os.path.dirname(target)), ['hls'])
+
+        response = self.client.get(f'/api/v1/episodes/{self.episode.pk}/manifest/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'/api/v1/episodes/{self.episode.pk}/segments/segment_00000.ts', response.content.decode())
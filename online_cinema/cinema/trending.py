@@ -0,0 +1,98 @@
+import datetime
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Chapter, ChapterTrendingScore, TrendingEpoch
+
+
+# Постоянная затухания для каждого окна: вклад события уменьшается в e раз за это время
+WINDOWS = {
+    '24h': datetime.timedelta(hours=24),
+    '7d': datetime.timedelta(days=7),
+    '30d': datetime.timedelta(days=30),
+}
+
+SIGNAL_WEIGHTS = {
+    'view': 1.0,
+    'playlist': 2.0,
+    'rating': 3.0,
+    'review': 5.0,
+}
+
+
+def get_epochs(lock=False):
+    """
+    Точки отсчёта окон. lock=True (внутри транзакции) блокирует строки TrendingEpoch до её конца:
+    так bump и rebase не разойдутся в том, от какой эпохи посчитаны очки.
+    """
+    queryset = TrendingEpoch.objects.select_for_update() if lock else TrendingEpoch.objects.all()
+    epochs = dict(queryset.values_list('window', 'epoch'))
+    missing = [window for window in WINDOWS if window not in epochs]
+    if missing:
+        now = timezone.now()
+        TrendingEpoch.objects.bulk_create(
+            [TrendingEpoch(window=window, epoch=now) for window in missing], ignore_conflicts=True
+        )
+        epochs = dict(queryset.values_list('window', 'epoch'))
+    return epochs
+
+
+def bump(events):
+    """
+    Учесть события в трендовых рейтингах. events — итерируемое из (chapter_id, signal, happened_at).
+
+    Используется «прямое» затухание: событие добавляет weight * exp((t - epoch) / tau).
+    Все очки окна затухают с одинаковым множителем, поэтому порядок глав совпадает с порядком
+    по сумме weight * exp(-(now - t) / tau), а обновление — это просто прибавление к счётчику.
+    Эпоха читается и прибавка применяется в одной транзакции под блокировкой эпох,
+    иначе параллельный rebase мог бы умножить очки раньше, чем прибавится посчитанное от старой эпохи.
+    """
+    events = [(chapter_id, signal, happened_at) for chapter_id, signal, happened_at in events if chapter_id]
+    existing = set(Chapter.objects.filter(
+        id__in={chapter_id for chapter_id, _, _ in events}
+    ).values_list('id', flat=True))
+    events = [event for event in events if event[0] in existing]
+    if not events:
+        return 0
+
+    with transaction.atomic():
+        epochs = get_epochs(lock=True)
+        increments = defaultdict(float)
+        for chapter_id, signal, happened_at in events:
+            weight = SIGNAL_WEIGHTS[signal]
+            for window, tau in WINDOWS.items():
+                age = (happened_at - epochs[window]).total_seconds()
+                increments[(chapter_id, window)] += weight * math.exp(age / tau.total_seconds())
+
+        ChapterTrendingScore.objects.bulk_create(
+            [ChapterTrendingScore(chapter_id=chapter_id, window=window) for chapter_id, window in increments],
+            ignore_conflicts=True,
+        )
+        rows = ChapterTrendingScore.objects.filter(chapter_id__in=existing).values_list('id', 'chapter_id', 'window')
+        updates = [
+            ChapterTrendingScore(pk=pk, score=F('score') + increments[(chapter_id, window)], updated_at=timezone.now())
+            for pk, chapter_id, window in rows
+            if (chapter_id, window) in increments
+        ]
+        ChapterTrendingScore.objects.bulk_update(updates, ['score', 'updated_at'], batch_size=500)
+    return len(updates)
+
+
+def rebase(min_score=1e-6):
+    """
+    Перенести точку отсчёта окон на текущий момент, чтобы экспоненты не переполнялись.
+    Очки умножаются на общий множитель, порядок не меняется; выцветшие записи удаляются.
+    """
+    with transaction.atomic():
+        epochs = get_epochs(lock=True)
+        now = timezone.now()
+        for window, tau in WINDOWS.items():
+            factor = math.exp(-(now - epochs[window]).total_seconds() / tau.total_seconds())
+            scores = ChapterTrendingScore.objects.filter(window=window)
+            scores.update(score=F('score') * factor)
+            scores.filter(score__lt=min_score).delete()
+            TrendingEpoch.objects.filter(window=window).update(epoch=now)
@@ -17,7 +17,9 @@ from .views import (
     PlaylistViewSet,
     ViewHistoryViewSet,
     PlaylistChapterViewSet,
+    MeViewSet,
 )
+from . import async_views
 
 # Создание маршрутов для ViewSets
 router = DefaultRouter()
@@ -37,9 +39,21 @@ router.register(r'ratings', RatingViewSet)
 router.register(r'playlists', PlaylistViewSet)
 router.register(r'playlist-chapters', PlaylistChapterViewSet)
 router.register(r'ViewHistorys', ViewHistoryViewSet)
+router.register(r'me', MeViewSet, basename='me')
+
+
+# Асинхронные чтения каталога (полезны при запуске под ASGI, см. online_cinema/asgi.py)
+async_urlpatterns = [
+    path('chapters/', async_views.chapter_list, name='async-chapter-list'),
+    path('chapters/<int:pk>/', async_views.chapter_detail, name='async-chapter-detail'),
+    path('chapters/<int:pk>/episodes/', async_views.chapter_episodes, name='async-chapter-episodes'),
+    path('genres/', async_views.genre_list, name='async-genre-list'),
+    path('franchises/<int:pk>/', async_views.franchise_detail, name='async-franchise-detail'),
+]
 
 
 urlpatterns = [
+    path('v1/async/', include(async_urlpatterns)),
     path('v1/', include(router.urls)),
     path('v1/clubs/', include('fan_clubs.urls')),
 ]
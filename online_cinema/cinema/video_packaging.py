@@ -0,0 +1,94 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404
+from django.utils import timezone
+
+
+MANIFEST_NAME = 'index.m3u8'
+SEGMENT_PATTERN = 'segment_%05d.ts'
+
+
+class PackagingError(Exception):
+    pass
+
+
+def rendition_dir(episode):
+    """Относительный путь (в MEDIA_ROOT) к HLS-рендишену эпизода"""
+    return f'episode_videos/{episode.id}/hls'
+
+
+def package_episode(episode, segment_seconds=None):
+    """
+    Нарезать видео эпизода на HLS-сегменты фиксированной длительности.
+
+    ffmpeg только перепаковывает контейнер (-c copy), без перекодирования,
+    поэтому границы сегментов совпадают с ближайшими ключевыми кадрами.
+    Результат сначала пишется во временный каталог и затем подменяет старый рендишен целиком.
+    """
+    if not episode.video_file:
+        raise PackagingError(f'У эпизода {episode.id} нет видеофайла')
+
+    segment_seconds = segment_seconds or settings.HLS_SEGMENT_SECONDS
+    source = default_storage.path(episode.video_file.name)
+    target = default_storage.path(rendition_dir(episode))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    workdir = tempfile.mkdtemp(prefix='hls-', dir=os.path.dirname(target))
+    command = [
+        settings.FFMPEG_BINARY, '-nostdin', '-loglevel', 'error', '-y',
+        '-i', source,
+        '-map', '0:v:0', '-map', '0:a?',
+        '-c', 'copy',
+        '-f', 'hls',
+        '-hls_time', str(segment_seconds),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(workdir, SEGMENT_PATTERN),
+        os.path.join(workdir, MANIFEST_NAME),
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+    except OSError as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise PackagingError(f'Не удалось запустить ffmpeg: {e}')
+    if result.returncode != 0:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise PackagingError(result.stderr.strip() or f'ffmpeg завершился с кодом {result.returncode}')
+
+    # mkdtemp создаёт каталог с правами 0700 — веб-сервер (X-Accel-Redirect) не смог бы его читать
+    os.chmod(workdir, 0o755)
+    # Старый рендишен сначала отодвигаем в сторону: между двумя rename каталог target отсутствует
+    # лишь мгновение, а не всё время удаления старых сегментов
+    previous = None
+    if os.path.exists(target):
+        previous = f'{target}.old-{uuid.uuid4().hex[:8]}'
+        os.rename(target, previous)
+    os.rename(workdir, target)
+    if previous:
+        shutil.rmtree(previous, ignore_errors=True)
+
+    episode.hls_manifest = f'{rendition_dir(episode)}/{MANIFEST_NAME}'
+    episode.packaged_at = timezone.now()
+    episode.save(update_fields=['hls_manifest', 'packaged_at'])
+    return episode.hls_manifest
+
+
+def rewrite_manifest(manifest_name, segment_url):
+    """
+    Прочитать манифест и заменить имена сегментов на URL API.
+    segment_url — функция, получающая имя сегмента и возвращающая его URL.
+    """
+    try:
+        with default_storage.open(manifest_name, 'r') as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        raise Http404('Манифест не найден')
+    return '\n'.join(
+        line if not line or line.startswith('#') else segment_url(line.strip())
+        for line in lines
+    ) + '\n'
@@ -0,0 +1,178 @@
+import atexit
+import csv
+import datetime
+import gzip
+import io
+import os
+import shutil
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import Chapter, ChapterDailyViews, GenreDailyViews
+
+
+# Отправляется после каждого сброса журнала; events — список (viewed_at, user_id, chapter_id, episode_id)
+views_flushed = Signal()
+
+
+class ViewEventLog:
+    """
+    Журнал просмотров только на дозапись.
+
+    События копятся в памяти и сбрасываются пачкой в сжатые сегменты:
+    <directory>/<YYYY-MM-DD>/<host>-<pid>.csv.gz. Каждый сброс дописывает в файл
+    отдельный gzip-member. У каждого процесса свой файл, а потоки процесса пишут в него
+    по очереди под _write_lock: иначе куски их gzip-member'ов перемешались бы.
+    Каталог дня — это партиция: удаление старых данных сводится к удалению каталога.
+    """
+
+    def __init__(self, directory, max_pending, flush_interval):
+        self.directory = str(directory)
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # Отдельная блокировка на запись файлов: record не ждёт диска, пока идёт сброс
+        self._write_lock = threading.Lock()
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+    def record(self, user_id, chapter_id, episode_id=None):
+        with self._lock:
+            self._pending.append((timezone.now(), user_id, chapter_id, episode_id))
+            should_flush = (
+                len(self._pending) >= self.max_pending
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        by_day = defaultdict(list)
+        for event in pending:
+            by_day[event[0].date()].append(event)
+
+        for day, events in by_day.items():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for viewed_at, user_id, chapter_id, episode_id in events:
+                writer.writerow([viewed_at.isoformat(), user_id or '', chapter_id, episode_id or ''])
+
+            path = self.segment_path(day)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._write_lock, gzip.open(path, 'at', encoding='utf-8', newline='') as f:
+                f.write(buffer.getvalue())
+
+        views_flushed.send(sender=self.__class__, events=pending)
+        return len(pending)
+
+    def partition_dir(self, day):
+        return os.path.join(self.directory, day.isoformat())
+
+    def segment_path(self, day):
+        return os.path.join(self.partition_dir(day), f'{socket.gethostname()}-{os.getpid()}.csv.gz')
+
+    def iter_day(self, day):
+        """Все события за день: (viewed_at, user_id, chapter_id, episode_id)"""
+        partition = self.partition_dir(day)
+        if not os.path.isdir(partition):
+            return
+        for name in sorted(os.listdir(partition)):
+            if not name.endswith('.csv.gz'):
+                continue
+            with gzip.open(os.path.join(partition, name), 'rt', encoding='utf-8', newline='') as f:
+                for viewed_at, user_id, chapter_id, episode_id in csv.reader(f):
+                    yield (
+                        datetime.datetime.fromisoformat(viewed_at),
+                        int(user_id) if user_id else None,
+                        int(chapter_id),
+                        int(episode_id) if episode_id else None,
+                    )
+
+    def drop_before(self, day):
+        """Удалить партиции старше day. Возвращает список удалённых дат"""
+        dropped = []
+        if not os.path.isdir(self.directory):
+            return dropped
+        for name in sorted(os.listdir(self.directory)):
+            try:
+                partition_day = datetime.date.fromisoformat(name)
+            except ValueError:
+                continue
+            if partition_day < day:
+                shutil.rmtree(os.path.join(self.directory, name))
+                dropped.append(partition_day)
+        return dropped
+
+
+def rollup_day(day, backfill_view_count=True):
+    """
+    Посчитать дневные агрегаты по главам и жанрам из сегментов за день.
+
+    Повторный запуск за тот же день идемпотентен: строки агрегатов перезаписываются,
+    а в Chapter.view_count добавляется только разница с предыдущим подсчётом.
+    """
+    views = Counter()
+    viewers = defaultdict(set)
+    for _, user_id, chapter_id, _ in view_event_log.iter_day(day):
+        views[chapter_id] += 1
+        if user_id:
+            viewers[chapter_id].add(user_id)
+
+    existing = set(Chapter.objects.filter(id__in=views).values_list('id', flat=True))
+    previous = dict(ChapterDailyViews.objects.filter(date=day).values_list('chapter_id', 'views'))
+
+    ChapterDailyViews.objects.bulk_create(
+        [
+            ChapterDailyViews(chapter_id=chapter_id, date=day, views=count, unique_viewers=len(viewers[chapter_id]))
+            for chapter_id, count in views.items() if chapter_id in existing
+        ],
+        update_conflicts=True,
+        unique_fields=['chapter', 'date'],
+        update_fields=['views', 'unique_viewers'],
+    )
+
+    genre_views = Counter()
+    for chapter_id, genre_id in Chapter.genres.through.objects.filter(chapter_id__in=existing).values_list('chapter_id', 'genre_id'):
+        genre_views[genre_id] += views[chapter_id]
+    GenreDailyViews.objects.bulk_create(
+        [GenreDailyViews(genre_id=genre_id, date=day, views=count) for genre_id, count in genre_views.items()],
+        update_conflicts=True,
+        unique_fields=['genre', 'date'],
+        update_fields=['views'],
+    )
+
+    if backfill_view_count:
+        deltas = [
+            Chapter(pk=chapter_id, view_count=F('view_count') + views[chapter_id] - previous.get(chapter_id, 0))
+            for chapter_id in existing
+            if views[chapter_id] != previous.get(chapter_id, 0)
+        ]
+        Chapter.objects.bulk_update(deltas, ['view_count'], batch_size=500)
+
+    return {'events': sum(views.values()), 'chapters': len(existing), 'genres': len(genre_views)}
+
+
+def drop_expired_partitions(retention_days=None):
+    retention_days = retention_days or settings.VIEW_EVENTS_RETENTION_DAYS
+    return view_event_log.drop_before(timezone.now().date() - datetime.timedelta(days=retention_days))
+
+
+view_event_log = ViewEventLog(
+    settings.VIEW_EVENTS_DIR,
+    max_pending=settings.VIEW_EVENTS_FLUSH_MAX_PENDING,
+    flush_interval=settings.VIEW_EVENTS_FLUSH_INTERVAL,
+)
+atexit.register(view_event_log.flush)
@@ -1,12 +1,50 @@
-from rest_framework import viewsets
-from .models import PlaylistChapter, ViewHistory, User, UserPaymentMethod, Subscription, UserSubscription, Genre, Franchise, Chapter, Episode, Person, ChapterPersonRole, Comment, Review, Rating, Playlist
-from .serializers import ViewHistorySerializer, PlaylistChapterSerializer, UserSerializer, UserPaymentMethodSerializer, SubscriptionSerializer, UserSubscriptionSerializer, GenreSerializer, FranchiseSerializer, ChapterSerializer, EpisodeSerializer, PersonSerializer, ChapterPersonRoleSerializer, CommentSerializer, ReviewSerializer, RatingSerializer, PlaylistSerializer
-from django.db.models import Count
+from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from django.http import Http404, HttpResponse
+from django.utils.duration import duration_string
+from django.urls import reverse
+from .models import PlaylistChapter, ViewHistory, User, UserPaymentMethod, Subscription, UserSubscription, Genre, Franchise, Chapter, Episode, Person, ChapterPersonRole, Comment, Review, Rating, Playlist, PlaybackProgress, ChapterTrendingScore, PersonSummary, PlaylistFollow
+from .serializers import ViewHistorySerializer, PlaylistChapterSerializer, UserSerializer, UserPaymentMethodSerializer, SubscriptionSerializer, UserSubscriptionSerializer, GenreSerializer, FranchiseSerializer, FranchiseDetailSerializer, ChapterSerializer, ChapterDetailSerializer, EpisodeSerializer, PersonSerializer, ChapterPersonRoleSerializer, CommentSerializer, ReviewSerializer, RatingSerializer, PlaylistSerializer, PlaybackHeartbeatSerializer, ContinueWatchingSerializer, ChapterShortSerializer, PersonSummarySerializer, FilmographyRoleSerializer, EpisodeReorderSerializer, EpisodeInsertSerializer, PlaylistDetailSerializer, PlaylistChaptersSerializer, PlaylistMoveSerializer, PlaylistDiscoverySerializer, BulkRatingSerializer
+from django.db.models import Count, Prefetch
 from django_filters.rest_framework import DjangoFilterBackend, FilterSet, CharFilter, NumberFilter
 from django.db.models.functions import ExtractYear
 from rest_framework.filters import SearchFilter, OrderingFilter
+from .entitlements import can_access
+from .playback import playback_buffer
+from .view_events import view_event_log
+from .recommendations import similarity_index
+from . import content_similarity
+from .filmography import refresh_person_summaries
+from .episodes import insert_episodes, reorder_episodes
+from . import library, playlist_discovery, playlists, ratings
+from .streaming import starts_playback, stream_file_response
+from .video_packaging import rendition_dir, rewrite_manifest
 
 
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """Видеоплееры присылают произвольный Accept — не отвечаем на него 406"""
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+def chapters_in_order(chapter_ids, request):
+    """Краткие карточки глав в порядке chapter_ids (пропавшие главы пропускаются)"""
+    chapters = Chapter.objects.in_bulk(chapter_ids)
+    found = [chapters[chapter_id] for chapter_id in chapter_ids if chapter_id in chapters]
+    return ChapterShortSerializer(found, many=True, context={'request': request}).data
+
+
+def record_view(request, episode):
+    """Записать начало просмотра в журнал событий (пробы плеера и HEAD не записываются)"""
+    if episode.chapter_id and starts_playback(request):
+        view_event_log.record(request.user.id, episode.chapter_id, episode.id)
+
 
 # 1. User ViewSet
 class UserViewSet(viewsets.ModelViewSet):
@@ -45,6 +83,11 @@ class FranchiseViewSet(viewsets.ModelViewSet):
     queryset = Franchise.objects.annotate(chapter_count=Count('chapters'))
     serializer_class = FranchiseSerializer
 
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return FranchiseDetailSerializer
+        return FranchiseSerializer
+
 # 7. Chapter ViewSet
 
 class ChapterFilter(FilterSet):
@@ -76,25 +119,192 @@ class ChapterFilter(FilterSet):
 
 
 
+class TrendingPagination(CursorPagination):
+    ordering = '-score'
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class TopRatedPagination(TrendingPagination):
+    """Курсор по индексу weighted_score; id разводит главы с равным рейтингом"""
+    ordering = ('-weighted_score', '-id')
+
+
+class PlaylistDiscoveryPagination(TrendingPagination):
+    """Курсор по score без COUNT, как у трендов"""
+
+
 class ChapterViewSet(viewsets.ModelViewSet):
     queryset = Chapter.objects.all().select_related('franchise', 'required_subscription').prefetch_related('genres', 'people').order_by('-view_count')
     serializer_class = ChapterSerializer
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = ChapterFilter
     search_fields = ['title']
-    ordering_fields = ['rating_cache', 'release_date', 'view_count']
+    ordering_fields = ['rating_cache', 'weighted_score', 'release_date', 'view_count']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            queryset = queryset.select_related('rating_histogram')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return ChapterDetailSerializer
+        return ChapterSerializer
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Трендовые главы за окно ?window=24h|7d|30d (по умолчанию 7d)"""
+        window = request.query_params.get('window', '7d')
+        if window not in dict(ChapterTrendingScore.WINDOW_CHOICES):
+            return Response({'detail': 'Окно должно быть одним из: 24h, 7d, 30d'}, status=400)
+
+        paginator = TrendingPagination()
+        scores = paginator.paginate_queryset(
+            ChapterTrendingScore.objects.filter(window=window).select_related('chapter'), request, view=self
+        )
+        serializer = ChapterShortSerializer([score.chapter for score in scores], many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def top(self, request):
+        """Лучшие главы по байесовскому среднему: одна оценка 10/10 не обгоняет сотни высоких оценок"""
+        paginator = TopRatedPagination()
+        chapters = paginator.paginate_queryset(Chapter.objects.filter(rating_count__gt=0), request, view=self)
+        serializer = ChapterShortSerializer(chapters, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Похожие главы: по совместным просмотрам, при нехватке — по жанрам и людям"""
+        try:
+            chapter_id = int(pk)
+        except ValueError:
+            return Response({'detail': 'Некорректный id главы'}, status=400)
+        limit = 20
+        neighbors = [neighbor_id for neighbor_id, _ in similarity_index.similar(chapter_id, limit=limit)]
+        if len(neighbors) < limit:
+            # Холодный старт: у новых глав нет просмотров и оценок, добираем похожие по жанрам и людям
+            neighbors += [
+                neighbor_id for neighbor_id, _ in content_similarity.similar(chapter_id, limit=limit)
+                if neighbor_id not in neighbors
+            ][:limit - len(neighbors)]
+        return Response(chapters_in_order(neighbors, request))
+
+    def _chapter_episodes(self, request, pk):
+        chapter = Chapter.objects.filter(pk=pk).values('id', 'total_runtime').first()
+        if chapter is None:
+            raise Http404
+        episodes = Episode.objects.filter(chapter_id=chapter['id']).order_by('episode_number', 'id')
+        return Response({
+            'chapter': chapter['id'],
+            'total_runtime': duration_string(chapter['total_runtime']) if chapter['total_runtime'] is not None else None,
+            'episodes': EpisodeSerializer(episodes, many=True, context={'request': request}).data,
+        })
+
+    @action(detail=True, methods=['get'])
+    def episodes(self, request, pk=None):
+        """Эпизоды главы по порядку и их общая длительность"""
+        return self._chapter_episodes(request, pk)
+
+    @action(detail=True, methods=['post'], url_path='episodes/reorder')
+    def reorder_episodes(self, request, pk=None):
+        """Перенумеровать эпизоды главы в переданном порядке"""
+        chapter = self.get_object()
+        serializer = EpisodeReorderSerializer(data=request.data, context={'chapter_id': chapter.pk})
+        serializer.is_valid(raise_exception=True)
+        reorder_episodes(chapter.pk, serializer.validated_data['episodes'])
+        return self._chapter_episodes(request, chapter.pk)
+
+    @action(detail=True, methods=['post'], url_path='episodes/insert')
+    def insert_episodes(self, request, pk=None):
+        """Вставить эпизоды на позицию position со сдвигом последующих"""
+        chapter = self.get_object()
+        serializer = EpisodeInsertSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        insert_episodes(chapter.pk, serializer.validated_data['position'], serializer.validated_data['episodes'])
+        return self._chapter_episodes(request, chapter.pk)
 
 
 # 8. Episode ViewSet
 class EpisodeViewSet(viewsets.ModelViewSet):
-    queryset = Episode.objects.all()
+    queryset = Episode.objects.select_related('chapter')
     serializer_class = EpisodeSerializer
 
+    @action(detail=True, methods=['get'], content_negotiation_class=IgnoreClientContentNegotiation)
+    def stream(self, request, pk=None):
+        """Потоковая отдача видео эпизода (Range/If-Range)"""
+        episode = self.get_object()
+        if not episode.video_file:
+            return Response({'detail': 'Видеофайл отсутствует'}, status=404)
+        if not can_access(request.user, episode.chapter):
+            return Response({'detail': 'Для просмотра требуется активная подписка'}, status=403)
+        response = stream_file_response(request, episode.video_file.name)
+        record_view(request, episode)
+        return response
+
+    @action(detail=True, methods=['get'])
+    def manifest(self, request, pk=None):
+        """HLS-манифест эпизода (после нарезки командой package_episodes)"""
+        episode = self.get_object()
+        if not episode.hls_manifest:
+            return Response({'detail': 'Видео ещё не нарезано на сегменты'}, status=404)
+        if not can_access(request.user, episode.chapter):
+            return Response({'detail': 'Для просмотра требуется активная подписка'}, status=403)
+
+        playlist = rewrite_manifest(
+            episode.hls_manifest,
+            lambda name: reverse('episode-segment', kwargs={'pk': episode.pk, 'segment': name}),
+        )
+        record_view(request, episode)
+        return HttpResponse(playlist, content_type='application/vnd.apple.mpegurl')
+
+    @action(
+        detail=True, methods=['get'], url_path=r'segments/(?P<segment>[\w-]+\.ts)',
+        content_negotiation_class=IgnoreClientContentNegotiation,
+    )
+    def segment(self, request, pk=None, segment=None):
+        """Отдельный HLS-сегмент"""
+        episode = self.get_object()
+        if not episode.hls_manifest:
+            return Response({'detail': 'Видео ещё не нарезано на сегменты'}, status=404)
+        if not can_access(request.user, episode.chapter):
+            return Response({'detail': 'Для просмотра требуется активная подписка'}, status=403)
+        return stream_file_response(request, f'{rendition_dir(episode)}/{segment}')
+
 # 9. Person ViewSet
 class PersonViewSet(viewsets.ModelViewSet):
     queryset = Person.objects.all()
     serializer_class = PersonSerializer
 
+    @action(detail=True, methods=['get'])
+    def filmography(self, request, pk=None):
+        """Фильмография персоны: роли по типам и сводка (число глав, средняя оценка, годы карьеры)"""
+        person = self.get_object()
+        try:
+            summary = person.summary
+        except PersonSummary.DoesNotExist:
+            refresh_person_summaries([person.pk])
+            summary = PersonSummary.objects.get(pk=person.pk)
+
+        roles = (
+            ChapterPersonRole.objects.filter(person=person, chapter__isnull=False, role__isnull=False)
+            .select_related('chapter')
+            .order_by('-chapter__release_date', 'chapter_id')
+        )
+        # Порядок ролей — как в ROLE_CHOICES; значения не из списка (старые данные) идут в конце
+        grouped = {role: [] for role, _ in ChapterPersonRole.ROLE_CHOICES}
+        for item in FilmographyRoleSerializer(roles, many=True, context={'request': request}).data:
+            grouped.setdefault(item['role'], []).append(item['chapter'])
+
+        return Response({
+            'person': PersonSerializer(person).data,
+            'summary': PersonSummarySerializer(summary).data,
+            'roles': {role: chapters for role, chapters in grouped.items() if chapters},
+        })
+
 # 10. ChapterPersonRole ViewSet
 class ChapterPersonRoleViewSet(viewsets.ModelViewSet):
     queryset = ChapterPersonRole.objects.all()
@@ -115,15 +325,143 @@ class RatingViewSet(viewsets.ModelViewSet):
     queryset = Rating.objects.all()
     serializer_class = RatingSerializer
 
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def bulk(self, request):
+        """Записать пачку оценок текущего пользователя (создать или обновить), результат по каждой главе"""
+        serializer = BulkRatingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'results': ratings.bulk_upsert(request.user, serializer.validated_data['ratings'])})
+
 # 14. Playlist ViewSet
 class PlaylistViewSet(viewsets.ModelViewSet):
     queryset = Playlist.objects.all()
     serializer_class = PlaylistSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related('user')
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(Prefetch(
+                'playlist_chapters',
+                queryset=PlaylistChapter.objects.select_related('chapter').order_by('position', 'id'),
+            ))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return PlaylistDetailSerializer
+        return PlaylistSerializer
+
+    @action(detail=False, methods=['get'])
+    def discover(self, request):
+        """Публичные плейлисты по популярности, свежести и качеству глав; ?genres=1,2 — по жанрам"""
+        genres = [int(genre) for genre in request.query_params.get('genres', '').split(',') if genre.isdigit()]
+        paginator = PlaylistDiscoveryPagination()
+        page = paginator.paginate_queryset(playlist_discovery.discover(genres), request, view=self)
+        return paginator.get_paginated_response(PlaylistDiscoverySerializer(page, many=True).data)
+
+    @action(detail=True, methods=['post', 'delete'], permission_classes=[permissions.IsAuthenticated])
+    def follow(self, request, pk=None):
+        """
+        Подписаться на плейлист (POST) или отписаться (DELETE).
+        Подписаться можно только на публичный или свой плейлист; отписаться — и от ставшего закрытым.
+        """
+        playlist = self.get_object()
+        if request.method == 'DELETE':
+            PlaylistFollow.objects.filter(user=request.user, playlist=playlist).delete()
+            return Response(status=204)
+        if not playlist.is_public and playlist.user_id != request.user.pk:
+            raise Http404
+        _, created = PlaylistFollow.objects.get_or_create(user=request.user, playlist=playlist)
+        return Response(status=201 if created else 200)
+
+    @action(detail=True, methods=['post'], url_path='chapters/add')
+    def add_chapters(self, request, pk=None):
+        """Добавить главы в конец плейлиста (уже добавленные пропускаются)"""
+        playlist = self.get_object()
+        serializer = PlaylistChaptersSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        added = playlists.add_chapters(playlist, serializer.validated_data['chapters'])
+        return Response({'added': added}, status=201 if added else 200)
+
+    @action(detail=True, methods=['post'], url_path='chapters/remove')
+    def remove_chapters(self, request, pk=None):
+        """Убрать главы из плейлиста"""
+        playlist = self.get_object()
+        serializer = PlaylistChaptersSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'removed': playlists.remove_chapters(playlist, serializer.validated_data['chapters'])})
+
+    @action(detail=True, methods=['post'], url_path='chapters/move')
+    def move_chapter(self, request, pk=None):
+        """Переместить главу сразу после другой главы плейлиста (after=null — в начало)"""
+        playlist = self.get_object()
+        serializer = PlaylistMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            position = playlists.move_chapter(playlist, serializer.validated_data['chapter'], serializer.validated_data['after'])
+        except PlaylistChapter.DoesNotExist:
+            return Response({'detail': 'Глава не найдена в плейлисте'}, status=404)
+        return Response({'chapter': serializer.validated_data['chapter'], 'position': position})
+
 class PlaylistChapterViewSet(viewsets.ModelViewSet):
     queryset = PlaylistChapter.objects.select_related('playlist', 'chapter').all()
     serializer_class = PlaylistChapterSerializer
 
 class ViewHistoryViewSet(viewsets.ModelViewSet):
     queryset = ViewHistory.objects.select_related('user', 'chapter').all()
-    serializer_class = ViewHistorySerializer
\ No newline at end of file
+    serializer_class = ViewHistorySerializer
+
+    def perform_create(self, serializer):
+        view = serializer.save()
+        view_event_log.record(view.user_id, view.chapter_id)
+
+
+# Личный раздел текущего пользователя (/me/...)
+class MeViewSet(viewsets.ViewSet):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=False, methods=['post'])
+    def playback(self, request):
+        """Heartbeat плеера: текущая позиция в эпизоде (в секундах)"""
+        serializer = PlaybackHeartbeatSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        playback_buffer.record(request.user.id, serializer.validated_data['episode'], serializer.validated_data['position'])
+        return Response(status=204)
+
+    @action(detail=False, methods=['get'], url_path='continue-watching')
+    def continue_watching(self, request):
+        """Недосмотренные эпизоды, последние сверху"""
+        playback_buffer.flush(user_id=request.user.pk)
+        progress = (
+            PlaybackProgress.objects
+            .filter(user=request.user, is_finished=False)
+            .select_related('episode__chapter')
+            .order_by('-updated_at')[:20]
+        )
+        return Response(ContinueWatchingSerializer(progress, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def library(self, request):
+        """
+        Библиотека пользователя: плейлисты, история, оценки и активная подписка.
+        Секции листаются независимо: ?history_offset=10&history_limit=20
+        """
+        return Response(library.get_library(request.user, library.parse_pages(request.query_params)))
+
+    @action(detail=False, methods=['get'])
+    def recommendations(self, request):
+        """Рекомендации по недавним просмотрам и высоким оценкам пользователя"""
+        seeds = {
+            chapter_id: 1.0
+            for chapter_id in ViewHistory.objects.filter(user=request.user, chapter__isnull=False)
+            .order_by('-viewed_at').values_list('chapter_id', flat=True)[:50]
+        }
+        for chapter_id, score in (
+            Rating.objects.filter(user=request.user, chapter__isnull=False, score__gte=7)
+            .order_by('-created_at').values_list('chapter_id', 'score')[:50]
+        ):
+            seeds[chapter_id] = seeds.get(chapter_id, 0) + score / 10
+
+        seen = ViewHistory.objects.filter(user=request.user, chapter__isnull=False).values_list('chapter_id', flat=True)
+        recommended = similarity_index.recommend(seeds, exclude=set(seen), limit=20)
+        return Response(chapters_in_order([chapter_id for chapter_id, _ in recommended], request))
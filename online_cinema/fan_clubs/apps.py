@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class FanClubsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'fan_clubs'
-    verbose_name = 'Фан-клубы'
\ No newline at end of file
+    verbose_name = 'Фан-клубы'
+
+    def ready(self):
+        from . import signals  # noqa: F401
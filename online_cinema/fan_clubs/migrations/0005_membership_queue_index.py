@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-19 12:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fan_clubs', '0004_alter_fanclub_franchise'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fanclubmembership',
+            index=models.Index(fields=['club', 'status', 'applied_at', 'id'], name='membership_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 12:15
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_joined_at(apps, schema_editor):
+    # Курсор справочника идёт по joined_at — у одобренных участников он должен быть заполнен
+    FanClubMembership = apps.get_model('fan_clubs', 'FanClubMembership')
+    FanClubMembership.objects.filter(status='approved', joined_at__isnull=True).update(joined_at=F('applied_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fan_clubs', '0005_membership_queue_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fanclubmembership',
+            index=models.Index(fields=['club', 'status', 'joined_at', 'id'], name='membership_directory_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fanclubmembership',
+            index=models.Index(fields=['club', 'status', 'role', 'joined_at', 'id'], name='membership_role_idx'),
+        ),
+        migrations.RunPython(fill_joined_at, migrations.RunPython.noop),
+    ]
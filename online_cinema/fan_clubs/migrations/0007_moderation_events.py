@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-19 12:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fan_clubs', '0006_membership_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(max_length=20, verbose_name='Тип события')),
+                ('data', models.JSONField(default=dict, verbose_name='Данные')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата события')),
+                ('club', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='fan_clubs.fanclub', verbose_name='Клуб')),
+            ],
+            options={
+                'verbose_name': 'Событие модерации',
+                'verbose_name_plural': 'События модерации',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['club', 'id'], name='moderation_event_club_idx')],
+            },
+        ),
+    ]
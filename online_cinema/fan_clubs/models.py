@@ -1,12 +1,15 @@
+from functools import partial
+
 from django.db import models
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.urls import reverse
-from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 
+from cinema.slugs import save_with_slug
+
 User = get_user_model()
 
 # ==============================================================================
@@ -90,7 +93,7 @@ class FanClub(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.title)
+            return save_with_slug(self, partial(super().save, *args, **kwargs), 'fan-club')
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
@@ -108,9 +111,16 @@ class FanClub(models.Model):
     def get_members_count(self):
         return self.memberships.filter(status='approved').count()
 
+    def _admin_memberships(self, user):
+        return self.memberships.filter(user=user, role='admin', status='approved')
+
     def has_admin(self, user):
         """Проверить, является ли пользователь администратором клуба"""
-        return self.memberships.filter(user=user, role='admin', status='approved').exists()
+        return user.is_authenticated and self._admin_memberships(user).exists()
+
+    async def ahas_admin(self, user):
+        """Асинхронный вариант has_admin (для асинхронных представлений)"""
+        return user.is_authenticated and await self._admin_memberships(user).aexists()
 
     def is_creator(self, user):
         """Проверить, является ли пользователь создателем клуба"""
@@ -220,9 +230,25 @@ class FanClubMembership(models.Model):
     class Meta:
         unique_together = ['user', 'club']
         ordering = ['-role', '-joined_at', '-applied_at']
+        indexes = [
+            # Очередь заявок клуба: фильтр по статусу и курсор по дате подачи
+            models.Index(fields=['club', 'status', 'applied_at', 'id'], name='membership_queue_idx'),
+            # Справочник участников: по статусу (и роли) с сортировкой по дате вступления
+            models.Index(fields=['club', 'status', 'joined_at', 'id'], name='membership_directory_idx'),
+            models.Index(fields=['club', 'status', 'role', 'joined_at', 'id'], name='membership_role_idx'),
+        ]
         verbose_name = _('Членство в клубе')
         verbose_name_plural = _('Членство в клубах')
 
+    def save(self, *args, **kwargs):
+        # Курсор справочника идёт по joined_at: одобренный участник без даты вступления в нём бы пропал
+        # (например, если статус поменяли в админке, а не через approve)
+        if self.status == 'approved' and self.joined_at is None:
+            self.joined_at = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'joined_at'}
+        super().save(*args, **kwargs)
+
     def get_application_photos_count(self):
         return self.application_attachments.count()
 
@@ -287,7 +313,7 @@ class FanClubMembership(models.Model):
 
     def promote_to_admin(self, moderator):
         """Повысить до администратора"""
-        if not moderator.fan_club_memberships.filter(club=self.club, role='admin', status='approved').exists():
+        if not self.club.has_admin(moderator):
             raise ValidationError(_("Только администратор может назначать других администраторов"))
         
         self.role = 'admin'
@@ -295,7 +321,7 @@ class FanClubMembership(models.Model):
 
     def demote_to_member(self, moderator):
         """Понизить до участника"""
-        if not moderator.fan_club_memberships.filter(club=self.club, role='admin', status='approved').exists():
+        if not self.club.has_admin(moderator):
             raise ValidationError(_("Только администратор может понижать администраторов"))
         
         # Проверка: не последний ли админ
@@ -368,4 +394,32 @@ class FanClubApplicationAttachment(models.Model):
     class Meta:
         ordering = ['-uploaded_at']
         verbose_name = _('Вложение заявки')
-        verbose_name_plural = _('Вложения заявок')
\ No newline at end of file
+        verbose_name_plural = _('Вложения заявок')
+
+
+class ModerationEvent(models.Model):
+    """
+    Событие очереди заявок клуба для SSE-потока администраторов (fan_clubs.moderation_events).
+    Хранится в БД, а не в памяти процесса: поток может обслуживать любой из процессов сервера.
+    """
+    # Без внешнего ключа в БД: withdrawn при каскадном удалении клуба публикуется уже после удаления.
+    # Такие события просто доживают до очистки по EVENT_RETENTION
+    club = models.ForeignKey(
+        FanClub,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name=_('Клуб'),
+    )
+    event_type = models.CharField(_('Тип события'), max_length=20)
+    data = models.JSONField(_('Данные'), default=dict)
+    created_at = models.DateTimeField(_('Дата события'), auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Досылка событий клуба после курсора (id события)
+            models.Index(fields=['club', 'id'], name='moderation_event_club_idx'),
+        ]
+        verbose_name = _('Событие модерации')
+        verbose_name_plural = _('События модерации')
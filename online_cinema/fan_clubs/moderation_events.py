@@ -0,0 +1,147 @@
+import asyncio
+import datetime
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import ModerationEvent
+
+
+# Сколько хранятся события: клиенту, переподключившемуся позже, придёт reset
+EVENT_RETENTION = datetime.timedelta(hours=1)
+# Как часто поток перечитывает события из БД (их могли опубликовать другие процессы), секунд
+POLL_INTERVAL = 2
+# Пауза между keep-alive комментариями и максимальная длительность одного соединения, секунд
+HEARTBEAT_INTERVAL = 15
+STREAM_LIFETIME = 5 * 60
+RETRY_MS = 3000
+
+
+class ModerationEventLog:
+    """
+    События модерации по клубам в таблице ModerationEvent — общей для всех процессов сервера.
+
+    Курсор события — его id. Потоки событий опрашивают таблицу раз в POLL_INTERVAL;
+    события, опубликованные этим же процессом, будят их сразу (call_soon_threadsafe в цикле событий потока).
+    """
+
+    def __init__(self, retention, poll_interval):
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._waiters = {}
+
+    def publish(self, club_id, event_type, data):
+        event = ModerationEvent.objects.create(club_id=club_id, event_type=event_type, data=data)
+        ModerationEvent.objects.filter(created_at__lt=event.created_at - self.retention).delete()
+        with self._lock:
+            waiters = self._waiters.pop(club_id, [])
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(waiter.set)
+        return self.cursor(event.pk)
+
+    def since(self, club_id, cursor):
+        """
+        События клуба после cursor: (events, reset). reset — курсор не восстановить
+        (не из этой БД или события после него уже удалены по сроку), клиенту нужно перечитать очередь.
+        """
+        if cursor is None:
+            return [], False
+        if not cursor.isdigit():
+            return [], True
+        seq = int(cursor)
+        bounds = ModerationEvent.objects.aggregate(first=Min('id'), last=Max('id'))
+        if seq > (bounds['last'] or 0) or (bounds['first'] is not None and bounds['first'] > seq + 1):
+            return [], True
+        events = ModerationEvent.objects.filter(club_id=club_id, id__gt=seq).values_list('id', 'event_type', 'data')
+        return list(events), False
+
+    def last_cursor(self, club_id):
+        """Курсор «сейчас»: последний id по всей таблице, а не по клубу — так пропуски видны по Min(id)"""
+        return self.cursor(ModerationEvent.objects.aggregate(last=Max('id'))['last'] or 0)
+
+    def cursor(self, seq):
+        return str(seq)
+
+    async def wait(self, club_id, timeout):
+        """Дождаться события клуба из этого процесса или истечения timeout (не дольше POLL_INTERVAL)"""
+        event = asyncio.Event()
+        with self._lock:
+            self._waiters.setdefault(club_id, []).append((asyncio.get_running_loop(), event))
+        try:
+            await asyncio.wait_for(event.wait(), min(timeout, self.poll_interval))
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            # Таймаут или отмена (клиент отключился) — иначе ожидающий так и остался бы в списке клуба
+            with self._lock:
+                waiters = self._waiters.get(club_id)
+                if waiters is not None:
+                    waiters[:] = [waiter for waiter in waiters if waiter[1] is not event]
+                    if not waiters:
+                        del self._waiters[club_id]
+
+
+moderation_events = ModerationEventLog(EVENT_RETENTION, POLL_INTERVAL)
+
+
+def membership_payload(membership):
+    return {
+        'id': membership.pk,
+        'user_id': membership.user_id,
+        'user_username': membership.user.username,
+        'status': membership.status,
+        'applied_at': membership.applied_at.isoformat() if membership.applied_at else None,
+        'reviewed_by': membership.reviewed_by_id,
+    }
+
+
+def schedule_publish(membership, event_type):
+    """Опубликовать событие после фиксации транзакции — отменённые изменения клиенты не увидят"""
+    club_id, data = membership.club_id, membership_payload(membership)
+    transaction.on_commit(lambda: moderation_events.publish(club_id, event_type, data))
+
+
+def format_event(cursor, event_type, data):
+    return f'id: {cursor}\nevent: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+async def stream(club_id, cursor):
+    """
+    Поток SSE для администраторов клуба. Сначала досылает пропущенные события после cursor
+    (или reset, если их уже нет), затем ждёт новые; соединение живёт не дольше STREAM_LIFETIME.
+    """
+    since = sync_to_async(moderation_events.since)
+    last_cursor = sync_to_async(moderation_events.last_cursor)
+
+    yield f'retry: {RETRY_MS}\n\n'
+    events, reset = await since(club_id, cursor)
+    if reset or cursor is None:
+        cursor = await last_cursor(club_id)
+        if reset:
+            yield format_event(cursor, 'reset', {'detail': 'Перечитайте очередь заявок'})
+    for seq, event_type, data in events:
+        cursor = moderation_events.cursor(seq)
+        yield format_event(cursor, event_type, data)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STREAM_LIFETIME
+    heartbeat_at = loop.time() + HEARTBEAT_INTERVAL
+    while loop.time() < deadline:
+        await moderation_events.wait(club_id, min(heartbeat_at, deadline) - loop.time())
+        events, reset = await since(club_id, cursor)
+        if reset:
+            cursor = await last_cursor(club_id)
+            yield format_event(cursor, 'reset', {'detail': 'Перечитайте очередь заявок'})
+        for seq, event_type, data in events:
+            cursor = moderation_events.cursor(seq)
+            yield format_event(cursor, event_type, data)
+        if reset or events:
+            heartbeat_at = loop.time() + HEARTBEAT_INTERVAL
+        elif loop.time() >= heartbeat_at:
+            yield f': {timezone.now().isoformat()}\n\n'
+            heartbeat_at = loop.time() + HEARTBEAT_INTERVAL
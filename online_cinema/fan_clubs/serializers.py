@@ -56,8 +56,8 @@ class FanClubMembershipSerializer(serializers.ModelSerializer):
     application_attachments = FanClubApplicationAttachmentSerializer(many=True, read_only=True)
     photos_count = serializers.IntegerField(source='get_application_photos_count', read_only=True)
     can_add_photos = serializers.BooleanField(source='can_add_more_application_photos', read_only=True)
-    is_admin = serializers.BooleanField(source='is_admin', read_only=True)
-    is_creator = serializers.BooleanField(source='is_creator', read_only=True)
+    is_admin = serializers.BooleanField(read_only=True)
+    is_creator = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = FanClubMembership
@@ -69,6 +69,34 @@ class FanClubMembershipSerializer(serializers.ModelSerializer):
         read_only_fields = ['status', 'joined_at', 'applied_at', 'review_comment', 'role', 'user']
 
 
+class FanClubApplicationAttachmentShortSerializer(serializers.ModelSerializer):
+    photo_url = serializers.ImageField(source='photo', read_only=True)
+
+    class Meta:
+        model = FanClubApplicationAttachment
+        fields = ['id', 'photo_url', 'caption']
+
+
+class FanClubPendingApplicationSerializer(serializers.ModelSerializer):
+    """Компактная заявка для очереди модерации: photos_count аннотируется, вложения подгружаются prefetch"""
+    user_username = serializers.CharField(source='user.username', read_only=True)
+    photos_count = serializers.IntegerField(read_only=True)
+    application_attachments = FanClubApplicationAttachmentShortSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = FanClubMembership
+        fields = ['id', 'user_id', 'user_username', 'application_data', 'applied_at', 'photos_count', 'application_attachments']
+
+
+class FanClubMemberSerializer(serializers.ModelSerializer):
+    """Строка справочника участников клуба"""
+    user_username = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = FanClubMembership
+        fields = ['id', 'user_id', 'user_username', 'role', 'status', 'joined_at', 'applied_at']
+
+
 class FanClubMembershipCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = FanClubMembership
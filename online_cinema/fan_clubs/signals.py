@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import FanClubMembership
+from .moderation_events import schedule_publish
+
+
+@receiver(pre_save, sender=FanClubMembership)
+def remember_previous_status(sender, instance, **kwargs):
+    instance._previous_status = None
+    if instance.pk:
+        instance._previous_status = FanClubMembership.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=FanClubMembership)
+def publish_moderation_event(sender, instance, created, **kwargs):
+    previous = None if created else instance._previous_status
+    if instance.status == 'pending' and previous != 'pending':
+        schedule_publish(instance, 'submitted')
+    elif previous == 'pending' and instance.status in ('approved', 'rejected'):
+        schedule_publish(instance, instance.status)
+
+
+@receiver(post_delete, sender=FanClubMembership)
+def publish_withdrawn_application(sender, instance, **kwargs):
+    if instance.status == 'pending':
+        schedule_publish(instance, 'withdrawn')
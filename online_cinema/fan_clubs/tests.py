@@ -1,3 +1,202 @@
-from django.test import TestCase
+import asyncio
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import FanClub, FanClubMembership, ModerationEvent
+from .moderation_events import EVENT_RETENTION, RETRY_MS, ModerationEventLog, moderation_events, stream
+
+User = get_user_model()
+
+# Файловый кэш из настроек переживает запуск тестов, а id в тестовой БД повторяются
+_cache_override = override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+
+
+def setUpModule():
+    _cache_override.enable()
+
+
+def tearDownModule():
+    _cache_override.disable()
+
+
+def make_users(count, prefix='user'):
+    return [User.objects.create(username=f'{prefix}{i}') for i in range(count)]
+
+
+class MembershipJoinedAtTests(TestCase):
+    def setUp(self):
+        self.user, = make_users(1)
+        self.club = FanClub.objects.create(title='Клуб', description='')
+
+    def test_approved_status_sets_joined_at(self):
+        membership = FanClubMembership.objects.create(user=self.user, club=self.club)
+        self.assertIsNone(membership.joined_at)
+
+        membership.status = 'approved'
+        membership.save(update_fields=['status'])
+
+        membership.refresh_from_db()
+        self.assertIsNotNone(membership.joined_at)
+
+
+class MemberDirectoryTests(TestCase):
+    def setUp(self):
+        self.users = make_users(7)
+        self.club = FanClub.objects.create(title='Клуб', description='')
+        for user in self.users[:5]:
+            FanClubMembership.objects.create(user=user, club=self.club, status='approved')
+        FanClubMembership.objects.filter(user=self.users[0]).update(role='admin')
+        FanClubMembership.objects.create(user=self.users[5], club=self.club)
+        FanClubMembership.objects.create(user=self.users[6], club=self.club, status='banned')
+        self.url = f'/api/v1/clubs/clubs/{self.club.slug}/members/'
+        self.client = APIClient()
+
+    def collect(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        counts, ids = response.data.get('counts'), []
+        while True:
+            ids += [member['user_id'] for member in response.data['results']]
+            if not response.data['next']:
+                return counts, ids
+            response = self.client.get(response.data['next'])
+            self.assertNotIn('counts', response.data)
+
+    def test_cursor_walks_all_members(self):
+        counts, ids = self.collect({'limit': 2})
+
+        self.assertEqual(counts, {'approved': 5, 'admins': 1, 'pending': 1, 'rejected': 0, 'banned': 1})
+        self.assertEqual(ids, [user.pk for user in reversed(self.users[:5])])
+
+        _, ids = self.collect({'limit': 2, 'ordering': 'joined_at'})
+        self.assertEqual(ids, [user.pk for user in self.users[:5]])
+
+    def test_role_filter(self):
+        _, ids = self.collect({'role': 'member', 'limit': 3})
+        self.assertEqual(sorted(ids), [user.pk for user in self.users[1:5]])
+
+    def test_other_statuses_for_admins_only(self):
+        self.assertEqual(self.client.get(self.url, {'status': 'pending'}).status_code, 403)
+
+        self.client.force_authenticate(self.users[0])
+        _, ids = self.collect({'status': 'pending'})
+        self.assertEqual(ids, [self.users[5].pk])
+
+
+class PendingApplicationsTests(TestCase):
+    def setUp(self):
+        self.admin, *self.applicants = make_users(6)
+        self.club = FanClub.objects.create(title='Клуб', description='')
+        FanClubMembership.objects.create(user=self.admin, club=self.club, status='approved', role='admin')
+        self.pending = [FanClubMembership.objects.create(user=user, club=self.club) for user in self.applicants]
+        self.url = f'/api/v1/clubs/clubs/{self.club.slug}/pending_applications/'
+        self.client = APIClient()
+
+    def test_admins_only(self):
+        self.client.force_authenticate(self.applicants[0])
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_cursor_oldest_first(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url, {'limit': 2})
+        self.assertEqual(response['X-Moderation-Cursor'], moderation_events.last_cursor(self.club.pk))
+
+        ids = []
+        while True:
+            self.assertLessEqual(len(response.data['results']), 2)
+            ids += [application['id'] for application in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(ids, [membership.pk for membership in self.pending])
+
+    def test_processed_applications_leave_queue(self):
+        self.pending[0].approve(self.admin)
+        self.pending[1].reject(self.admin, 'Нет')
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(self.url)
+
+        self.assertEqual([application['id'] for application in response.data['results']], [m.pk for m in self.pending[2:]])
+        self.assertEqual(response.data['results'][0]['photos_count'], 0)
+
+
+class ModerationEventLogTests(TestCase):
+    def setUp(self):
+        self.club = FanClub.objects.create(title='Клуб', description='')
+        self.log = ModerationEventLog(EVENT_RETENTION, poll_interval=0.01)
+
+    def test_since_cursor(self):
+        start = self.log.last_cursor(self.club.pk)
+        cursors = [self.log.publish(self.club.pk, 'submitted', {'id': i}) for i in range(2)]
+
+        events, reset = self.log.since(self.club.pk, start)
+        self.assertFalse(reset)
+        self.assertEqual([data for _, _, data in events], [{'id': 0}, {'id': 1}])
+        self.assertEqual(self.log.since(self.club.pk, cursors[-1]), ([], False))
+
+    def test_shared_between_processes(self):
+        # Другой процесс сервера — свой экземпляр журнала, но та же таблица
+        other_process = ModerationEventLog(EVENT_RETENTION, poll_interval=0.01)
+        start = other_process.last_cursor(self.club.pk)
+        cursor = self.log.publish(self.club.pk, 'submitted', {'id': 1})
+
+        events, reset = other_process.since(self.club.pk, start)
+        self.assertEqual((events, reset), ([(int(cursor), 'submitted', {'id': 1})], False))
+
+    def test_reset_for_foreign_or_expired_cursor(self):
+        start = self.log.last_cursor(self.club.pk)
+        self.log.publish(self.club.pk, 'submitted', {'id': 0})
+        ModerationEvent.objects.update(created_at=timezone.now() - EVENT_RETENTION * 2)
+        self.log.publish(self.club.pk, 'submitted', {'id': 1})
+
+        self.assertEqual(ModerationEvent.objects.count(), 1)
+        self.assertTrue(self.log.since(self.club.pk, start)[1])
+        self.assertTrue(self.log.since(self.club.pk, 'other-1')[1])
+        self.assertTrue(self.log.since(self.club.pk, '1000')[1])
+
+    def test_waiter_removed_on_cancel_and_timeout(self):
+        async def scenario():
+            await self.log.wait(1, 10)
+            task = asyncio.ensure_future(self.log.wait(1, 10))
+            await asyncio.sleep(0)
+            self.assertEqual(len(self.log._waiters[1]), 1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+        self.assertEqual(self.log._waiters, {})
+
+
+class ModerationEventsStreamTests(TestCase):
+    def setUp(self):
+        self.admin, self.member = make_users(2)
+        self.club = FanClub.objects.create(title='Клуб', description='')
+        FanClubMembership.objects.create(user=self.admin, club=self.club, status='approved', role='admin')
+        FanClubMembership.objects.create(user=self.member, club=self.club, status='approved')
+        self.url = f'/api/v1/clubs/clubs/{self.club.slug}/moderation-events/'
+
+    async def test_only_admins_subscribe(self):
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 403)
+
+        await self.async_client.aforce_login(self.member)
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 403)
+
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+    async def test_replays_events_after_cursor(self):
+        start = await sync_to_async(moderation_events.last_cursor)(self.club.pk)
+        cursor = await sync_to_async(moderation_events.publish)(self.club.pk, 'submitted', {'id': 1})
+
+        events = stream(self.club.pk, start)
+        self.assertEqual(await anext(events), f'retry: {RETRY_MS}\n\n')
+        self.assertEqual(await anext(events), f'id: {cursor}\nevent: submitted\ndata: {{"id": 1}}\n\n')
+        await events.aclose()
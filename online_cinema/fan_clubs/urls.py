@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import FanClubViewSet, FanClubMembershipViewSet, FanClubApplicationAttachmentViewSet
+from .views import FanClubViewSet, FanClubMembershipViewSet, FanClubApplicationAttachmentViewSet, moderation_events_stream
 
 router = DefaultRouter()
 router.register(r'clubs', FanClubViewSet, basename='fan_club')
@@ -8,5 +8,6 @@ router.register(r'memberships', FanClubMembershipViewSet, basename='membership')
 router.register(r'attachments', FanClubApplicationAttachmentViewSet, basename='attachment')
 
 urlpatterns = [
+    path('clubs/<slug:slug>/moderation-events/', moderation_events_stream, name='fan_club-moderation-events'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
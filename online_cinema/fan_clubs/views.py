@@ -1,13 +1,19 @@
 from rest_framework import viewsets, permissions, serializers
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
+from django.db.models import Count, Prefetch, Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.views.decorators.http import require_GET
 from .models import FanClub, FanClubPhoto, FanClubMembership, FanClubApplicationAttachment
+from .moderation_events import moderation_events, stream
 from .serializers import (
     FanClubSerializer, FanClubCreateSerializer,
     FanClubMembershipSerializer, FanClubMembershipCreateSerializer, FanClubMembershipRoleSerializer,
-    FanClubPhotoSerializer, FanClubApplicationAttachmentSerializer
+    FanClubPhotoSerializer, FanClubApplicationAttachmentSerializer, FanClubPendingApplicationSerializer,
+    FanClubMemberSerializer
 )
 
 
@@ -33,6 +39,32 @@ class IsCreatorOrAdmin(permissions.BasePermission):
         return obj.is_creator(request.user) or obj.has_admin(request.user)
 
 
+class PendingApplicationsPagination(CursorPagination):
+    """Курсор по (applied_at, id) в пределах индекса membership_queue_idx: старые заявки первыми, без COUNT"""
+    ordering = ('applied_at', 'id')
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
+
+
+class MemberDirectoryPagination(CursorPagination):
+    """
+    Курсор справочника участников. Одобренные сортируются по joined_at, остальные статусы — по applied_at
+    (joined_at у них может быть пустым); ?ordering=joined_at — от старых к новым.
+    """
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
+
+    def __init__(self, status='approved'):
+        self.field = 'joined_at' if status == 'approved' else 'applied_at'
+
+    def get_ordering(self, request, queryset, view):
+        if request.query_params.get('ordering') == 'joined_at':
+            return (self.field, 'id')
+        return ('-' + self.field, '-id')
+
+
 # ==============================================================================
 # VIEWSETS
 # ==============================================================================
@@ -58,16 +90,70 @@ class FanClubViewSet(viewsets.ModelViewSet):
         serializer = FanClubMembershipSerializer(memberships, many=True, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'])
+    def members(self, request, slug=None):
+        """
+        Справочник участников: ?status= (по умолчанию approved; другие статусы — только админам),
+        ?role=admin|member, ?q= — начало имени пользователя, ?ordering=joined_at|-joined_at.
+        Первая страница дополнительно содержит счётчики клуба по статусам и ролям.
+        """
+        club = self.get_object()
+        status = request.query_params.get('status', 'approved')
+        role = request.query_params.get('role')
+        if status not in dict(FanClubMembership.STATUS_CHOICES):
+            return Response({'detail': 'Неизвестный статус'}, status=400)
+        if role and role not in dict(FanClubMembership.ROLE_CHOICES):
+            return Response({'detail': 'Неизвестная роль'}, status=400)
+        if request.query_params.get('ordering', '-joined_at') not in ('joined_at', '-joined_at'):
+            return Response({'detail': 'ordering должен быть joined_at или -joined_at'}, status=400)
+        if status != 'approved' and not club.has_admin(request.user):
+            return Response({'detail': 'Только администраторы могут просматривать заявки и заблокированных'}, status=403)
+
+        memberships = FanClubMembership.objects.filter(club=club, status=status).select_related('user').only(
+            'id', 'user_id', 'role', 'status', 'joined_at', 'applied_at', 'user__id', 'user__username'
+        )
+        if role:
+            memberships = memberships.filter(role=role)
+        if request.query_params.get('q'):
+            memberships = memberships.filter(user__username__startswith=request.query_params['q'])
+
+        paginator = MemberDirectoryPagination(status)
+        page = paginator.paginate_queryset(memberships, request, view=self)
+        response = paginator.get_paginated_response(FanClubMemberSerializer(page, many=True).data)
+        if paginator.cursor is None:
+            response.data['counts'] = FanClubMembership.objects.filter(club=club).aggregate(
+                approved=Count('id', filter=Q(status='approved')),
+                admins=Count('id', filter=Q(status='approved', role='admin')),
+                pending=Count('id', filter=Q(status='pending')),
+                rejected=Count('id', filter=Q(status='rejected')),
+                banned=Count('id', filter=Q(status='banned')),
+            )
+        return response
+
     @action(detail=True, methods=['get'])
     def pending_applications(self, request, slug=None):
-        """Получить заявки на проверку (только для админов)"""
+        """Заявки на проверку (только для админов), постранично по дате подачи"""
         club = self.get_object()
         if not club.has_admin(request.user):
             return Response({'detail': 'Только администраторы могут просматривать заявки'}, status=403)
         
-        memberships = club.memberships.filter(status='pending').select_related('user')
-        serializer = FanClubMembershipSerializer(memberships, many=True, context={'request': request})
-        return Response(serializer.data)
+        # Курсор берём до чтения очереди: события, пришедшие во время чтения, клиент получит повторно, а не потеряет
+        cursor = moderation_events.last_cursor(club.pk)
+        memberships = (
+            FanClubMembership.objects.filter(club=club, status='pending')
+            .select_related('user')
+            .annotate(photos_count=Count('application_attachments'))
+            .prefetch_related(Prefetch(
+                'application_attachments',
+                queryset=FanClubApplicationAttachment.objects.only('id', 'membership_id', 'photo', 'caption'),
+            ))
+        )
+        paginator = PendingApplicationsPagination()
+        page = paginator.paginate_queryset(memberships, request, view=self)
+        serializer = FanClubPendingApplicationSerializer(page, many=True, context={'request': request})
+        response = paginator.get_paginated_response(serializer.data)
+        response['X-Moderation-Cursor'] = cursor
+        return response
 
     @action(detail=True, methods=['post'])
     def upload_photo(self, request, slug=None):
@@ -211,4 +297,24 @@ class FanClubApplicationAttachmentViewSet(viewsets.ModelViewSet):
             club_photo = attachment.move_to_club_gallery(caption=caption, uploaded_by=request.user)
             return Response({'detail': 'Фото перенесено в галерею', 'photo_id': club_photo.id})
         except Exception as e:
-            return Response({'detail': str(e)}, status=400)
\ No newline at end of file
+            return Response({'detail': str(e)}, status=400)
+
+
+@require_GET
+async def moderation_events_stream(request, slug):
+    """
+    SSE-поток событий очереди заявок (submitted / approved / rejected / withdrawn) для админов клуба.
+    Переподключение продолжает с Last-Event-ID (или ?cursor= из заголовка X-Moderation-Cursor).
+    """
+    club = await FanClub.objects.filter(slug=slug, is_active=True).afirst()
+    if club is None:
+        raise Http404
+    user = await request.auser()
+    if not await club.ahas_admin(user):
+        return JsonResponse({'detail': 'Только администраторы могут подписываться на заявки'}, status=403)
+
+    cursor = request.headers.get('Last-Event-ID') or request.GET.get('cursor')
+    response = StreamingHttpResponse(stream(club.pk, cursor), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
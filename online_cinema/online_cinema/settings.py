@@ -138,6 +138,43 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Если задано, отдачу видео эпизодов берёт на себя nginx (internal location, указывающий на MEDIA_ROOT)
+VIDEO_ACCEL_REDIRECT_LOCATION = None
+
+# Нарезка видео на HLS-сегменты (manage.py package_episodes)
+FFMPEG_BINARY = 'ffmpeg'
+HLS_SEGMENT_SECONDS = 6
+
+# Сколько дней подписка с автопродлением остаётся активной после end_date в ожидании оплаты
+SUBSCRIPTION_RENEWAL_GRACE_DAYS = 3
+
+# Автопродление (manage.py renew_subscriptions)
+PAYMENT_PROVIDER = 'cinema.billing.FakePaymentProvider'
+SUBSCRIPTION_RENEWAL_WORKERS = 4
+
+# Буфер позиций просмотра: сброс в БД по числу пар (пользователь, эпизод) или по времени (сек)
+PLAYBACK_FLUSH_MAX_PENDING = 500
+PLAYBACK_FLUSH_INTERVAL = 5
+
+# Журнал просмотров: дневные партиции сжатых сегментов (manage.py rollup_view_events)
+VIEW_EVENTS_DIR = BASE_DIR / 'var' / 'view_events'
+VIEW_EVENTS_RETENTION_DAYS = 90
+VIEW_EVENTS_FLUSH_MAX_PENDING = 1000
+VIEW_EVENTS_FLUSH_INTERVAL = 10
+
+# Индекс рекомендаций «похожие главы» (manage.py build_recommendations)
+RECOMMENDER_DIR = BASE_DIR / 'var' / 'recommender'
+
+# Кэш общий для всех процессов сервера (gunicorn/uvicorn --workers): сброс кэша прав доступа,
+# библиотеки и статистики в одном процессе должен быть виден остальным. LocMemCache для этого не годится
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
 """ LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,